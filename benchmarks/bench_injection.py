@@ -0,0 +1,64 @@
+"""
+Per-macro latency of the key-injection backends.
+
+Times backend.send_chord() for the same chord on every backend available
+on this machine. pyautogui is measured twice, with its stock PAUSE of
+0.1 s (what trigger_macro used to pay) and with PAUSE disabled (the
+fallback backend). Real backends really press the keys, so the default chord is
+a lone "shift"; keep the focus somewhere harmless when passing --keys.
+
+    python -m benchmarks.bench_injection --count 200
+    python -m benchmarks.bench_injection --keys ctrl,shift,f13 --count 500
+"""
+from __future__ import annotations
+import argparse
+import os
+import time
+
+from desktop.core import injection, metrics
+
+
+def _candidates():
+    yield "recording", lambda: injection.RecordingBackend()
+    if os.name == "nt":
+        yield "sendinput", lambda: injection.SendInputBackend()
+    yield "pyautogui", lambda: injection.PyAutoGuiBackend()
+    # pyautogui's stock PAUSE, i.e. what every macro paid before the backend switch
+    yield "pyautogui (PAUSE=0.1)", lambda: injection.PyAutoGuiBackend(pause=0.1)
+
+
+def _measure(backend, keys, count: int, warmup: int) -> metrics.Histogram:
+    for _ in range(warmup):
+        backend.send_chord(keys)
+    hist = metrics.Histogram(backend.name)
+    for _ in range(count):
+        started = time.perf_counter_ns()
+        backend.send_chord(keys)
+        hist.record((time.perf_counter_ns() - started) / 1000.0)
+    return hist
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", default="shift", help="comma-separated chord to inject")
+    parser.add_argument("--count", type=int, default=200, help="chords per backend")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed chords per backend")
+    args = parser.parse_args()
+    keys = tuple(k.strip() for k in args.keys.split(",") if k.strip())
+
+    print(f"Injecting {keys} x {args.count} per backend\n")
+    print(f"{'backend':<28}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>10}")
+    for label, factory in _candidates():
+        try:
+            backend = factory()
+        except Exception as e:
+            print(f"{label:<28}unavailable: {e}")
+            continue
+        # PAUSE=0.1 sleeps 100 ms per chord; a handful of samples is enough
+        count = min(args.count, 20) if "PAUSE" in label else args.count
+        s = _measure(backend, keys, count, args.warmup).summary()
+        print(f"{label:<28}{s['p50_us']:>10}{s['p95_us']:>10}{s['p99_us']:>10}{s['max_us']:>10}")
+
+
+if __name__ == "__main__":
+    main()
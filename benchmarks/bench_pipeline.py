@@ -0,0 +1,98 @@
+"""
+End-to-end desktop pipeline benchmark against the BLE simulator.
+
+Connects through ble_client exactly like the app (supervisor, GATT
+readiness, notification handler, macro worker, trigger_macro) and plays a
+load pattern through a simulated pad. Key injection goes to the in-memory
+recording backend so the numbers measure the desktop pipeline, not the OS
+(see bench_injection for the backends themselves).
+
+    python -m benchmarks.bench_pipeline --rate 200 --count 2000
+    python -m benchmarks.bench_pipeline --burst 8 --gap 0.05 --count 200 --batched
+    python -m benchmarks.bench_pipeline --replay recording.jsonl
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from desktop.ble import ble_client, simulator
+from desktop.core import injection, keymap, metrics
+
+
+def _setup(tmp: Path, args):
+    os.environ.setdefault("ADDRESS", "SIM:00:00")
+    os.environ["CHAR_UUID"] = simulator.FIRMWARE_CHAR_UUID
+    # The press policy would otherwise rate-limit synthetic load; opt back in with --min-interval
+    os.environ["PRESS_MIN_INTERVAL_MS"] = str(args.min_interval)
+    ble_client.device_cache.get_device_cache_path = lambda: tmp / "device_cache.json"
+    keymap.publish({"profiles": {"default": {f"BTN:{i}": {"keys": ["ctrl", str(i)]} for i in range(1, 5)}}})
+
+    recorder = injection.RecordingBackend()
+    injection.set_backend(recorder)
+    return recorder.events
+
+
+async def _run(args, injected) -> float:
+    backend = simulator.SimulatedBackend()
+    pad = backend.add_pad("Macropad")
+    state = {"activeProfile": "default", "connected": False, "gui_window": None}
+    loop = asyncio.get_running_loop()
+
+    with backend.installed():
+        task = ble_client.start_ble_session("Macropad", threading.RLock(), state, loop)
+        while pad.notify_callback is None:
+            await asyncio.sleep(0.001)
+
+        if args.replay:
+            schedule = simulator.load_recording(args.replay)
+        elif args.burst:
+            schedule = simulator.bursts(pad, size=args.burst, gap=args.gap, count=args.count, batched=args.batched)
+        else:
+            schedule = simulator.steady(pad, rate_hz=args.rate, count=args.count, jitter=args.jitter)
+
+        metrics.reset()
+        started = time.perf_counter()
+        await pad.play(schedule, speed=args.speed)
+        await asyncio.to_thread(ble_client.get_macro_worker().wait_idle, 30)
+        elapsed = time.perf_counter() - started
+
+        ble_client.stop_ble_session()
+        await asyncio.gather(task, return_exceptions=True)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200.0, help="presses per second (steady pattern)")
+    parser.add_argument("--count", type=int, default=1000, help="presses (steady) or bursts (burst pattern)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- fraction of the interval")
+    parser.add_argument("--burst", type=int, default=0, help="presses per burst; enables the burst pattern")
+    parser.add_argument("--gap", type=float, default=0.05, help="seconds between bursts")
+    parser.add_argument("--batched", action="store_true", help="send each burst as one notification")
+    parser.add_argument("--replay", type=Path, help="replay a BLE_RECORD_DIR recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="per-button min interval in ms (press policy)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        injected = _setup(Path(tmp), args)
+        elapsed = asyncio.run(_run(args, injected))
+
+    print(f"\n{len(injected)} macros injected in {elapsed:.3f}s ({len(injected) / elapsed:.0f}/s)")
+    q = ble_client.get_macro_worker().stats()
+    print(f"rate-limited {q.get('rate_limited', 0)}, coalesced {q.get('coalesced', 0)}, "
+          f"stale {q.get('stale', 0)}, dropped {q.get('dropped', 0)}")
+    hist = metrics.snapshot()["histograms"]
+    print(f"{'stage':<20}{'count':>8}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'max us':>10}")
+    for name, s in hist.items():
+        if name.startswith("keypress."):
+            print(f"{name:<20}{s['count']:>8}{s['p50_us']:>10}{s['p95_us']:>10}{s['p99_us']:>10}{s['max_us']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Config storage cost with large profile libraries: buttonControls.json vs SQLite.
+
+For 10/100/1000 profiles (4 mapped buttons each) it times, per engine:
+  load         store.load(): reading and normalizing the whole config (startup)
+  save 1 btn   store.patch() of the edited profile, what the GUI's Save does
+  update()     the same edit through store.update(), which copies the whole config
+
+Saves go through ConfigStore exactly as in the app, with the app's default
+write-behind window (CONFIG_WRITE_DELAY_MS=250): for JSON that is the journal
+append the caller waits on (the rewrite happens later on the config-writer
+thread), for SQLite the row transaction (it is always written through).
+The keymap is recompiled on every change as in the app; the history and cloud
+subscribers are not attached. Every column is the exact median of --count runs.
+
+    python -m benchmarks.bench_profile_store
+    python -m benchmarks.bench_profile_store --sizes 10,100,1000,5000 --count 30 --write-delay-ms 0
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from desktop.core import config_store
+from desktop.core.config_store import ConfigStore, JsonFileStorage
+from desktop.core.profile_db import ProfileDB
+
+BUTTONS = ("BTN:1", "BTN:2", "BTN:3", "BTN:4")
+
+
+def make_config(profiles: int) -> dict:
+    return {
+        "activeProfile": "app0",
+        "profiles": {
+            f"app{i}": {b: {"keys": ["ctrl", "alt", chr(ord("a") + (i + j) % 26)]} for j, b in enumerate(BUTTONS)}
+            for i in range(profiles)
+        },
+    }
+
+
+def _time(fn, count: int) -> float:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - started)
+    return statistics.median(samples) / 1e6
+
+
+def bench(store: ConfigStore, config: dict, count: int) -> dict:
+    store.subscribe(config_store._publish_keymap)
+    store.replace(config, source="defaults")
+    store.flush()
+    target = f"app{len(config['profiles']) // 2}"
+    state = {"n": 0}
+
+    def next_keys():
+        state["n"] += 1
+        return ["f13" if state["n"] % 2 else "f14"]
+
+    def save_one_button():
+        buttons = store.snapshot().thaw_profile(target)
+        buttons["BTN:1"] = {"keys": next_keys()}
+        store.patch("save", profiles={target: buttons})
+
+    def update_one_button():
+        keys = next_keys()
+
+        def edit(data):
+            data["profiles"][target]["BTN:1"] = {"keys": keys}
+        store.update(edit, source="save")
+
+    result = {
+        "load": _time(store.load, count),
+        "save 1 btn": _time(save_one_button, count),
+        "update()": _time(update_one_button, count),
+    }
+    store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated profile counts")
+    parser.add_argument("--count", type=int, default=20, help="repetitions per measurement")
+    parser.add_argument("--write-delay-ms", type=float, default=250.0, help="ConfigStore write-behind window")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    delay = args.write_delay_ms / 1000.0
+
+    print(f"{'profiles':>9}  {'engine':<7}{'load ms':>10}{'save 1 btn ms':>15}{'update() ms':>13}{'file KB':>9}")
+    for n in sizes:
+        config = make_config(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp) / "buttonControls.json"
+            js = JsonFileStorage(json_path)
+            store = ConfigStore(json_path, write_delay=delay, storage=js)
+            r = bench(store, config, args.count)
+            size = sum(p.stat().st_size for p in Path(tmp).glob("buttonControls.json*")) / 1024
+            print(f"{n:>9}  {'json':<7}{r['load']:>10.2f}{r['save 1 btn']:>15.2f}{r['update()']:>13.2f}{size:>9.0f}")
+
+            db = ProfileDB(Path(tmp) / "profiles.db")
+            store = ConfigStore(Path(tmp) / "db" / "buttonControls.json", write_delay=delay, storage=db)
+            r = bench(store, config, args.count)
+            db.close()
+            size = sum(p.stat().st_size for p in Path(tmp).glob("profiles.db*")) / 1024
+            print(f"{n:>9}  {'sqlite':<7}{r['load']:>10.2f}{r['save 1 btn']:>15.2f}{r['update()']:>13.2f}{size:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
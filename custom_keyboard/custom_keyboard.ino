@@ -5,9 +5,28 @@
 
 #define SERVICE_UUID "06d527b7-9a06-473b-ae8b-4794bae3fa04"
 #define CHARACTERISTIC_UUID "8acc4aaf-26b1-44a9-8b83-2d94ce03f34a"
+// The Arduino BLE stack doesn't expose the GATT Database Hash (0x2B2A), so the desktop app
+// validates its cached GATT table against this read-only value instead.
+// Bump GATT_LAYOUT_VERSION whenever a service, characteristic or descriptor is added or moved.
+#define GATT_LAYOUT_UUID "8acc4ab0-26b1-44a9-8b83-2d94ce03f34a"
+#define GATT_LAYOUT_VERSION "1"
+
+// Button event protocol. Set LEGACY_TEXT_PROTOCOL to 1 to send "BTN:n" strings for older desktop apps.
+// v1 payload: [version=0x01][count] then per event [button][flags: bit0 pressed][seq lo][seq hi]
+#define LEGACY_TEXT_PROTOCOL 0
+#define PROTOCOL_VERSION 0x01
+#define FLAG_PRESSED 0x01
+#define NUM_BUTTONS 4
+#define EVENT_SIZE 4
+#define DEBOUNCE_MS 20
 
 // Initialize variables
-int buttons[4] = {18,19,14,13};
+int buttons[NUM_BUTTONS] = {18,19,14,13};
+// Button number sent to the desktop for each pin above (BTN:2, BTN:3, BTN:4, BTN:1)
+uint8_t buttonIds[NUM_BUTTONS] = {2,3,4,1};
+bool pressedState[NUM_BUTTONS] = {false,false,false,false};
+unsigned long lastChange[NUM_BUTTONS] = {0,0,0,0};
+uint16_t seqNumber = 0;
 volatile bool changeMode = false;
 volatile unsigned long prev_time = 0;
 volatile unsigned long wait_time = 0;
@@ -46,6 +65,8 @@ void setup()
 
   pCharacteristic->setValue("Hello World");
   pCharacteristic->addDescriptor(new BLE2902());
+  BLECharacteristic *pLayout = pService->createCharacteristic(GATT_LAYOUT_UUID, BLECharacteristic::PROPERTY_READ);
+  pLayout->setValue(GATT_LAYOUT_VERSION);
   pService->start();
   BLEAdvertising *pAdvertising = BLEDevice::getAdvertising();
   pAdvertising->addServiceUUID(SERVICE_UUID);
@@ -85,51 +106,46 @@ void loop()
   delay(5);
 }
 
-// Loops through all the buttons and checks if any are pressed.
-// When they are pressed, it sends a BLE message saying which button was pressed
+// Loops through all the buttons and looks for press/release edges (debounced).
+// Every edge found in one pass is sent in a single BLE notification with its own sequence number,
+// so the desktop can detect dropped events.
 void keyboard(){
-  for(int i = 0; i < 4 ; i++){
-    // Check is the button is pressed
-    if(digitalRead(buttons[i]) == LOW){
-      // Wait for which button will be pressed
-      switch(buttons[i]){
-        case 13:
-          pCharacteristic->setValue("BTN:1");
-          pCharacteristic->notify();
-          // Serial.println("BTN:1");  //DEBUG
-          delay(200);
-          wait_time = millis();
-          break;
+  uint8_t payload[2 + EVENT_SIZE * NUM_BUTTONS];
+  uint8_t count = 0;
+  unsigned long now = millis();
 
-        case 18: 
-          pCharacteristic->setValue("BTN:2");
-          pCharacteristic->notify();
-          // Serial.println("BTN:2");  //DEBUG
-          delay(200);
-          wait_time = millis();
-          break;
-        
-        case 19:
-          pCharacteristic->setValue("BTN:3");
-          pCharacteristic->notify();
-          // Serial.println("BTN:3");  //DEBUG
-          delay(200);
-          wait_time = millis();
-          break;
-        
-        case 14:
-          pCharacteristic->setValue("BTN:4");
-          pCharacteristic->notify();
-          // Serial.println("BTN:4");  //DEBUG
-          delay(200);
-          wait_time = millis();
-          break;        
-        
-        default:
-          Serial.println("No button was found");
-          wait_time = millis();
-          break;        
-      }
+  for(int i = 0; i < NUM_BUTTONS; i++){
+    bool pressed = digitalRead(buttons[i]) == LOW;
+    if(pressed == pressedState[i] || now - lastChange[i] < DEBOUNCE_MS){
+      continue;
+    }
+    pressedState[i] = pressed;
+    lastChange[i] = now;
+    wait_time = now;
+
+#if LEGACY_TEXT_PROTOCOL
+    if(pressed){
+      char msg[8];
+      snprintf(msg, sizeof(msg), "BTN:%d", buttonIds[i]);
+      pCharacteristic->setValue(msg);
+      pCharacteristic->notify();
+      // Serial.println(msg);  //DEBUG
     }
+#else
+    uint8_t *ev = &payload[2 + EVENT_SIZE * count];
+    ev[0] = buttonIds[i];
+    ev[1] = pressed ? FLAG_PRESSED : 0;
+    ev[2] = seqNumber & 0xFF;
+    ev[3] = (seqNumber >> 8) & 0xFF;
+    seqNumber++;
+    count++;
+#endif
   }
-}
\ No newline at end of file
+
+  if(count > 0){
+    payload[0] = PROTOCOL_VERSION;
+    payload[1] = count;
+    pCharacteristic->setValue(payload, 2 + EVENT_SIZE * count);
+    pCharacteristic->notify();
+  }
+}
@@ -3,18 +3,25 @@ sys.coinit_flags = 0
 import asyncio
 import os
 import threading
+import time
 from dotenv import load_dotenv
 
-from desktop.core.config_store import ensure_local_config_exists, load_prev_state
+from desktop.core.config_store import ensure_local_config_exists, get_store, load_prev_state
+from desktop.core import config_io, metrics, warm_start, log as applog
+from desktop.core.config_history import ConfigHistory
+from desktop.core.config_watcher import ConfigWatcher
+from desktop.core.loop_monitor import LoopMonitor
+from desktop.core.paths import get_config_path, get_history_path, get_profile_db_path, get_warm_start_path
+from desktop.core.profile_db import open_profile_db
+from desktop.cloud import http_session
+from desktop.cloud.auth_client import FIREBASE_AUTH_BASE, FIREBASE_SECURETOKEN_BASE
 from desktop.cloud.cloud import full_reload_from_db, connecting_to_db
-from desktop.ble.ble_client import start_ble_session, stop_ble_session
+from desktop.ble.ble_client import start_ble_session, stop_ble_session, shutdown_macro_worker
 from desktop.ui.tray import build_tray
 from desktop.ui.app_controller import AppController
 from desktop.version import __version__
 # print("pythoncom in modules?", "pythoncom" in sys.modules)
 
-print(f"Macro Controller v{__version__}")
-
 def require_env(name: str) -> str:
     v = os.getenv(name)
     if not v:
@@ -22,17 +29,55 @@ def require_env(name: str) -> str:
     return v
 
 def main():
+    started = time.perf_counter()
     load_dotenv()
+    # LOG_LEVEL=debug also logs every keypress; the file lives next to buttonControls.json
+    applog.set_level(os.getenv("LOG_LEVEL"))
+    applog.start()
+    applog.get_logger("app").info("Macro Controller v%s", __version__)
+    metrics.register_gauges("config_io", config_io.stats)
 
     address = require_env("ADDRESS")
     char_uuid = require_env("CHAR_UUID")
     name = os.getenv("NAME") or "Macropad"
 
+    # Open the Firebase connections now so the first sign-in/backup doesn't pay the TLS handshakes
+    metrics.register_gauges("cloud_http", http_session.stats)
+    if os.getenv("DATABASE_URL"):
+        http_session.prewarm([os.getenv("DATABASE_URL"), FIREBASE_AUTH_BASE, FIREBASE_SECURETOKEN_BASE])
+
     config_list = ["default", "computer"]    
     file_lock = threading.RLock()
 
-    # 1) Ensure local config exists BEFORE reading it
-    ensure_local_config_exists(file_lock)
+    # CONFIG_STORAGE=sqlite keeps profiles in profiles.db (imported from buttonControls.json on first run)
+    storage = None
+    if (os.getenv("CONFIG_STORAGE") or "json").lower() == "sqlite":
+        storage = open_profile_db(get_profile_db_path(), legacy_json=get_config_path())
+        metrics.register_gauges("profile_db", storage.stats)
+    store = get_store(None, file_lock, storage=storage)
+
+    # Warm start: if buttonControls.json is unchanged since the last clean exit, the compiled
+    # keymap and config come from warm_start.bin and the JSON isn't parsed at all
+    warm = warm_start.load(get_warm_start_path(), get_config_path()) if storage is None else None
+    warm = warm is not None and warm_start.apply(warm, store)
+    if not warm:
+        # 1) Ensure local config exists BEFORE reading it
+        ensure_local_config_exists(file_lock)
+        # Loading the store also compiles the keymap; from here on config reads are snapshots
+        store.load()
+    ready_ms = (time.perf_counter() - started) * 1000.0
+    metrics.register_gauges("startup", lambda: {"ready_ms": round(ready_ms, 2), "warm": warm})
+    applog.get_logger("app").info("Ready for keypresses in %.1f ms (%s start)", ready_ms, "warm" if warm else "cold")
+    # Coalesce bursts of saves/profile switches into one rewrite (CONFIG_WRITE_DELAY_MS=0 writes through;
+    # sqlite storage always writes through, its row diff is already cheaper than the journal)
+    store.write_delay = float(os.getenv("CONFIG_WRITE_DELAY_MS") or 250) / 1000.0
+    metrics.register_gauges("config_store", store.stats)
+    # Undo history for saves, cloud restores and hand edits (tray/GUI "Undo")
+    history = ConfigHistory(get_history_path())
+    history.attach(store)
+    metrics.register_gauges("config_history", history.stats)
+    # Hand edits to buttonControls.json apply without a restart (the JSON file isn't live with sqlite storage)
+    config_watcher = ConfigWatcher(store).start() if storage is None else None
 
     state = {
         "activeProfile": load_prev_state(file_lock),
@@ -49,6 +94,8 @@ def main():
     # 3) Create the loop first
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    # Flags anything that blocks the loop (and so delays keypresses); offenders land in latency_stats.json
+    loop_monitor = LoopMonitor(loop).start()
 
     # 4) Start cloud sync after local config is guaranteed
     # connecting_to_db(file_lock)
@@ -68,6 +115,10 @@ def main():
         array_index
     )
 
+    tray_controller.history = history
+    store.subscribe(tray_controller.on_config_changed)
+    tray_controller.warm_start_path = get_warm_start_path() if storage is None else None
+
     icon = build_tray(tray_controller)
     tray_controller.set_icon(icon)
     threading.Thread(target=icon.run, daemon=True).start()
@@ -78,11 +129,18 @@ def main():
         loop.run_forever()
     finally:
         stop_ble_session()
+        shutdown_macro_worker()
+        if config_watcher:
+            config_watcher.stop()
+        tray_controller.flush_pending()
+        loop_monitor.stop()
+        applog.get_logger("app").info(loop_monitor.report())
         pending = asyncio.all_tasks(loop)
         for t in pending:
             t.cancel()
         loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
         loop.close()
+        applog.stop()
 
 if __name__ == "__main__":
     main()
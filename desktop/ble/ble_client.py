@@ -1,33 +1,39 @@
-import asyncio, os
+import asyncio, os, struct, time
+from typing import NamedTuple
 from bleak import BleakClient, BleakScanner
 from dotenv import load_dotenv
-import json
 
-from desktop.core.paths import get_config_path
+from desktop.core import injection, keymap, metrics
+from desktop.core.log import get_logger
+from desktop.core.metrics import KeypressTrace
+from desktop.ble.macro_worker import MacroWorker, MacroEvent, OVERFLOW_DROP_OLDEST
+from desktop.ble.press_policy import PressPolicy
+from desktop.ble import device_cache
+from desktop.ble.supervisor import ReconnectSupervisor, ReconnectPolicy, STOPPED, DISCONNECTED, FAILED
 from threading import RLock
 
-def _get_pyautogui():
-    """
-    Lazy import pyautogui so tests can import this module on headless Linux CI.
-    Returns None if GUI automation is unavailable.
-    """
-    # On Linux CI, DISPLAY is usually not set => headless => pyautogui import will crash
-    if os.name != "nt" and not os.environ.get("DISPLAY"):
-        return None
-    try:
-        import pyautogui  # type: ignore
-        return pyautogui
-    except Exception:
-        return None
-
-BLE_TASK: asyncio.Task | None = None
-BLE_CLIENT: BleakClient | None = None
-BLE_STOP_EVENT: asyncio.Event | None = None
-APP_STATE: dict | None = None
+log = get_logger("ble")
+
+MACRO_WORKER: MacroWorker | None = None
 address, char_uuid = None, None
 
 load_dotenv()
 
+# Service advertised by the firmware (custom_keyboard.ino SERVICE_UUID); used to filter scans
+SERVICE_UUID = os.getenv("SERVICE_UUID") or "06d527b7-9a06-473b-ae8b-4794bae3fa04"
+WARM_CONNECT_TIMEOUT = 5.0
+SCAN_TIMEOUT = 8.0
+# Generic Attribute service and its Database Hash characteristic (Bluetooth 5.1 GATT caching)
+GATT_SERVICE_UUID = "00001801-0000-1000-8000-00805f9b34fb"
+DB_HASH_CHAR_UUID = "00002b2a-0000-1000-8000-00805f9b34fb"
+# The firmware's stand-in for the hash (its BLE stack doesn't expose 0x2B2A): a GATT layout version
+GATT_LAYOUT_CHAR_UUID = "8acc4ab0-26b1-44a9-8b83-2d94ce03f34a"
+GATT_READY_TIMEOUT = 3.0
+GATT_POLL_INTERVAL = 0.05
+# A start_notify (CCCD write) or disconnect() that never completes must not wedge the session
+NOTIFY_TIMEOUT = 5.0
+DISCONNECT_TIMEOUT = 3.0
+
 def get_ble_settings():
     address = os.getenv("ADDRESS")
     char_uuid = os.getenv("CHAR_UUID")
@@ -49,21 +55,27 @@ def _set_connected(state: dict | None, connected: bool):
 
     gui = state.get("gui_window")
     if gui is None:
-        print("GUI: no window open")
+        log.debug("GUI: no window open")
         return
 
     try:
         if gui.winfo_exists():
             gui.set_connected(connected)
-            print(f"GUI: set_connected({connected}) OK")
+            log.debug("GUI: set_connected(%s) OK", connected)
         else:
-            print("GUI: window does not exist")
+            log.debug("GUI: window does not exist")
     except Exception as e:
-        print("GUI: set_connected failed:", repr(e))
+        log.warning("GUI: set_connected failed: %r", e)
 
 #Verifies if there is a characteristic uuid and what properties it has so it prevents the "it's connected but nothing happens" error 
 async def verify_char_uuid(client, char_uuid: str):
-    service = client.services or await client.get_services()
+    try:
+        service = client.services
+    except Exception as e:
+        # bleak raises until service discovery has finished for this connection
+        raise RuntimeError(f"Services not discovered yet: {e}")
+    if not service:
+        raise RuntimeError("Services not discovered yet.")
     ch_uuid = service.get_characteristic(char_uuid)
     if not ch_uuid:
         raise RuntimeError(f"Characteristic {char_uuid} not found on device.")
@@ -72,39 +84,225 @@ async def verify_char_uuid(client, char_uuid: str):
     if "notify" not in props:
         raise RuntimeError(f"Characteristic {char_uuid} is not notifiable. Props: {props}")
 
-    print(f"GATT OK -> found {char_uuid} with properties {props}")
+    log.info("GATT OK -> found %s with properties %s", char_uuid, props)
+    return ch_uuid
+
+# Polls the discovery result at short intervals instead of sleeping a fixed time.
+# Returns the notify characteristic as soon as it is usable; raises after GATT_READY_TIMEOUT.
+async def wait_for_gatt_ready(client, char_uuid: str, timeout: float | None = None, interval: float = GATT_POLL_INTERVAL):
+    timeout = GATT_READY_TIMEOUT if timeout is None else timeout
+    started = time.perf_counter()
+    deadline = started + timeout
+    while True:
+        try:
+            char = await verify_char_uuid(client, char_uuid)
+            metrics.record_ns("ble.gatt_ready", int((time.perf_counter() - started) * 1e9))
+            return char
+        except RuntimeError as e:
+            if time.perf_counter() >= deadline:
+                raise RuntimeError(f"GATT not ready after {timeout:.1f}s: {e}")
+        await asyncio.sleep(interval)
+
+# Reads the GATT Database Hash, else the firmware's layout version; None if the peripheral has neither
+async def read_gatt_db_hash(client) -> str | None:
+    for uuid in (DB_HASH_CHAR_UUID, GATT_LAYOUT_CHAR_UUID):
+        try:
+            value = await client.read_gatt_char(uuid)
+        except Exception:
+            continue
+        if value:
+            return bytes(value).hex()
+    return None
+
+# BleakClient options for an address: discovery limited to the services we use, and the
+# OS attribute cache allowed only when we have a database hash to validate it against.
+def _client_kwargs(address: str | None) -> dict:
+    kwargs = {"services": [SERVICE_UUID, GATT_SERVICE_UUID]}
+    entry = device_cache.get_gatt_entry(address) if address else None
+    if entry and entry.get("db_hash"):
+        kwargs["winrt"] = {"use_cached_services": True}
+    return kwargs
+
+# Resolves the notify characteristic and keeps the per-address handle cache in sync.
+# If we trusted the OS cache and the database hash or the characteristic's handle no longer
+# matches, the cache is dropped and the attempt fails so the next connect does a fresh discovery.
+async def resolve_notify_char(client, char_uuid: str):
+    address = getattr(client, "address", None)
+    cached = device_cache.get_gatt_entry(address) if address else None
+    used_cache = bool(cached and cached.get("db_hash"))
+
+    try:
+        char = await wait_for_gatt_ready(client, char_uuid)
+    except RuntimeError:
+        if used_cache:
+            device_cache.forget_gatt(address)
+        raise
+
+    db_hash = await read_gatt_db_hash(client)
+    if used_cache and (db_hash != cached.get("db_hash") or char.handle != cached.get("handle")):
+        device_cache.forget_gatt(address)
+        raise RuntimeError("GATT database changed since last connect; rediscovering services.")
+
+    if address:
+        device_cache.remember_gatt(address, char_uuid, char.handle, db_hash)
+    return char
     
-async def find_device_address_by_name(name: str, timeout: float = 8.0) -> str:
-    devices = await BleakScanner.discover(timeout=timeout)
-    for d in devices:
-        if (d.name or "").strip() == name:
-            return d.address
-    raise RuntimeError(f"Device '{name}' not found in scan.")
-
-# Used to initiate the device connection and BLE connection
-async def connect(
+# Scans until the first advertisement that carries the firmware's service UUID or the device name.
+# Returns as soon as it is seen instead of waiting out the whole timeout.
+# An advertisement that names a *different* device never matches, so several pads can share the service UUID.
+def _advertisement_matches(device, adv, name: str) -> bool:
+    adv_name = (adv.local_name or device.name or "").strip()
+    if adv_name:
+        return adv_name == name
+    service_uuid = SERVICE_UUID.lower()
+    return service_uuid in [u.lower() for u in (adv.service_uuids or [])]
+
+async def find_device_by_name(name: str, timeout: float = SCAN_TIMEOUT, exclude: set[str] | None = None):
+    exclude = exclude or set()
+
+    def match(device, adv):
+        return device.address not in exclude and _advertisement_matches(device, adv, name)
+
+    device = await BleakScanner.find_device_by_filter(match, timeout=timeout, service_uuids=[SERVICE_UUID])
+    if device is None:
+        # Some adapters drop the service UUID from passive advertisements; retry on name alone
+        device = await BleakScanner.find_device_by_filter(match, timeout=timeout)
+    if device is None:
+        raise RuntimeError(f"Device '{name}' not found in scan.")
+    return device
+
+async def find_device_address_by_name(name: str, timeout: float = SCAN_TIMEOUT) -> str:
+    device = await find_device_by_name(name, timeout=timeout)
+    return device.address
+
+def _candidate_addresses(device_name: str, seed_address: str | None) -> list[str]:
+    candidates = []
+    for a in (device_cache.get_cached_address(device_name), seed_address):
+        if a and a not in candidates:
+            candidates.append(a)
+    return candidates
+
+def _report_connect_time(path: str, started: float, address: str):
+    elapsed = time.perf_counter() - started
+    metrics.record_ns(f"ble.connect.{path}", int(elapsed * 1e9))
+    log.info("Connected to %s via %s path in %.2fs", address, path, elapsed)
+
+# Listens passively (no connection attempts) until the pad advertises.
+# Returns the advertised device, or None on timeout / stop.
+async def wait_for_advertisement(
     device_name: str,
-    char_uuid: str,
-    state,
-    FILE_LOCK: RLock,
+    timeout: float,
+    stop_event: asyncio.Event | None = None,
+    seed_address: str | None = None,
+    exclude: set[str] | None = None,
+):
+    loop = asyncio.get_running_loop()
+    found = loop.create_future()
+    known = set(_candidate_addresses(device_name, seed_address))
+    exclude = exclude or set()
+
+    def on_detect(device, adv):
+        if found.done() or device.address in exclude:
+            return
+        if device.address in known or _advertisement_matches(device, adv, device_name):
+            found.set_result(device)
+
+    scanner = BleakScanner(detection_callback=on_detect)
+    await scanner.start()
+    waiters = [found]
+    stop_task = None
+    if stop_event is not None:
+        stop_task = asyncio.ensure_future(stop_event.wait())
+        waiters.append(stop_task)
+    try:
+        await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if stop_task:
+            stop_task.cancel()
+        try:
+            await scanner.stop()
+        except Exception as e:
+            log.warning("Failed to stop advertisement scanner: %s", e)
+
+    if found.done():
+        log.info("Saw advertisement from %s", found.result().address)
+        return found.result()
+    found.cancel()
+    return None
+
+# Connects to the pad as fast as possible and returns the connected client.
+# Advert path: connect straight to a device we just saw advertising.
+# Warm path: direct connect to the last good (or ADDRESS) address, no scan.
+# Cold path: filtered scan that stops at the first matching advertisement.
+async def open_client(session: "BleSession", on_disconnect, device=None):
+    device_name = session.device_name
+    exclude = SESSIONS.addresses_in_use(exclude=session)
+    started = time.perf_counter()
+
+    if device is not None:
+        log.info("Connecting to %s ...", device.address)
+        client = BleakClient(device, timeout=WARM_CONNECT_TIMEOUT, disconnected_callback=on_disconnect, **_client_kwargs(device.address))
+        session.client = client
+        try:
+            await client.connect()
+            _report_connect_time("advert", started, device.address)
+            device_cache.remember_address(device_name, device.address)
+            return client
+        except Exception as e:
+            log.warning("Connect to advertised %s failed: %s", device.address, e)
+
+    for candidate in _candidate_addresses(device_name, session.seed_address):
+        if candidate in exclude:
+            continue
+        log.info("Connecting to %s ...", candidate)
+        client = BleakClient(candidate, timeout=WARM_CONNECT_TIMEOUT, disconnected_callback=on_disconnect, **_client_kwargs(candidate))
+        session.client = client
+        try:
+            await client.connect()
+        except Exception as e:
+            log.warning("Direct connect to %s failed: %s", candidate, e)
+            continue
+        _report_connect_time("warm", started, candidate)
+        device_cache.remember_address(device_name, candidate)
+        return client
+
+    device = await find_device_by_name(device_name, exclude=exclude)
+    log.info("Connecting to %s ...", device.address)
+    client = BleakClient(device, timeout=20.0, disconnected_callback=on_disconnect, **_client_kwargs(device.address))
+    session.client = client
+    await client.connect()
+    _report_connect_time("cold", started, device.address)
+    device_cache.remember_address(device_name, device.address)
+    return client
+
+# Used to initiate the device connection and BLE connection.
+# Runs one connection for the session and returns how it ended: STOPPED, DISCONNECTED or FAILED.
+async def connect(
+    session: "BleSession",
+    char_uuid: str | None = None,
     on_connected=None,
     on_disconnected=None,
-    on_error=None
-):
-    global BLE_CLIENT, BLE_STOP_EVENT, BLE_TASK
-
-    BLE_STOP_EVENT = asyncio.Event()
-    address, char_uuid = get_ble_settings()
+    on_error=None,
+    device=None,
+) -> str:
+    state = session.state
+    stop_event = session.stop_event
+    _, env_char_uuid = get_ble_settings()
+    char_uuid = char_uuid or env_char_uuid
+    outcome = FAILED
+    closed = False
+    disc_task = stop_task = None
 
     try:
-        address = await find_device_address_by_name(device_name, timeout=8.0)
-        print(f"Connecting to {address} ...")
-
         disc = asyncio.Event()
 
         def on_disconnect(_client):
-            print("Device disconnected.")
-            _set_connected(state, False)
+            # bleak may fire this after the attempt ended (e.g. from our own disconnect());
+            # by then the session state belongs to the next attempt
+            if closed:
+                return
+            log.info("Device %s disconnected.", session.device_name)
+            session.set_connected(False)
             # notify controller
             if on_disconnected:
                 try:
@@ -113,12 +311,9 @@ async def connect(
                     pass
             disc.set()
 
-        client = BleakClient(address, timeout=20.0, disconnected_callback=on_disconnect)
-        BLE_CLIENT = client
-
-        await client.connect()
-        print("Connected to ESP32 Macro Pad!")
-        _set_connected(state, True)
+        client = await open_client(session, on_disconnect, device=device)
+        log.info("Connected to ESP32 Macro Pad %s!", session.device_name)
+        session.set_connected(True)
 
         # notify controller
         if on_connected:
@@ -127,37 +322,35 @@ async def connect(
             except Exception:
                 pass
 
-        await asyncio.sleep(0.8)
+        notify_char = await resolve_notify_char(client, char_uuid)
 
-        # Retry service discovery a couple times (ESP32 often needs it)
-        for attempt in range(1, 4):
-            try:
-                await verify_char_uuid(client, char_uuid)
-                break
-            except Exception as e:
-                if attempt == 3:
-                    raise
-                print(f"GATT not ready yet (attempt {attempt}): {e}")
-                await asyncio.sleep(0.8)
-
-        handler = make_notification_handler(state, FILE_LOCK)
-        await client.start_notify(char_uuid, handler)
-        print("Listening for notifications...")
+        recorder = session.open_recorder()
+        handler = make_notification_handler(
+            state,
+            session.file_lock,
+            tracker=session.new_tracker(),
+            profile_for=session.active_profile,
+            recorder=recorder,
+        )
+        try:
+            await asyncio.wait_for(client.start_notify(notify_char, handler), NOTIFY_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"start_notify timed out after {NOTIFY_TIMEOUT:.1f}s")
+        log.info("Listening for notifications...")
 
         disc_task = asyncio.create_task(disc.wait())
-        stop_task = asyncio.create_task(BLE_STOP_EVENT.wait())
+        stop_task = asyncio.create_task(stop_event.wait())
 
         done, pending = await asyncio.wait(
             [disc_task, stop_task],
             return_when=asyncio.FIRST_COMPLETED,
         )
 
-        for task in pending:
-            task.cancel()
-
+        outcome = DISCONNECTED
         # If we stopped via stop event (manual disconnect), you may want to notify too:
         if stop_task in done:
-            _set_connected(state, False)
+            outcome = STOPPED
+            session.set_connected(False)
             if on_disconnected:
                 try:
                     on_disconnected()
@@ -165,8 +358,8 @@ async def connect(
                     pass
 
     except Exception as e:
-        print("BLE session error:", e)
-        _set_connected(state, False)
+        log.error("BLE session error: %s", e)
+        session.set_connected(False)
         # notify controller
         if on_error:
             try:
@@ -175,54 +368,364 @@ async def connect(
                 pass
 
     finally:
-        if BLE_CLIENT:
-            if BLE_CLIENT.is_connected:
+        closed = True
+        # Also reached on cancellation (stop_ble_session), so the waiters are cancelled here
+        for task in (disc_task, stop_task):
+            if task and not task.done():
+                task.cancel()
+
+        client = session.client
+        if client:
+            if client.is_connected:
+                try:
+                    await asyncio.wait_for(client.stop_notify(char_uuid), DISCONNECT_TIMEOUT)
+                except Exception as e:
+                    log.warning("Failed to stop notify: %s", e)
                 try:
-                    await BLE_CLIENT.stop_notify(char_uuid)
+                    await asyncio.wait_for(client.disconnect(), DISCONNECT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    log.warning("disconnect() did not finish within %.1fs; abandoning client.", DISCONNECT_TIMEOUT)
                 except Exception as e:
-                    print("Failed to stop notify:", e)
-                await BLE_CLIENT.disconnect()
-
-        BLE_CLIENT = None
-        BLE_STOP_EVENT = None
-        BLE_TASK = None
-        print("BLE disconnected (session ended).")
-        _set_connected(state, False)
+                    log.warning("Failed to disconnect: %s", e)
+
+        session.client = None
+        session.close_recorder()
+        log.info("BLE disconnected (session %s ended).", session.device_name)
+        session.set_connected(False)
         # (don’t call on_disconnected here again, or you’ll double-notify)
 
+    return outcome
+
         
-# Gets the button ID and activates the trigger_macro function
-def make_notification_handler(state, FILE_LOCK: RLock):
+# ---- Button event protocol ----
+# Legacy firmware sends ASCII "BTN:n" per press.
+# v1 binary payload (little-endian), several events per notification:
+#   byte 0     protocol version (0x01) - never printable, so it can't be confused with text
+#   byte 1     event count N
+#   N x 4      [button index u8][flags u8, bit0 = pressed][sequence u16]
+PROTOCOL_V1 = 0x01
+FLAG_PRESSED = 0x01
+_V1_EVENT = struct.Struct("<BBH")
+# Pre-built ids so decoding a binary event doesn't format a new string every press
+_BUTTON_IDS = tuple(f"BTN:{i}" for i in range(256))
+
+class ButtonEvent(NamedTuple):
+    button_id: str
+    pressed: bool
+    seq: int | None
+
+def decode_payload(data) -> list[ButtonEvent]:
+    if not data:
+        return []
+    if data[0] == PROTOCOL_V1:
+        count = data[1] if len(data) > 1 else 0
+        end = 2 + _V1_EVENT.size * count
+        if count == 0 or len(data) < end:
+            raise ValueError(f"Truncated v1 payload: {bytes(data).hex()}")
+        return [
+            ButtonEvent(_BUTTON_IDS[index], bool(flags & FLAG_PRESSED), seq)
+            for index, flags, seq in _V1_EVENT.iter_unpack(memoryview(data)[2:end])
+        ]
+    if data[0] < 0x20:
+        raise ValueError(f"Unknown protocol version {data[0]}")
+    return [ButtonEvent(bytes(data).decode("utf-8").strip(), True, None)]
+
+class SequenceTracker:
+    """
+    Follows the 16-bit sequence numbers of one connection and counts events
+    that never arrived (gaps) or arrived twice / out of order.
+    """
+    def __init__(self):
+        self.expected: int | None = None
+        self.received = 0
+        self.lost = 0
+        self.duplicates = 0
+
+    # Returns False for a duplicate / stale event that should be ignored
+    def observe(self, seq: int | None) -> bool:
+        self.received += 1
+        if seq is None:
+            return True
+        if self.expected is not None:
+            gap = (seq - self.expected) & 0xFFFF
+            if gap >= 0x8000:
+                self.duplicates += 1
+                return False
+            if gap:
+                self.lost += gap
+                log.warning("Lost %d button event(s) before seq %d", gap, seq)
+        self.expected = (seq + 1) & 0xFFFF
+        return True
+
+    def stats(self) -> dict:
+        return {"received": self.received, "lost": self.lost, "duplicates": self.duplicates}
+
+def _execute_macro_event(event: MacroEvent):
+    trigger_macro(event.button_id, event.profile, event.file_lock, event.trace)
+
+# Returns the shared injection worker, starting it on first use.
+# MACRO_QUEUE_SIZE / MACRO_OVERFLOW (drop-oldest | drop-newest | coalesce) tune the queue;
+# PRESS_MIN_INTERVAL_MS / PRESS_MAX_AGE_MS (time queued on the desktop) / PRESS_COALESCE tune the press policy in front of it.
+def get_macro_worker() -> MacroWorker:
+    global MACRO_WORKER
+    if MACRO_WORKER is None:
+        MACRO_WORKER = MacroWorker(
+            _execute_macro_event,
+            maxsize=int(os.getenv("MACRO_QUEUE_SIZE") or 64),
+            overflow=os.getenv("MACRO_OVERFLOW") or OVERFLOW_DROP_OLDEST,
+            policy=PressPolicy.from_env(),
+        )
+        metrics.register_gauges("macro_queue", MACRO_WORKER.stats)
+    return MACRO_WORKER.start()
+
+def shutdown_macro_worker(timeout: float = 2.0):
+    global MACRO_WORKER
+    if MACRO_WORKER is not None:
+        MACRO_WORKER.stop(timeout)
+        metrics.unregister_gauges("macro_queue")
+        MACRO_WORKER = None
+
+# Decodes the button events and hands presses to the injection worker.
+# Runs on the asyncio loop, so it only decodes and enqueues; trigger_macro runs on the worker thread.
+# profile_for returns the profile to use for each press (a session's pinned profile); defaults to state["activeProfile"].
+def make_notification_handler(
+    state,
+    FILE_LOCK: RLock,
+    worker: MacroWorker | None = None,
+    tracker: SequenceTracker | None = None,
+    profile_for=None,
+    recorder=None,
+):
+    worker = worker or get_macro_worker()
+    tracker = tracker or SequenceTracker()
+    profile_for = profile_for or (lambda: state["activeProfile"])
+
     def notification(sender, data):   
-        msg = data.decode("utf-8").strip()
-        print(f"Received {msg}")
-        print(f"Active Profile; {state['activeProfile']}")
-        trigger_macro(msg,state["activeProfile"], FILE_LOCK)
+        received = time.perf_counter_ns()
+        if recorder:
+            recorder.record(data)
+        try:
+            events = decode_payload(data)
+        except Exception as e:
+            log.warning("Bad button payload: %s", e)
+            return
+        decoded = time.perf_counter_ns()
+
+        for event in events:
+            if not tracker.observe(event.seq) or not event.pressed:
+                continue
+            trace = KeypressTrace(received)
+            trace.decoded = decoded
+            profile = profile_for()
+            log.debug("Received %s", event.button_id, profile=profile, seq=event.seq)
+            worker.submit(MacroEvent(event.button_id, profile, FILE_LOCK, trace))
     return notification
 
-# Reads buttonControls.json, gets the button_id and profile, finds the action and executes it
-def trigger_macro(button_id, profile, FILE_LOCK):
-    with FILE_LOCK:
-        with get_config_path().open("r", encoding="utf-8") as f:
-            config_file = json.load(f)
-    action = config_file.get("profiles",{}).get(profile).get(button_id)
-    print(action)
+# Looks up the button in the compiled keymap for the profile and executes it.
+# The keymap is swapped in memory whenever the config is written, so no disk or JSON work happens here;
+# the Action it holds already has canonical key names and VK codes.
+# If a KeypressTrace is passed, the lookup and injection stages are timed into the latency histograms.
+# The chord goes out through the process-wide injection backend (KEY_BACKEND).
+def trigger_macro(button_id, profile, FILE_LOCK, trace: KeypressTrace | None = None):
+    action = keymap.lookup_action(profile, button_id, FILE_LOCK)
+    if trace:
+        trace.looked_up = time.perf_counter_ns()
     if action:
-        keys = action.get("keys")
-        if keys:
-            pyautogui = _get_pyautogui()
-            if not pyautogui:
-                print("GUI automation unavailable: cannot trigger macro.")
-                return
-            
-            print(f"Triggering {button_id}: printing {keys}")
-            pyautogui.hotkey(*keys)
-        else:
-            print("keys is undefined")
+        backend = injection.get_backend()
+        if not backend:
+            log.error("GUI automation unavailable: cannot trigger macro.")
+            if trace:
+                trace.finish()
+            return
+
+        log.debug("Triggering %s", button_id, keys=action.label)
+        if trace:
+            trace.inject_start = time.perf_counter_ns()
+        backend.send_action(action)
+        if trace:
+            trace.inject_end = time.perf_counter_ns()
+            trace.finish()
     else:
-        print("No action was mapped for this button")
+        log.debug("No action mapped for %s", button_id, profile=profile)
+        if trace:
+            trace.finish()
         
-# Helper function to do connect 
+class BleSession:
+    """
+    One macro pad on the shared asyncio loop: its own stop event, reconnect
+    supervisor, BleakClient and notification pipeline (decoder + sequence tracker).
+    Key injection still goes through the shared macro worker so chords from
+    different pads never interleave.
+
+    profile, when set, pins this pad to that profile instead of following
+    state["activeProfile"].
+    """
+    def __init__(
+        self,
+        device_name: str,
+        state,
+        file_lock: RLock,
+        profile: str | None = None,
+        seed_address: str | None = None,
+        policy: ReconnectPolicy | None = None,
+    ):
+        self.device_name = device_name
+        self.state = state
+        self.file_lock = file_lock
+        self.profile = profile
+        self.seed_address = seed_address
+        self.policy = policy
+        self.client: BleakClient | None = None
+        self.connected = False
+        self.stop_event: asyncio.Event = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.supervisor: ReconnectSupervisor | None = None
+        # Sequence numbers restart at 0 whenever the pad reboots, so each connection gets its own
+        # tracker; counts from earlier connections are kept here for the gauge
+        self.tracker: SequenceTracker | None = None
+        self.event_totals = {"received": 0, "lost": 0, "duplicates": 0}
+        self.recorder = None
+
+    def new_tracker(self) -> SequenceTracker:
+        if self.tracker:
+            for key, value in self.tracker.stats().items():
+                self.event_totals[key] += value
+        self.tracker = SequenceTracker()
+        return self.tracker
+
+    def event_stats(self) -> dict:
+        current = self.tracker.stats() if self.tracker else {}
+        return {key: value + current.get(key, 0) for key, value in self.event_totals.items()}
+
+    # Records raw notifications for simulator replay when BLE_RECORD_DIR is set
+    def open_recorder(self):
+        record_dir = os.getenv("BLE_RECORD_DIR")
+        if not record_dir:
+            return None
+        from desktop.ble.simulator import EventRecorder
+        path = os.path.join(record_dir, f"{self.device_name}-{int(time.time())}.jsonl")
+        self.recorder = EventRecorder(path)
+        log.info("Recording BLE events to %s", path)
+        return self.recorder
+
+    def close_recorder(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def active_profile(self) -> str | None:
+        return self.profile or self.state.get("activeProfile")
+
+    def is_running(self) -> bool:
+        return bool(self.task and not self.task.done())
+
+    @property
+    def address(self) -> str | None:
+        client = self.client
+        return getattr(client, "address", None) if client and client.is_connected else None
+
+    # The app-wide "connected" flag is true while any pad is connected
+    def set_connected(self, connected: bool):
+        self.connected = connected
+        _set_connected(self.state, connected or SESSIONS.any_connected())
+
+    async def run(self, char_uuid=None, on_connected=None, on_disconnected=None, on_error=None):
+        # Per-attempt errors are retried quietly; the controller only hears about it if we give up
+        async def connect_once(device, on_link_up):
+            def connected():
+                on_link_up()
+                if on_connected:
+                    on_connected()
+
+            return await connect(
+                self,
+                char_uuid,
+                on_connected=connected,
+                on_disconnected=on_disconnected,
+                device=device,
+            )
+
+        async def wait_for_device(timeout):
+            return await wait_for_advertisement(
+                self.device_name,
+                timeout,
+                self.stop_event,
+                seed_address=self.seed_address,
+                exclude=SESSIONS.addresses_in_use(exclude=self),
+            )
+
+        self.supervisor = ReconnectSupervisor(
+            connect_once,
+            wait_for_device,
+            self.stop_event,
+            policy=self.policy or ReconnectPolicy(retry_budget=int(os.getenv("BLE_RETRY_BUDGET") or 8)),
+            on_give_up=on_error,
+        )
+        metrics.register_gauges(f"ble_supervisor.{self.device_name}", self.supervisor.stats)
+        metrics.register_gauges(f"ble_events.{self.device_name}", self.event_stats)
+        try:
+            return await self.supervisor.run()
+        finally:
+            log.info("BLE supervisor for %s stopped.", self.device_name)
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        if not self.stop_event.is_set():
+            self.stop_event.set()
+
+    def stats(self) -> dict:
+        return {
+            "device": self.device_name,
+            "profile": self.active_profile(),
+            "connected": self.connected,
+            "address": self.address,
+        }
+
+
+class SessionRegistry:
+    """Live BleSessions keyed by device name. Only touched from the asyncio loop thread."""
+    def __init__(self):
+        self._sessions: dict[str, BleSession] = {}
+
+    def get(self, device_name: str) -> BleSession | None:
+        return self._sessions.get(device_name)
+
+    def all(self) -> list[BleSession]:
+        return list(self._sessions.values())
+
+    def add(self, session: BleSession):
+        self._sessions[session.device_name] = session
+
+    def remove(self, session: BleSession):
+        if self._sessions.get(session.device_name) is session:
+            del self._sessions[session.device_name]
+
+    def any_connected(self) -> bool:
+        return any(s.connected for s in self._sessions.values())
+
+    # Addresses currently held by other sessions, so two sessions never grab the same pad
+    def addresses_in_use(self, exclude: BleSession | None = None) -> set[str]:
+        return {s.address for s in self._sessions.values() if s is not exclude and s.address}
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+SESSIONS = SessionRegistry()
+
+
+def _split_device_names(name) -> list[str]:
+    if isinstance(name, (list, tuple)):
+        return [n for n in name if n]
+    return [n.strip() for n in str(name or "").split(",") if n.strip()]
+
+
+# Helper function to do connect.
+# name may list several pads ("Left,Right"); each gets its own session. Returns the session task
+# (or a list of tasks when several names are given).
+# profile pins the pad(s) to a profile; by default the binding stored in device_cache.json is used.
+# policy overrides the reconnect backoff (BLE_RETRY_BUDGET otherwise).
 def start_ble_session(
     name,
     FILE_LOCK: RLock,
@@ -230,45 +733,71 @@ def start_ble_session(
     LOOP,
     on_connected=None,
     on_disconnected=None,
-    on_error=None
+    on_error=None,
+    profile: str | None = None,
+    address: str | None = None,
+    policy: ReconnectPolicy | None = None,
 ):
-    global BLE_TASK, APP_STATE
-    APP_STATE = state
-
-    if BLE_TASK and not BLE_TASK.done():
-        print("BLE session already running.")
-        return BLE_TASK
+    names = _split_device_names(name)
+    if len(names) > 1:
+        # Each pad finds its own address; ADDRESS names one device and would send the first pad to it
+        return [
+            _start_session(n, FILE_LOCK, state, LOOP, on_connected, on_disconnected, on_error, profile, None, policy)
+            for n in names
+        ]
+    device_name = names[0] if names else "Macropad"
+
+    # Only a single-pad setup can use the ADDRESS env var as its seed
+    if address is None and len(SESSIONS) == 0:
+        address = os.getenv("ADDRESS")
+    return _start_session(device_name, FILE_LOCK, state, LOOP, on_connected, on_disconnected, on_error, profile, address, policy)
+
+
+def _start_session(device_name, FILE_LOCK, state, LOOP, on_connected, on_disconnected, on_error, profile, address, policy):
+    session = SESSIONS.get(device_name)
+    if session and session.is_running():
+        log.info("BLE session for %s already running.", device_name)
+        return session.task
+
+    session = BleSession(
+        device_name,
+        state,
+        FILE_LOCK,
+        profile=profile or device_cache.get_device_profile(device_name),
+        seed_address=address,
+        policy=policy,
+    )
+    SESSIONS.add(session)
 
     async def connect_wrapper():
-        from bleak.backends.winrt.util import uninitialize_sta
-        uninitialize_sta()
-        await asyncio.sleep(0.5)
-        await connect(
-            name,
-            char_uuid,
-            state,
-            FILE_LOCK,
-            on_connected=on_connected,
-            on_disconnected=on_disconnected,
-            on_error=on_error
-        )
-
-    BLE_TASK = LOOP.create_task(connect_wrapper())
-    return BLE_TASK
-
-
-# Helper function to disconnect 
-def stop_ble_session():
-    global BLE_TASK, BLE_STOP_EVENT, APP_STATE
-
-    _set_connected(APP_STATE, False)
-
-    if BLE_TASK and not BLE_TASK.done():
-        BLE_TASK.cancel()
-
-    if BLE_STOP_EVENT and not BLE_STOP_EVENT.is_set():
-        BLE_STOP_EVENT.set()
-        print("Requesting BLE session cancel...")
+        if os.name == "nt":
+            from bleak.backends.winrt.util import uninitialize_sta
+            uninitialize_sta()
+        try:
+            await session.run(
+                char_uuid,
+                on_connected=on_connected,
+                on_disconnected=on_disconnected,
+                on_error=on_error,
+            )
+        finally:
+            SESSIONS.remove(session)
+            metrics.unregister_gauges(f"ble_supervisor.{device_name}")
+            metrics.unregister_gauges(f"ble_events.{device_name}")
+
+    session.task = LOOP.create_task(connect_wrapper())
+    return session.task
+
+
+# Helper function to disconnect. Stops one pad by name, or every pad when name is None.
+def stop_ble_session(name=None):
+    targets = SESSIONS.all() if name is None else [s for s in map(SESSIONS.get, _split_device_names(name)) if s]
+
+    if not targets:
+        log.info("No BLE session to cancel.")
         return
-    
-    print("No BLE session to cancel.")
\ No newline at end of file
+
+    for session in targets:
+        session.set_connected(False)
+        session.stop()
+        log.info("Requesting BLE session cancel for %s...", session.device_name)
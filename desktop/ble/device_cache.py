@@ -0,0 +1,204 @@
+from __future__ import annotations
+import copy
+import itertools
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from desktop.core import config_io
+from desktop.core.log import get_logger
+from desktop.core.paths import get_device_cache_path
+
+log = get_logger("device_cache")
+
+# device_cache.json lives next to buttonControls.json:
+# {
+#   "devices": {"Macropad": {"address": "AA:BB:CC:DD:EE:FF", "updated": 1700000000.0, "profile": "media"}},
+#   "gatt": {"AA:BB:CC:DD:EE:FF": {"char_uuid": "...", "handle": 42, "db_hash": "ab12..."}}
+# }
+# Older files kept the devices at the top level next to "gatt"; they are read as
+# such and rewritten in this layout by the next change.
+#
+# Changes are made in memory and written by the "device-cache-writer" thread:
+# they happen on the asyncio loop (connects, GATT resolution), and an fsync'ed
+# rewrite there would stall every pad's notifications. flush() writes now.
+_CACHE_LOCK = threading.Lock()
+# path -> ((size, mtime_ns), parsed content); connects read the cache several times,
+# so the file is only parsed again when it changes
+_PARSED: Dict[str, Tuple[Tuple[int, int] | None, Dict[str, Any]]] = {}
+# path -> id of its latest unwritten change; the in-memory content wins over the
+# file until a write of that change lands
+_DIRTY: Dict[str, int] = {}
+_CHANGE_IDS = itertools.count(1)
+_WRITER_COND = threading.Condition(_CACHE_LOCK)
+_WRITER: threading.Thread | None = None
+# One file write at a time (the writer thread and an explicit flush() may overlap)
+_FLUSH_LOCK = threading.Lock()
+
+
+def _layout(data: Any) -> Dict[str, Any]:
+    if not isinstance(data, dict):
+        return {"devices": {}, "gatt": {}}
+    if isinstance(data.get("devices"), dict):
+        return {"devices": data["devices"], "gatt": data.get("gatt") if isinstance(data.get("gatt"), dict) else {}}
+    gatt = data.get("gatt")
+    devices = {k: v for k, v in data.items() if k != "gatt" and isinstance(v, dict)}
+    return {"devices": devices, "gatt": gatt if isinstance(gatt, dict) else {}}
+
+
+def _read(p) -> Dict[str, Any]:
+    key = str(p)
+    parsed = _PARSED.get(key)
+    if key in _DIRTY and parsed:
+        return parsed[1]
+    current = config_io.stamp(p)
+    if current is None:
+        return {"devices": {}, "gatt": {}}
+    if parsed and parsed[0] == current:
+        return parsed[1]
+    try:
+        data = _layout(json.loads(p.read_text(encoding="utf-8")))
+    except Exception as e:
+        log.warning("Failed to load device cache: %s", e)
+        return {"devices": {}, "gatt": {}}
+    _PARSED[key] = (current, data)
+    return data
+
+
+def load_device_cache() -> Dict[str, Any]:
+    with _CACHE_LOCK:
+        return copy.deepcopy(_read(get_device_cache_path()))
+
+
+# Makes data the current content right away and has the writer thread persist it
+def save_device_cache(data: Dict[str, Any]) -> None:
+    with _CACHE_LOCK:
+        _set(get_device_cache_path(), copy.deepcopy(_layout(data)))
+
+
+# Caller holds _CACHE_LOCK
+def _set(p, data: Dict[str, Any]) -> None:
+    global _WRITER
+    key = str(p)
+    previous = _PARSED.get(key)
+    _PARSED[key] = (previous[0] if previous else None, data)
+    _DIRTY[key] = next(_CHANGE_IDS)
+    if _WRITER is None:
+        _WRITER = threading.Thread(target=_run_writer, name="device-cache-writer", daemon=True)
+        _WRITER.start()
+    _WRITER_COND.notify_all()
+
+
+def _run_writer():
+    global _WRITER
+    tried: Dict[str, int] = {}
+    while True:
+        with _CACHE_LOCK:
+            # A failed write is retried with the next change rather than in a loop
+            if not _WRITER_COND.wait_for(lambda: any(tried.get(k) != c for k, c in _DIRTY.items()),
+                                         timeout=30.0):
+                _WRITER = None  # idle; the next change starts a new writer
+                return
+        tried = flush()
+
+
+# Writes every pending change now (shutdown, warm-start save, tests); returns what it tried
+def flush() -> Dict[str, int]:
+    with _FLUSH_LOCK:
+        with _CACHE_LOCK:
+            pending = [(key, change, copy.deepcopy(_PARSED[key][1]))
+                       for key, change in _DIRTY.items() if key in _PARSED]
+        for key, change, data in pending:
+            path = Path(key)
+            try:
+                config_io.write_json(path, data, backup=False)
+            except Exception as e:
+                # Stays dirty: the in-memory copy is still current and the next change retries
+                log.warning("Failed to save device cache: %s", e)
+                continue
+            with _CACHE_LOCK:
+                if _DIRTY.get(key) == change:
+                    del _DIRTY[key]
+                    _PARSED[key] = (config_io.stamp(path), _PARSED[key][1])
+        return {key: change for key, change, _ in pending}
+
+
+# Seeds the parsed copy (warm start); ignored unless the file still has the given (size, mtime)
+def prime(data: Dict[str, Any], file_stamp: Tuple[int, int] | None) -> bool:
+    p = get_device_cache_path()
+    if file_stamp is None or config_io.stamp(p) != tuple(file_stamp):
+        return False
+    with _CACHE_LOCK:
+        if str(p) in _DIRTY:
+            return False
+        _PARSED[str(p)] = (tuple(file_stamp), copy.deepcopy(_layout(data)))
+    return True
+
+
+# Runs edit(data) on a copy of the current content; the copy becomes current if edit returns True
+def _edit(edit) -> None:
+    with _CACHE_LOCK:
+        p = get_device_cache_path()
+        data = copy.deepcopy(_read(p))
+        if edit(data):
+            _set(p, data)
+
+
+def get_cached_address(device_name: str) -> Optional[str]:
+    entry = load_device_cache()["devices"].get(device_name) or {}
+    return entry.get("address")
+
+
+# Records the last address we successfully connected to for this device name
+def remember_address(device_name: str, address: str) -> None:
+    def edit(data):
+        entry = data["devices"].setdefault(device_name, {})
+        if entry.get("address") == address:
+            return False
+        entry["address"] = address
+        entry["updated"] = time.time()
+        return True
+    _edit(edit)
+
+
+def forget_address(device_name: str) -> None:
+    _edit(lambda data: data["devices"].pop(device_name, None) is not None)
+
+
+def get_gatt_entry(address: str) -> Optional[Dict[str, Any]]:
+    return load_device_cache()["gatt"].get(address)
+
+
+# Stores the resolved notify characteristic handle for this address, keyed by the GATT database hash
+def remember_gatt(address: str, char_uuid: str, handle: int, db_hash: str | None) -> None:
+    entry = {"char_uuid": char_uuid, "handle": handle, "db_hash": db_hash}
+
+    def edit(data):
+        if data["gatt"].get(address) == entry:
+            return False
+        data["gatt"][address] = entry
+        return True
+    _edit(edit)
+
+
+def forget_gatt(address: str) -> None:
+    _edit(lambda data: data["gatt"].pop(address, None) is not None)
+
+
+def get_device_profile(device_name: str) -> Optional[str]:
+    entry = load_device_cache()["devices"].get(device_name) or {}
+    return entry.get("profile")
+
+
+# Pins a pad to a profile (None follows the app-wide active profile)
+def set_device_profile(device_name: str, profile: str | None) -> None:
+    def edit(data):
+        entry = data["devices"].setdefault(device_name, {})
+        if profile:
+            entry["profile"] = profile
+        else:
+            entry.pop("profile", None)
+        return True
+    _edit(edit)
@@ -0,0 +1,275 @@
+"""
+Scripted BLE faults against the simulator, with recovery-time SLOs.
+
+FaultHarness starts a real session (supervisor, connect(), notification
+handler) against a SimulatedPad, injects one fault at a time and measures:
+
+    detect_s   fault injected -> the session notices (link marked down / attempt failed)
+    recover_s  fault injected -> notifications flowing again (or the session fully stopped)
+
+On exit it stops the session and lists anything left behind in `leaks`
+(tasks, scanners, notify subscriptions, open clients, gauges, live
+disconnect callbacks), so tests can assert both the SLO and a clean teardown:
+
+    backend = SimulatedBackend()
+    pad = backend.add_pad("Macropad")
+    async with FaultHarness(backend, pad) as h:
+        result = await h.discovery_failures(2)
+    assert not result.violations(SLOS["discovery_failures"])
+    assert h.leaks == []
+
+The harness shortens the GATT / notify / disconnect timeouts and the
+reconnect backoff so every scenario finishes well under a second.
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+from desktop.ble import ble_client
+from desktop.ble.simulator import SimulatedBackend, SimulatedPad, steady
+from desktop.ble.supervisor import ReconnectPolicy
+from desktop.core import metrics
+
+# ble_client module timeouts used while the harness is active
+FAULT_TIMEOUTS = {
+    "GATT_READY_TIMEOUT": 0.1,
+    "NOTIFY_TIMEOUT": 0.1,
+    "DISCONNECT_TIMEOUT": 0.1,
+}
+
+
+def fast_policy() -> ReconnectPolicy:
+    return ReconnectPolicy(base_delay=0.02, max_delay=0.2, jitter=0.0, retry_budget=8, listen_window=5.0)
+
+
+class FaultSLO(NamedTuple):
+    detect_s: float
+    recover_s: float
+
+
+class FaultResult(NamedTuple):
+    fault: str
+    detect_s: float | None     # None: never detected within the harness timeout
+    recover_s: float | None    # None: never recovered within the harness timeout
+    failed_attempts: int = 0
+    lost_events: int = 0
+
+    def violations(self, slo: FaultSLO) -> List[str]:
+        out = []
+        if self.detect_s is None or self.detect_s > slo.detect_s:
+            out.append(f"{self.fault}: detect {self.detect_s} s > {slo.detect_s} s")
+        if self.recover_s is None or self.recover_s > slo.recover_s:
+            out.append(f"{self.fault}: recover {self.recover_s} s > {slo.recover_s} s")
+        return out
+
+
+# Budgets for the default scenario parameters under FAULT_TIMEOUTS and fast_policy()
+SLOS: Dict[str, FaultSLO] = {
+    "disconnect_mid_stream": FaultSLO(detect_s=0.05, recover_s=0.5),
+    "discovery_failures": FaultSLO(detect_s=0.3, recover_s=1.0),
+    "notify_timeouts": FaultSLO(detect_s=0.3, recover_s=1.0),
+    "slow_disconnect": FaultSLO(detect_s=0.05, recover_s=0.5),
+    "stop_races_disconnect": FaultSLO(detect_s=0.05, recover_s=0.25),
+}
+
+
+class FaultHarness:
+    def __init__(
+        self,
+        backend: SimulatedBackend,
+        pad: SimulatedPad,
+        state: dict | None = None,
+        file_lock=None,
+        policy: ReconnectPolicy | None = None,
+        timeouts: Dict[str, float] | None = None,
+        wait_timeout: float = 3.0,
+    ):
+        self.backend = backend
+        self.pad = pad
+        self.state = state if state is not None else {"activeProfile": "default", "connected": False, "gui_window": None}
+        self.file_lock = file_lock or threading.RLock()
+        self.policy = policy or fast_policy()
+        self.timeouts = FAULT_TIMEOUTS if timeouts is None else timeouts
+        self.wait_timeout = wait_timeout
+
+        self.session: ble_client.BleSession | None = None
+        self.task: asyncio.Task | None = None
+        self.results: List[FaultResult] = []
+        self.leaks: List[str] = []
+        self.disconnect_calls = 0
+
+        self._saved_timeouts: Dict[str, float] = {}
+        self._installed = None
+        self._baseline_tasks: set = set()
+
+    async def __aenter__(self) -> "FaultHarness":
+        for name, value in self.timeouts.items():
+            self._saved_timeouts[name] = getattr(ble_client, name)
+            setattr(ble_client, name, value)
+        self._installed = self.backend.installed()
+        self._installed.__enter__()
+        self._baseline_tasks = set(asyncio.all_tasks())
+
+        def on_disconnected():
+            self.disconnect_calls += 1
+
+        self.task = ble_client.start_ble_session(
+            self.pad.name,
+            self.file_lock,
+            self.state,
+            asyncio.get_running_loop(),
+            on_disconnected=on_disconnected,
+            policy=self.policy,
+        )
+        self.session = ble_client.SESSIONS.get(self.pad.name)
+        if await self._until(self.subscribed, time.perf_counter()) is None:
+            raise RuntimeError(f"Simulated pad {self.pad.name} never came up.")
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            await self._stop()
+            self.leaks = await self.check_leaks()
+        finally:
+            self._installed.__exit__(None, None, None)
+            for name, value in self._saved_timeouts.items():
+                setattr(ble_client, name, value)
+        return False
+
+    def subscribed(self) -> bool:
+        return bool(self.session and self.session.connected and self.pad.notify_callback is not None)
+
+    def _failures(self) -> int:
+        supervisor = self.session.supervisor if self.session else None
+        return supervisor.failures if supervisor else 0
+
+    # Seconds from t0 until predicate() holds, or None if it never does
+    async def _until(self, predicate: Callable[[], bool], t0: float) -> float | None:
+        deadline = t0 + self.wait_timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                return None
+            await asyncio.sleep(0.001)
+        return time.perf_counter() - t0
+
+    def _record(self, result: FaultResult) -> FaultResult:
+        self.results.append(result)
+        return result
+
+    async def _stop(self):
+        if self.task and not self.task.done():
+            ble_client.stop_ble_session(self.pad.name)
+            await asyncio.wait({self.task}, timeout=self.wait_timeout)
+
+    # ---- faults that the session should recover from ----
+
+    # Link drops while a steady stream is playing; presses sent during the outage are lost
+    async def disconnect_mid_stream(self, count: int = 60, rate_hz: float = 500.0, drop_after: int = 20) -> FaultResult:
+        schedule = steady(self.pad, rate_hz=rate_hz, count=count)
+        player = asyncio.create_task(self.pad.play(schedule))
+        await self._until(lambda: self.pad.sent >= drop_after or player.done(), time.perf_counter())
+
+        t0 = time.perf_counter()
+        self.pad.drop_link()
+        detect = await self._until(lambda: not self.session.connected, t0)
+        recover = await self._until(self.subscribed, t0)
+        delivered = await player
+        return self._record(FaultResult("disconnect_mid_stream", detect, recover, lost_events=count - delivered))
+
+    # The next n connections never finish service discovery (GATT readiness times out)
+    async def discovery_failures(self, n: int = 2) -> FaultResult:
+        self.pad.discovery_failures = n
+        return await self._reconnect_fault("discovery_failures")
+
+    # The next n start_notify calls never complete
+    async def notify_timeouts(self, n: int = 2) -> FaultResult:
+        self.pad.notify_hangs = n
+        return await self._reconnect_fault("notify_timeouts")
+
+    async def _reconnect_fault(self, fault: str) -> FaultResult:
+        failures = self._failures()
+        t0 = time.perf_counter()
+        self.pad.drop_link()
+        detect = await self._until(lambda: self._failures() > failures, t0)
+        recover = await self._until(self.subscribed, t0)
+        return self._record(FaultResult(fault, detect, recover, failed_attempts=self._failures() - failures))
+
+    # ---- faults during shutdown (the session ends) ----
+
+    # stop_ble_session while disconnect() hangs for `delay` seconds; recover = session task finished
+    async def slow_disconnect(self, delay: float = 2.0) -> FaultResult:
+        self.pad.disconnect_delay = delay
+        t0 = time.perf_counter()
+        ble_client.stop_ble_session(self.pad.name)
+        detect = await self._until(lambda: not self.session.connected, t0)
+        recover = await self._until(self.task.done, t0)
+        return self._record(FaultResult("slow_disconnect", detect, recover))
+
+    # The stop request and the link-loss callback land in the same loop iteration
+    async def stop_races_disconnect(self, stop_first: bool = True) -> FaultResult:
+        connects = self.backend.connects
+        t0 = time.perf_counter()
+        if stop_first:
+            ble_client.stop_ble_session(self.pad.name)
+            self.pad.drop_link()
+        else:
+            self.pad.drop_link()
+            ble_client.stop_ble_session(self.pad.name)
+        detect = await self._until(lambda: not self.session.connected, t0)
+        recover = await self._until(self.task.done, t0)
+        # Any reconnect after a stop is a failure of the race handling
+        await asyncio.sleep(0.05)
+        if self.backend.connects != connects:
+            recover = None
+        return self._record(FaultResult("stop_races_disconnect", detect, recover))
+
+    # ---- teardown checks ----
+
+    async def check_leaks(self) -> List[str]:
+        # Let cancelled tasks run their cancellation
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        leaks = []
+        current = asyncio.current_task()
+        for task in asyncio.all_tasks():
+            if task is not current and task not in self._baseline_tasks and not task.done():
+                leaks.append(f"task still running: {task.get_coro()!r}")
+
+        if self.backend._scanners:
+            leaks.append(f"{len(self.backend._scanners)} scanner(s) still running")
+        for pad in self.backend.pads.values():
+            if pad.notify_callback is not None:
+                leaks.append(f"notify callback still subscribed on {pad.name}")
+            if pad.client is not None:
+                leaks.append(f"{pad.name} still connected")
+        for client in self.backend.clients:
+            if client.is_connected:
+                leaks.append(f"client for {client.address} still connected")
+
+        if ble_client.SESSIONS.get(self.pad.name) is not None:
+            leaks.append(f"session {self.pad.name} still registered")
+        for name in metrics.snapshot()["gauges"]:
+            if name.endswith(f".{self.pad.name}") and name.startswith(("ble_supervisor.", "ble_events.")):
+                leaks.append(f"gauge {name} still registered")
+        if self.state.get("connected"):
+            leaks.append("state still reports connected")
+
+        # A disconnect callback bleak fires after the session ended must be a no-op
+        calls = self.disconnect_calls
+        for client in self.backend.clients:
+            if client.disconnected_callback:
+                client.disconnected_callback(client)
+        if self.disconnect_calls != calls or self.state.get("connected"):
+            leaks.append("stale disconnect callback still reaches the session")
+        return leaks
+
+    def report(self) -> str:
+        lines = [f"{'fault':<24}{'detect ms':>10}{'recover ms':>12}{'failed':>8}{'lost':>6}"]
+        for r in self.results:
+            detect = f"{r.detect_s * 1000:.1f}" if r.detect_s is not None else "-"
+            recover = f"{r.recover_s * 1000:.1f}" if r.recover_s is not None else "-"
+            lines.append(f"{r.fault:<24}{detect:>10}{recover:>12}{r.failed_attempts:>8}{r.lost_events:>6}")
+        return "\n".join(lines)
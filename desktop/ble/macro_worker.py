@@ -0,0 +1,201 @@
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable
+
+from desktop.core.log import get_logger
+from desktop.core.metrics import KeypressTrace
+from desktop.ble.press_policy import PressPolicy
+
+log = get_logger("macro_worker")
+
+# What submit() does when the queue is full. None of them wait: submit() runs
+# inside the BLE notification callback, on the asyncio loop.
+OVERFLOW_DROP_OLDEST = "drop-oldest"   # evict the oldest queued press, keep the new one
+OVERFLOW_DROP_NEWEST = "drop-newest"   # keep what is queued, drop the new press
+OVERFLOW_COALESCE = "coalesce"         # merge into an identical queued press, else evict the oldest
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE)
+
+
+class MacroEvent:
+    __slots__ = ("button_id", "profile", "file_lock", "trace", "received_ns")
+
+    def __init__(self, button_id: str, profile: str, file_lock=None, trace: KeypressTrace | None = None, received_ns: int | None = None):
+        self.button_id = button_id
+        self.profile = profile
+        self.file_lock = file_lock
+        self.trace = trace
+        if received_ns is None:
+            received_ns = trace.received if trace else time.perf_counter_ns()
+        self.received_ns = received_ns
+
+    def key(self):
+        return (self.profile, self.button_id)
+
+
+class MacroWorker:
+    """
+    Bounded FIFO of button events drained in order by one dedicated thread.
+    The BLE callback only calls submit(), so key injection (and pyautogui's
+    pauses) never runs on the asyncio loop.
+
+    An optional PressPolicy rate-limits and coalesces presses on submit and
+    drops stale ones on dequeue.
+    """
+    def __init__(
+        self,
+        execute: Callable[[MacroEvent], Any],
+        maxsize: int = 64,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        name: str = "macro-worker",
+        policy: PressPolicy | None = None,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Use one of {OVERFLOW_POLICIES}.")
+
+        self.execute = execute
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.name = name
+        self.policy = policy
+
+        self._q: Deque[MacroEvent] = deque()
+        self._queued_keys: Dict[Hashable, int] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._busy = False
+
+        self.submitted = 0
+        self.executed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.stale = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    def start(self) -> "MacroWorker":
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return self
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _push(self, event: MacroEvent):
+        self._q.append(event)
+        key = event.key()
+        self._queued_keys[key] = self._queued_keys.get(key, 0) + 1
+
+    def _pop(self) -> MacroEvent:
+        event = self._q.popleft()
+        key = event.key()
+        n = self._queued_keys[key] - 1
+        if n:
+            self._queued_keys[key] = n
+        else:
+            del self._queued_keys[key]
+        return event
+
+    # Returns False if the event was dropped or merged instead of queued
+    def submit(self, event: MacroEvent) -> bool:
+        with self._cond:
+            self.submitted += 1
+            policy = self.policy
+
+            if policy is not None:
+                if not policy.admit(event.key(), event.button_id, event.received_ns):
+                    self.rate_limited += 1
+                    return False
+                if policy.coalesce and event.key() in self._queued_keys:
+                    self.coalesced += 1
+                    return False
+
+            if len(self._q) >= self.maxsize:
+                if self.overflow == OVERFLOW_COALESCE:
+                    if event.key() in self._queued_keys:
+                        self.coalesced += 1
+                        return False
+                    self._pop()
+                    self.dropped += 1
+
+                elif self.overflow == OVERFLOW_DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+
+                else:
+                    self._pop()
+                    self.dropped += 1
+
+            self._push(event)
+            if len(self._q) > self.max_depth:
+                self.max_depth = len(self._q)
+            self._cond.notify_all()
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._q or self._stopping)
+                if not self._q:
+                    return
+                event = self._pop()
+                if self.policy is not None and self.policy.is_stale(event.received_ns):
+                    self.stale += 1
+                    self._cond.notify_all()
+                    continue
+                self._busy = True
+                self._cond.notify_all()
+
+            if event.trace:
+                event.trace.dequeued = time.perf_counter_ns()
+            try:
+                self.execute(event)
+                self.executed += 1
+            except Exception as e:
+                self.failed += 1
+                log.error("Macro execution failed: %s", e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    # Blocks until everything queued so far has been executed (used by tests and shutdown)
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._q and not self._busy, timeout=timeout)
+
+    # Lets the thread finish what is already queued, then exits
+    def stop(self, timeout: float | None = 2.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def depth(self) -> int:
+        return len(self._q)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._q),
+            "max_depth": self.max_depth,
+            "capacity": self.maxsize,
+            "overflow": self.overflow,
+            "submitted": self.submitted,
+            "executed": self.executed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "stale": self.stale,
+            "failed": self.failed,
+            "policy": self.policy.stats() if self.policy else None,
+        }
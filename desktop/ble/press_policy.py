@@ -0,0 +1,90 @@
+from __future__ import annotations
+import os
+import time
+from typing import Any, Dict, Hashable, Mapping
+
+
+def _env_ms(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    try:
+        return float(raw) / 1000.0 if raw not in (None, "") else default
+    except ValueError:
+        return default
+
+
+class PressPolicy:
+    """
+    Filters button presses in front of trigger_macro so a held button or a
+    laggy link can't flood the desktop with hotkeys.
+
+      min_interval  presses of the same button closer together than this are dropped
+                    (per_button overrides it for individual button ids)
+      coalesce      a press is dropped if the same button is already waiting in the queue
+      max_age       presses that waited in the queue longer than this are dropped
+                    when the worker reaches them (a backlog behind slow injection)
+
+    admit() runs when the press is submitted, is_stale() when it is dequeued;
+    MacroWorker counts what each of them rejects. Timestamps are
+    perf_counter_ns values taken when the notification reached the desktop
+    (MacroEvent.received_ns), so age is desktop queueing time only: the v1
+    payload carries a sequence number but no device timestamp, and presses
+    that were delayed on the pad or over the air still look fresh.
+    """
+    def __init__(
+        self,
+        min_interval: float = 0.0,
+        coalesce: bool = True,
+        max_age: float | None = None,
+        per_button: Mapping[str, float] | None = None,
+    ):
+        self.min_interval = min_interval
+        self.coalesce = coalesce
+        self.max_age = max_age
+        self.per_button = dict(per_button or {})
+
+        self._last_ns: Dict[Hashable, int] = {}
+
+    # PRESS_MIN_INTERVAL_MS (default 50), PRESS_MAX_AGE_MS (default 1000, 0 disables), PRESS_COALESCE (default 1),
+    # PRESS_BUTTON_INTERVAL_MS="BTN:1=200,BTN:3=0" for per-button intervals
+    @classmethod
+    def from_env(cls) -> "PressPolicy":
+        max_age = _env_ms("PRESS_MAX_AGE_MS", 1.0)
+        per_button = {}
+        for item in (os.getenv("PRESS_BUTTON_INTERVAL_MS") or "").split(","):
+            button_id, _, ms = item.partition("=")
+            try:
+                per_button[button_id.strip()] = float(ms) / 1000.0
+            except ValueError:
+                continue
+        return cls(
+            min_interval=_env_ms("PRESS_MIN_INTERVAL_MS", 0.05),
+            coalesce=(os.getenv("PRESS_COALESCE") or "1") not in ("0", "false", "no"),
+            max_age=max_age or None,
+            per_button=per_button,
+        )
+
+    def interval_for(self, button_id: str) -> float:
+        return self.per_button.get(button_id, self.min_interval)
+
+    def admit(self, key: Hashable, button_id: str, received_ns: int) -> bool:
+        interval = self.interval_for(button_id)
+        if interval > 0:
+            last = self._last_ns.get(key)
+            if last is not None and received_ns - last < interval * 1e9:
+                return False
+            self._last_ns[key] = received_ns
+        return True
+
+    def is_stale(self, received_ns: int, now_ns: int | None = None) -> bool:
+        if not self.max_age:
+            return False
+        if now_ns is None:
+            now_ns = time.perf_counter_ns()
+        return now_ns - received_ns > self.max_age * 1e9
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "min_interval_ms": round(self.min_interval * 1000, 1),
+            "max_age_ms": round(self.max_age * 1000, 1) if self.max_age else None,
+            "coalesce": self.coalesce,
+        }
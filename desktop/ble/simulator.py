@@ -0,0 +1,395 @@
+"""
+Hardware-free stand-in for the ESP32 macro pad.
+
+SimulatedBackend provides BleakScanner / BleakClient replacements that
+emulate the firmware's GATT service and notify characteristic, so
+connect(), the notification handler and trigger_macro can run on a
+Linux CI box:
+
+    backend = SimulatedBackend()
+    pad = backend.add_pad("Macropad")
+    with backend.installed():
+        start_ble_session("Macropad", lock, state, loop)
+        ...
+        await pad.play(steady(pad, rate_hz=50, count=200))
+
+EventRecorder / load_recording capture the timing of real sessions
+(BLE_RECORD_DIR) and replay them deterministically through a pad.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import json
+import random
+import struct
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+FIRMWARE_SERVICE_UUID = "06d527b7-9a06-473b-ae8b-4794bae3fa04"
+FIRMWARE_CHAR_UUID = "8acc4aaf-26b1-44a9-8b83-2d94ce03f34a"
+DB_HASH_CHAR_UUID = "00002b2a-0000-1000-8000-00805f9b34fb"
+
+# (offset in seconds from start, payload bytes)
+Schedule = List[Tuple[float, bytes]]
+
+
+# ---------------------------------------------------------------------------
+# Firmware emulation
+# ---------------------------------------------------------------------------
+
+class FakeCharacteristic:
+    def __init__(self, uuid: str, handle: int, properties: list[str]):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+
+
+class FakeServices:
+    def __init__(self, chars: list[FakeCharacteristic]):
+        self._chars = chars
+
+    def get_characteristic(self, specifier):
+        for c in self._chars:
+            if specifier == c.handle or str(specifier).lower() == c.uuid:
+                return c
+        return None
+
+
+class SimulatedPad:
+    """
+    One emulated pad: advertises while disconnected, accepts one client,
+    and notifies button events in the firmware's v1 binary format
+    (or "BTN:n" text when protocol="legacy").
+    """
+    def __init__(
+        self,
+        backend: "SimulatedBackend",
+        name: str,
+        address: str,
+        protocol: str = "v1",
+        connect_delay: float = 0.0,
+        db_hash: bytes | None = b"\x5a\x5a",
+    ):
+        self.backend = backend
+        self.name = name
+        self.address = address
+        self.protocol = protocol
+        self.connect_delay = connect_delay
+        self.db_hash = db_hash
+        self.powered = True
+        self.seq = 0
+        self.client: Optional["FakeBleakClient"] = None
+        self.notify_callback: Optional[Callable] = None
+        self.notify_char = FakeCharacteristic(FIRMWARE_CHAR_UUID, 42, ["notify", "read"])
+        self.sent = 0
+
+        # Fault knobs (see desktop/ble/faults.py): the next N connections get no usable
+        # service discovery / a start_notify that never completes; disconnect() takes this long
+        self.discovery_failures = 0
+        self.notify_hangs = 0
+        self.disconnect_delay = 0.0
+
+    @property
+    def advertising(self) -> bool:
+        return self.powered and self.client is None
+
+    def device(self):
+        return SimpleNamespace(address=self.address, name=self.name)
+
+    def advertisement(self):
+        return SimpleNamespace(local_name=self.name, service_uuids=[FIRMWARE_SERVICE_UUID], rssi=-50)
+
+    def services(self) -> FakeServices:
+        chars = [self.notify_char]
+        if self.db_hash is not None:
+            chars.append(FakeCharacteristic(DB_HASH_CHAR_UUID, 3, ["read"]))
+        return FakeServices(chars)
+
+    def encode(self, button: int, pressed: bool = True) -> bytes:
+        if self.protocol == "legacy":
+            return f"BTN:{button}".encode("utf-8")
+        payload = bytes([0x01, 1]) + struct.pack("<BBH", button, 1 if pressed else 0, self.seq & 0xFFFF)
+        self.seq += 1
+        return payload
+
+    def encode_batch(self, events: Iterable[Tuple[int, bool]]) -> bytes:
+        events = list(events)
+        out = bytearray([0x01, len(events)])
+        for button, pressed in events:
+            out += struct.pack("<BBH", button, 1 if pressed else 0, self.seq & 0xFFFF)
+            self.seq += 1
+        return bytes(out)
+
+    # Delivers one raw notification to the subscribed client (no-op while nobody listens)
+    def notify(self, payload: bytes) -> bool:
+        cb = self.notify_callback
+        if cb is None or self.client is None:
+            return False
+        self.sent += 1
+        cb(self.notify_char, bytearray(payload))
+        return True
+
+    def press(self, button: int) -> bool:
+        return self.notify(self.encode(button, True))
+
+    # Plays a schedule of (offset_s, payload) in real time on the running loop
+    async def play(self, schedule: Schedule, speed: float = 1.0) -> int:
+        start = time.perf_counter()
+        delivered = 0
+        for offset, payload in schedule:
+            delay = offset / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.notify(payload):
+                delivered += 1
+        return delivered
+
+    # Link loss (sleep, out of range): the client sees a disconnect callback, the pad goes back to advertising
+    def drop_link(self):
+        client = self.client
+        if client is None:
+            return
+        self.client = None
+        self.notify_callback = None
+        client._on_link_lost()
+        self.backend._advertise(self)
+
+    def power_off(self):
+        self.powered = False
+        self.drop_link()
+
+    def power_on(self):
+        self.powered = True
+        self.backend._advertise(self)
+
+
+# ---------------------------------------------------------------------------
+# bleak replacements
+# ---------------------------------------------------------------------------
+
+class SimulatedBackend:
+    def __init__(self):
+        self.pads: Dict[str, SimulatedPad] = {}
+        self._scanners: list["FakeBleakScanner"] = []
+        self.clients: list["FakeBleakClient"] = []
+        self.connects = 0
+        backend = self
+
+        class _Scanner(FakeBleakScanner):
+            pass
+        _Scanner.backend = backend
+
+        class _Client(FakeBleakClient):
+            pass
+        _Client.backend = backend
+
+        self.BleakScanner = _Scanner
+        self.BleakClient = _Client
+
+    def add_pad(self, name: str = "Macropad", address: str | None = None, **kwargs) -> SimulatedPad:
+        address = address or "SIM:%02X:%02X" % (len(self.pads) // 256, len(self.pads) % 256)
+        pad = SimulatedPad(self, name, address, **kwargs)
+        self.pads[address] = pad
+        return pad
+
+    def _advertise(self, pad: SimulatedPad):
+        if not pad.advertising:
+            return
+        for scanner in list(self._scanners):
+            scanner._deliver(pad)
+
+    # Swaps the simulator into desktop.ble.ble_client for the duration of the block
+    @contextlib.contextmanager
+    def installed(self):
+        from desktop.ble import ble_client
+
+        saved = (ble_client.BleakClient, ble_client.BleakScanner)
+        ble_client.BleakClient, ble_client.BleakScanner = self.BleakClient, self.BleakScanner
+        try:
+            yield self
+        finally:
+            ble_client.BleakClient, ble_client.BleakScanner = saved
+
+
+class FakeBleakScanner:
+    backend: SimulatedBackend
+
+    def __init__(self, detection_callback=None, **kwargs):
+        self.detection_callback = detection_callback
+        self.kwargs = kwargs
+
+    def _deliver(self, pad: SimulatedPad):
+        if self.detection_callback:
+            asyncio.get_running_loop().call_soon(self.detection_callback, pad.device(), pad.advertisement())
+
+    async def start(self):
+        self.backend._scanners.append(self)
+        for pad in self.backend.pads.values():
+            if pad.advertising:
+                self._deliver(pad)
+
+    async def stop(self):
+        if self in self.backend._scanners:
+            self.backend._scanners.remove(self)
+
+    @classmethod
+    async def find_device_by_filter(cls, filterfunc, timeout: float = 10.0, **kwargs):
+        for pad in cls.backend.pads.values():
+            if pad.advertising and filterfunc(pad.device(), pad.advertisement()):
+                return pad.device()
+        await asyncio.sleep(timeout)
+        return None
+
+    @classmethod
+    async def discover(cls, timeout: float = 5.0, **kwargs):
+        await asyncio.sleep(timeout)
+        return [p.device() for p in cls.backend.pads.values() if p.advertising]
+
+
+class FakeBleakClient:
+    backend: SimulatedBackend
+
+    def __init__(self, address_or_device, disconnected_callback=None, services=None, timeout: float = 10.0, **kwargs):
+        self.address = getattr(address_or_device, "address", address_or_device)
+        self.disconnected_callback = disconnected_callback
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self._pad: SimulatedPad | None = None
+        self._discovery_broken = False
+        self.backend.clients.append(self)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._pad is not None
+
+    @property
+    def services(self):
+        if self._pad is None or self._discovery_broken:
+            raise Exception("Service Discovery has not been performed yet")
+        return self._pad.services()
+
+    async def connect(self):
+        pad = self.backend.pads.get(self.address)
+        if pad is None or not pad.advertising:
+            await asyncio.sleep(min(self.timeout, 0.01))
+            raise TimeoutError(f"Device with address {self.address} was not found.")
+        if pad.connect_delay:
+            await asyncio.sleep(pad.connect_delay)
+        pad.client = self
+        self._pad = pad
+        self.backend.connects += 1
+        if pad.discovery_failures > 0:
+            pad.discovery_failures -= 1
+            self._discovery_broken = True
+        return True
+
+    # The link goes down immediately; a slow stack only returns late
+    async def disconnect(self):
+        pad = self._pad
+        if pad is None:
+            return True
+        pad.client = None
+        pad.notify_callback = None
+        self._pad = None
+        self.backend._advertise(pad)
+        if pad.disconnect_delay:
+            await asyncio.sleep(pad.disconnect_delay)
+        return True
+
+    def _on_link_lost(self):
+        self._pad = None
+        if self.disconnected_callback:
+            self.disconnected_callback(self)
+
+    async def start_notify(self, char, callback, **kwargs):
+        if self._pad is None:
+            raise RuntimeError("Not connected")
+        if self._pad.notify_hangs > 0:
+            self._pad.notify_hangs -= 1
+            await asyncio.Event().wait()
+        self._pad.notify_callback = callback
+
+    async def stop_notify(self, char):
+        if self._pad is not None:
+            self._pad.notify_callback = None
+
+    async def read_gatt_char(self, char, **kwargs):
+        if self._pad is None:
+            raise RuntimeError("Not connected")
+        uuid = getattr(char, "uuid", char)
+        if str(uuid).lower() == DB_HASH_CHAR_UUID and self._pad.db_hash is not None:
+            return bytearray(self._pad.db_hash)
+        raise RuntimeError(f"Characteristic {uuid} not readable")
+
+
+# ---------------------------------------------------------------------------
+# Load patterns
+# ---------------------------------------------------------------------------
+
+# Evenly spaced presses; jitter is +/- that fraction of the interval (seeded, so runs are repeatable)
+def steady(pad: SimulatedPad, rate_hz: float, count: int, buttons: Iterable[int] = (1, 2, 3, 4), jitter: float = 0.0, seed: int = 0) -> Schedule:
+    rng = random.Random(seed)
+    buttons = list(buttons)
+    interval = 1.0 / rate_hz
+    schedule = []
+    for i in range(count):
+        offset = i * interval
+        if jitter:
+            offset = max(0.0, offset + rng.uniform(-jitter, jitter) * interval)
+        schedule.append((offset, pad.encode(buttons[i % len(buttons)])))
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+# `bursts` groups of `size` presses arriving back to back, `gap` seconds apart.
+# batched=True packs each burst into a single notification (firmware batching).
+def bursts(pad: SimulatedPad, size: int, gap: float, count: int, button: int = 1, batched: bool = False) -> Schedule:
+    schedule = []
+    for b in range(count):
+        offset = b * gap
+        if batched:
+            schedule.append((offset, pad.encode_batch([(button, True)] * size)))
+        else:
+            schedule.extend((offset, pad.encode(button)) for _ in range(size))
+    return schedule
+
+
+# ---------------------------------------------------------------------------
+# Record / replay
+# ---------------------------------------------------------------------------
+
+class EventRecorder:
+    """
+    Appends raw notifications with their arrival offset to a JSON-lines file:
+        {"t": 0.153, "data": "0101..."}
+    Live sessions record to BLE_RECORD_DIR/<device>-<timestamp>.jsonl when that env var is set.
+    """
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._start: float | None = None
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def record(self, data) -> None:
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        self._fh.write(json.dumps({"t": round(now - self._start, 6), "data": bytes(data).hex()}) + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        try:
+            self._fh.close()
+        except Exception:
+            pass
+
+
+def load_recording(path: Path | str) -> Schedule:
+    schedule = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        schedule.append((float(entry["t"]), bytes.fromhex(entry["data"])))
+    return schedule
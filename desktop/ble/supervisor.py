@@ -0,0 +1,162 @@
+from __future__ import annotations
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from desktop.core import metrics
+from desktop.core.log import get_logger
+
+log = get_logger("supervisor")
+
+# Outcomes returned by one connect attempt (ble_client.connect)
+STOPPED = "stopped"            # user asked to disconnect
+DISCONNECTED = "disconnected"  # link dropped (sleep, out of range, pad reset)
+FAILED = "error"               # could not connect / set up notifications
+
+
+class ReconnectPolicy:
+    """
+    Exponential backoff with jitter between failed attempts.
+    retry_budget counts consecutive failed connect attempts; waiting for the
+    pad to advertise does not consume it, so a sleeping pad is never given up on.
+    """
+    def __init__(
+        self,
+        base_delay: float = 0.25,
+        max_delay: float = 30.0,
+        jitter: float = 0.5,
+        retry_budget: int = 8,
+        listen_window: float = 60.0,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_budget = retry_budget
+        self.listen_window = listen_window
+
+    def delay(self, attempt: int) -> float:
+        d = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        return d * random.uniform(1.0 - self.jitter, 1.0)
+
+
+class ReconnectSupervisor:
+    """
+    Keeps a BLE session alive until stop_event is set.
+    After a drop or a failed attempt it listens passively for the pad's
+    advertisements, for as long as it takes, and reconnects as soon as one
+    is seen; failed attempts back off.
+
+    connect_once(device, on_link_up) -> outcome   (device is the advertised device or None)
+    wait_for_device(timeout) -> device | None
+    """
+    def __init__(
+        self,
+        connect_once: Callable[[Any, Callable[[], None]], Awaitable[str]],
+        wait_for_device: Callable[[float], Awaitable[Any]],
+        stop_event: asyncio.Event,
+        policy: ReconnectPolicy | None = None,
+        on_give_up: Optional[Callable[[str], None]] = None,
+    ):
+        self.connect_once = connect_once
+        self.wait_for_device = wait_for_device
+        self.stop_event = stop_event
+        self.policy = policy or ReconnectPolicy()
+        self.on_give_up = on_give_up
+
+        self.state = "idle"
+        self.attempt = 0
+        self.sessions = 0
+        self.drops = 0
+        self.failures = 0
+        self.last_outage_s: float | None = None
+        self.last_reconnect_s: float | None = None
+
+        self._outage_started: float | None = None
+        self._attempt_started: float | None = None
+        self._link_up = False
+
+    def _on_link_up(self):
+        now = time.perf_counter()
+        self._link_up = True
+        self.sessions += 1
+        self.state = "connected"
+
+        if self._outage_started is not None:
+            self.last_outage_s = now - self._outage_started
+            metrics.record_ns("ble.outage", int(self.last_outage_s * 1e9))
+            self._outage_started = None
+        if self._attempt_started is not None and self.sessions > 1:
+            self.last_reconnect_s = now - self._attempt_started
+            metrics.record_ns("ble.reconnect", int(self.last_reconnect_s * 1e9))
+
+    # Sleeps for delay seconds, waking early if stop is requested
+    async def _sleep(self, delay: float):
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> str:
+        device = None
+        while not self.stop_event.is_set():
+            self._link_up = False
+            self._attempt_started = time.perf_counter()
+            self.state = "connecting"
+
+            outcome = await self.connect_once(device, self._on_link_up)
+            device = None
+
+            if outcome == STOPPED or self.stop_event.is_set():
+                break
+
+            if outcome == DISCONNECTED and self._link_up:
+                self.drops += 1
+                self.attempt = 0
+                self._outage_started = time.perf_counter()
+            else:
+                self.failures += 1
+                self.attempt += 1
+                if self._outage_started is None:
+                    self._outage_started = self._attempt_started
+                if self.attempt > self.policy.retry_budget:
+                    self.state = "gave-up"
+                    msg = f"Gave up reconnecting after {self.attempt - 1} retries."
+                    log.error(msg)
+                    if self.on_give_up:
+                        try:
+                            self.on_give_up(msg)
+                        except Exception:
+                            pass
+                    return FAILED
+
+                delay = self.policy.delay(self.attempt)
+                log.info("Reconnect attempt %d failed; backing off %.2fs", self.attempt, delay)
+                self.state = "backoff"
+                await self._sleep(delay)
+                if self.stop_event.is_set():
+                    break
+
+            # Only an advertisement starts the next attempt; windows without one don't use the retry budget
+            self.state = "listening"
+            device = None
+            while device is None and not self.stop_event.is_set():
+                device = await self.wait_for_device(self.policy.listen_window)
+
+        self.state = "stopped"
+        return STOPPED
+
+    def stats(self) -> Dict[str, Any]:
+        outage_s = None
+        if self._outage_started is not None:
+            outage_s = round(time.perf_counter() - self._outage_started, 3)
+        return {
+            "state": self.state,
+            "attempt": self.attempt,
+            "sessions": self.sessions,
+            "drops": self.drops,
+            "failures": self.failures,
+            "current_outage_s": outage_s,
+            "last_outage_s": self.last_outage_s,
+            "last_reconnect_s": self.last_reconnect_s,
+        }
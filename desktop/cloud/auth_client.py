@@ -8,6 +8,7 @@ import tkinter as tk
 
 import requests
 
+from desktop.cloud import http_session
 from desktop.ui.login_dialog import prompt_credentials_threadsafe
 
 FIREBASE_AUTH_BASE = "https://identitytoolkit.googleapis.com/v1"
@@ -42,27 +43,29 @@ def save_auth_cache(data: Dict[str, Any]) -> None:
 
 
 class FirebaseAuthClient:
-    def __init__(self, api_key: str):
+    # session defaults to the shared keep-alive pool (http_session.get_session())
+    def __init__(self, api_key: str, session: requests.Session | None = None):
         if not api_key:
             raise ValueError("API key is required for FirebaseAuthClient.")
         self.api_key = api_key
+        self.session = session or http_session.get_session()
     
     def sign_up(self, email: str, password: str) -> Dict[str, Any]:
         url = f"{FIREBASE_AUTH_BASE}/accounts:signUp?key={self.api_key}"
         payload = {"email": email, "password": password, "returnSecureToken": True}
-        response = requests.post(url, json=payload, timeout=20)
+        response = self.session.post(url, json=payload, timeout=20)
         return self._handle(response)
     
     def sign_in(self, email: str, password: str) -> Dict[str, Any]:
         url = f"{FIREBASE_AUTH_BASE}/accounts:signInWithPassword?key={self.api_key}"
         payload = {"email": email, "password": password, "returnSecureToken": True}
-        response = requests.post(url, json=payload, timeout=20)
+        response = self.session.post(url, json=payload, timeout=20)
         return self._handle(response)
     
     def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
         url = f"{FIREBASE_SECURETOKEN_BASE}/token?key={self.api_key}"
         payload = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-        response = requests.post(url, data=payload, timeout=20)
+        response = self.session.post(url, data=payload, timeout=20)
         return self._handle(response)
     
     def _handle(self, response: requests.Response) -> Dict[str, Any]:
@@ -5,12 +5,14 @@ from threading import RLock
 from dotenv import load_dotenv
 import os
 from desktop.cloud.cloud_sync import CloudSync
+from desktop.core.log import get_logger
 
 load_dotenv()
 api_key = os.getenv("API_KEY")
 database_url = os.getenv("DATABASE_URL")
 FIREBASE_API_KEY = api_key
 FIREBASE_DB_URL  = database_url
+log = get_logger("cloud")
 
 cloud_sync = None
 
@@ -51,7 +53,7 @@ def connecting_to_db(FILE_LOCK: RLock) -> bool:
         # print("Connected to cloud and synced config.")
         
     except Exception as e:
-        print("Failed to connect to cloud:", e)
+        log.error("Failed to connect to cloud: %s", e)
         cloud_sync = None
         return False
 
@@ -59,9 +61,9 @@ def connecting_to_db(FILE_LOCK: RLock) -> bool:
 def full_reload_from_db(FILE_LOCK: RLock):
     full_data = get_user_config(cloud_sync.rtdb, cloud_sync.session.get_id_token(), cloud_sync.session.get_uid())
 
-    with FILE_LOCK:
-        try:
-            with get_config_path().open("w", encoding="utf-8") as f:
-                json.dump(full_data, f, indent = 2)
-        except Exception as e:
-            print("Failed to reload config:", e)
\ No newline at end of file
+    import desktop.core.config_store as config_store
+
+    try:
+        config_store.get_store(get_config_path(), FILE_LOCK).replace(full_data, source="cloud")
+    except Exception as e:
+        log.error("Failed to reload config: %s", e)
\ No newline at end of file
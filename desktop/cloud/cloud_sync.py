@@ -2,26 +2,222 @@
 from __future__ import annotations
 import json
 import threading
+import time
 from pathlib import Path
 from typing import Any, Dict, Optional, Callable
 
 from desktop.cloud.auth_client import ensure_logged_in
+from desktop.cloud.outbox import ROOT, CloudOutbox
 from desktop.core.session_manager import SessionManager
-from desktop.cloud.rtdb_client import RTDBClient, seed_if_missing, put_user_config, get_user_config
+from desktop.cloud.rtdb_client import RTDBClient, RTDBError, seed_if_missing, put_user_config, patch_user_config, get_user_config, set_active_profile
+from desktop.core import config_io
+from desktop.core.config_history import diff
+from desktop.core.log import get_logger
+from desktop.core.paths import get_cloud_outbox_path
+
+log = get_logger("cloud_sync")
+
+# Store changes that are uploaded as a full backup; "profile" changes only patch activeProfile
+BACKUP_SOURCES = ("save", "defaults", "file", "rollback")
+# Changes within this window go to the cloud as one request
+CLOUD_WRITE_DELAY = 1.0
 
 def load_json_file(path: str, file_lock: threading.RLock) -> Optional[Dict[str, Any]]:
-    p = Path(path)
-    if not p.exists():
-        return None
     with file_lock:
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return None
+        return config_io.read_json(Path(path))
 
+# Cloud data replaces the local config through the store, so the keymap and GUI follow
 def write_json_file(path: str, data: Dict[str, Any], file_lock: threading.RLock) -> None:
-    with file_lock:
-        Path(path).write_text(json.dumps(data, indent=2), encoding="utf-8")
+    from desktop.core.config_store import get_store
+    get_store(Path(path), file_lock).replace(data, source="cloud")
+
+# Multi-location PATCH body turning old into new: {"profiles/work/BTN:1": {...}, "profiles/old": None, ...}.
+# {} if nothing changed; None if new isn't an object, so only a full put can express it.
+def cloud_delta(old: Any, new: Any) -> Optional[Dict[str, Any]]:
+    updates: Dict[str, Any] = {}
+    for op in diff(old, new):
+        kind, path = op[0], op[1]
+        if not path:
+            return None
+        if kind == "set":
+            updates["/".join(path)] = op[2]
+        elif kind == "del":
+            updates["/".join(path)] = None
+        # "order" ops don't matter: RTDB keeps object keys sorted itself
+    return updates
+
+
+def _size(payload: Any) -> int:
+    return len(json.dumps(payload, separators=(",", ":")))
+
+
+class CloudWriter:
+    """
+    Background worker that uploads store changes through a CloudOutbox.
+
+    submit() turns each change into RTDB path updates right away and queues
+    them: a save is diffed against what the cloud will hold once the outbox
+    drains (only changed paths, deletes as None), a profile switch is just
+    activeProfile. While that state is unknown (or patch_config isn't given)
+    a save queues the whole config, sent as a put. The "cloud-writer" thread
+    sends everything pending after `delay` seconds as one request: a put, an
+    activeProfile patch, or one multi-location patch. Failures stay queued
+    (and, with a persistent outbox, survive restarts) and are retried with
+    backoff. close() sends what is pending before the app exits.
+    """
+    def __init__(
+        self,
+        put_config: Callable[[Dict[str, Any]], None],
+        patch_active: Callable[[str], None],
+        delay: float = CLOUD_WRITE_DELAY,
+        max_backoff: float = 60.0,
+        patch_config: Optional[Callable[[Dict[str, Any]], None]] = None,
+        outbox: Optional[CloudOutbox] = None,
+    ):
+        self.put_config = put_config
+        self.patch_active = patch_active
+        self.patch_config = patch_config
+        self.outbox = outbox if outbox is not None else CloudOutbox()
+        self.delay = delay
+        self.max_backoff = max_backoff
+
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.puts = 0
+        self.patches = 0
+        self.bytes_sent = 0
+
+        # What the cloud will hold once the outbox drains (None: unknown)
+        self._expected: Optional[Dict[str, Any]] = None
+        self._cond = threading.Condition()
+        self._due: Optional[float] = None
+        self._backoff = 0.0
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, snapshot, source: str) -> None:
+        with self._cond:
+            if source in BACKUP_SOURCES:
+                data = snapshot.thaw()
+                updates = None
+                if self.patch_config is not None and self._expected is not None:
+                    updates = cloud_delta(self._expected, data)
+                if updates is None:
+                    updates = {ROOT: data}
+                self._expected = data
+            elif source == "profile":
+                updates = {"activeProfile": snapshot.active_profile}
+                if self._expected is not None:
+                    self._expected["activeProfile"] = snapshot.active_profile
+            elif source == "cloud":
+                # Local now is what the cloud holds; anything older that was queued is moot
+                self._expected = snapshot.thaw()
+                self.outbox.clear()
+                self._due = None
+                return
+            else:
+                return  # loads, repairs, local-only saves: nothing to upload
+            if not updates:
+                return
+            if self.pending:
+                self.coalesced += 1
+            self.outbox.add(updates)
+            self._schedule(self.delay)
+
+    def _schedule(self, delay: float) -> None:
+        # Caller holds self._cond
+        if self._due is None:
+            self._due = time.monotonic() + delay
+        if self._thread is None or not self._thread.is_alive():
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="cloud-writer", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    # Starts sending whatever the outbox holds (e.g. left over from the last run)
+    def kick(self) -> None:
+        with self._cond:
+            if self.pending:
+                self._schedule(0.0)
+
+    # Records what the cloud holds (e.g. fetched at connect), so the next save is sent as a delta
+    def set_synced(self, config: Optional[Dict[str, Any]]) -> None:
+        with self._cond:
+            self._expected = self.outbox.apply_to(config) if isinstance(config, dict) else None
+
+    @property
+    def pending(self) -> bool:
+        return len(self.outbox) > 0
+
+    def _send(self, batch: Dict[str, Any]) -> bool:
+        if not batch:
+            return False
+        try:
+            if ROOT in batch:
+                self.put_config(batch[ROOT])
+                self.puts += 1
+            elif list(batch) == ["activeProfile"]:
+                self.patch_active(batch["activeProfile"])
+                self.patches += 1
+            else:
+                self.patch_config(batch)
+                self.patches += 1
+        except Exception as e:
+            self.failed += 1
+            with self._cond:
+                self._backoff = backoff = min(self.max_backoff, self._backoff * 2 or self.delay)
+                self._due = time.monotonic() + backoff
+            log.warning("Cloud sync failed, will retry in %.1fs: %s", backoff, e)
+            return False
+        self.bytes_sent += _size(batch[ROOT] if ROOT in batch else batch)
+        self.outbox.done(batch)
+        self.sent += 1
+        self._backoff = 0.0
+        return True
+
+    # Sends whatever is pending now, on the calling thread
+    def flush(self) -> bool:
+        with self._cond:
+            self._due = None
+        return self._send(self.outbox.take())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._due is None and not self._closing:
+                    self._cond.wait()
+                if self._closing and not self.pending:
+                    return
+                remaining = (self._due or 0) - time.monotonic()
+                if remaining > 0 and not self._closing:
+                    self._cond.wait(remaining)
+                    continue
+            if not self.flush() and self._closing:
+                return
+            with self._cond:
+                # Something queued while the request was in flight
+                if self.pending and self._due is None:
+                    self._due = time.monotonic() + self.delay
+
+    # Sends what is pending (bounded by timeout) and stops the worker; anything unsent stays in the outbox
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        age = self.outbox.oldest_age()
+        return {
+            "pending": self.pending, "depth": len(self.outbox),
+            "oldest_age_s": round(age, 1) if age is not None else None,
+            "sent": self.sent, "coalesced": self.coalesced, "failed": self.failed,
+            "puts": self.puts, "patches": self.patches, "bytes_sent": self.bytes_sent,
+        }
 
 class CloudSync:
     """
@@ -37,6 +233,11 @@ class CloudSync:
         self.file_lock = file_lock
         self.default_config = default_config
         self.session = SessionManager(api_key)
+        self._unsubscribe: Optional[Callable[[], None]] = None
+        self.writer = CloudWriter(
+            self.backup_config, self.patch_active_profile,
+            patch_config=self.patch_config, outbox=CloudOutbox(get_cloud_outbox_path()),
+        )
 
         # self.uid = self.session.get_uid()
         # self.id_token = self.session.get_id_token()
@@ -65,9 +266,12 @@ class CloudSync:
         self.uid = session["uid"]
         self._id_token = session["idToken"]
         self._refresh_token = session["refreshToken"]
+        self.writer.outbox.bind(self.uid)
 
         # 1) read local (if any)
-        local = load_json_file(self.local_config_path, self.file_lock)
+        store = self._store()
+        local = store.snapshot().thaw() if store.path.exists() else None
+        self._watch(store)
 
         # 2) read cloud (may be None if first time)
         cloud = get_user_config(self.rtdb, self._id_token, self.uid)
@@ -76,8 +280,13 @@ class CloudSync:
 
         # print(f"Local config: {local}")
         # print(f"Cloud config: {cloud}")
+        # Saves from here on are diffed against what the cloud holds now
+        self.writer.set_synced(cloud)
+
         if local is not None:
             print("Local config exists. Keeping local as source of truth.")
+            # Upload changes left in the outbox by an earlier run
+            self.writer.kick()
             # Local exists → treat as truth
             return True
 
@@ -93,6 +302,7 @@ class CloudSync:
         print("No local or cloud config. Seeding defaults...")
         write_json_file(self.local_config_path, self.default_config, self.file_lock)
         put_user_config(self.rtdb, self.uid, self._id_token, self.default_config)
+        self.writer.set_synced(self.default_config)
         return True
         
     def backup_now(self) -> None:
@@ -103,7 +313,8 @@ class CloudSync:
         if not self.uid or not self._id_token:
             raise RuntimeError("CloudSync not connected (missing uid/idToken)")
 
-        local = load_json_file(self.local_config_path, self.file_lock) or self.default_config
+        store = self._store()
+        local = store.snapshot().thaw() if store.path.exists() else self.default_config
         
         id_token = self.session.get_id_token()   # refreshes if needed
         self.rtdb.put(f"users/{self.uid}", id_token, local)
@@ -113,8 +324,28 @@ class CloudSync:
         If you already have the config in memory (right after saving),
         upload that instead of re-reading file.
         """
-        id_token = self.session.get_id_token()   # refreshes if needed
-        self.rtdb.put(f"users/{self.uid}", id_token, config)
+        self._with_token(lambda token: self.rtdb.put(f"users/{self.uid}", token, config))
+
+    # Sends only changed paths (see cloud_delta); the writer uses this once the cloud state is known
+    def patch_config(self, updates: Dict[str, Any]) -> None:
+        self._with_token(lambda token: patch_user_config(self.rtdb, self.uid, token, updates))
+
+    def patch_active_profile(self, profile: str) -> None:
+        self._with_token(lambda token: set_active_profile(self.rtdb, self.uid, token, profile))
+
+    # Runs request(id_token); a 401 (token expired early or revoked) refreshes the token and tries once more
+    def _with_token(self, request: Callable[[str], Any]) -> Any:
+        try:
+            return request(self.session.get_id_token())
+        except RTDBError as e:
+            if e.status != 401:
+                raise
+            self.session.invalidate_id_token()
+            return request(self.session.get_id_token())
+
+    # Sends pending cloud writes before exit
+    def close(self, timeout: float = 5.0) -> None:
+        self.writer.close(timeout)
 
     def restore_to_local_if_possible(self) -> bool:
         """
@@ -131,3 +362,15 @@ class CloudSync:
         # write local
         write_json_file(self.local_config_path, cloud_data, self.file_lock)
         return True
+
+    def _store(self):
+        from desktop.core.config_store import get_store
+        return get_store(Path(self.local_config_path), self.file_lock)
+
+    def _watch(self, store) -> None:
+        if self._unsubscribe is None:
+            self._unsubscribe = store.subscribe(self._on_config_change)
+
+    # Store subscriber: runs on the writer's thread, so uploads are queued for the cloud writer
+    def _on_config_change(self, snapshot, source: str) -> None:
+        self.writer.submit(snapshot, source)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import os
+import threading
+from typing import Any, Dict, Iterable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# One keep-alive, connection-pooled requests.Session shared by RTDBClient and
+# FirebaseAuthClient, so a sign-in + seed + backup reuses the TLS connections to
+# identitytoolkit, securetoken and the database instead of handshaking per call.
+#
+#   CLOUD_HTTP_POOL     connections kept per host (default 4)
+#   CLOUD_HTTP_RETRIES  retries for idempotent calls (GET/PUT/DELETE) on connect
+#                       errors and 429/5xx (default 3; POST/PATCH are never retried)
+#   CLOUD_HTTP_BACKOFF  backoff factor in seconds: 0.5 waits 0.5s, 1s, 2s... (default 0.5)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_SESSION: requests.Session | None = None
+_SESSION_LOCK = threading.Lock()
+_STATS = {"requests": 0, "errors": 0, "prewarmed": 0}
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _count(response: requests.Response, *args, **kwargs):
+    _STATS["requests"] += 1
+    if response.status_code >= 400:
+        _STATS["errors"] += 1
+
+
+def new_session(pool_size: int | None = None, retries: int | None = None, backoff: float | None = None) -> requests.Session:
+    pool_size = int(pool_size or _env_number("CLOUD_HTTP_POOL", 4))
+    retries = int(_env_number("CLOUD_HTTP_RETRIES", 3) if retries is None else retries)
+    backoff = _env_number("CLOUD_HTTP_BACKOFF", 0.5) if backoff is None else backoff
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # callers read Firebase's error body themselves
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(_count)
+    return session
+
+
+# The shared session, created on first use
+def get_session() -> requests.Session:
+    global _SESSION
+    session = _SESSION
+    if session is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = new_session()
+            session = _SESSION
+    return session
+
+
+def close() -> None:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+# Opens a connection to each URL's host in the background so the first real call skips the handshake
+def prewarm(urls: Iterable[str | None], timeout: float = 5.0) -> threading.Thread:
+    origins = []
+    for url in urls:
+        if url:
+            parts = urlsplit(url)
+            origin = f"{parts.scheme}://{parts.netloc}/"
+            if parts.netloc and origin not in origins:
+                origins.append(origin)
+
+    def run():
+        session = get_session()
+        for origin in origins:
+            try:
+                # Any status will do; all we want is the open connection left in the pool
+                session.head(origin, timeout=timeout)
+                _STATS["prewarmed"] += 1
+            except requests.RequestException:
+                pass
+
+    thread = threading.Thread(target=run, name="http-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+# Requests sent vs connections opened; reused = requests that rode an existing connection
+def stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = dict(_STATS)
+    connections = 0
+    sent = 0
+    session = _SESSION
+    if session is not None:
+        for adapter in set(session.adapters.values()):
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    sent += pool.num_requests
+    out["connections"] = connections
+    out["reused"] = max(0, sent - connections)
+    return out
@@ -0,0 +1,148 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from desktop.core import config_io
+from desktop.core.log import get_logger
+
+log = get_logger("cloud_outbox")
+
+# The root path: the whole users/{uid} node, sent as a put
+ROOT = ""
+
+
+def _copy(value: Any) -> Any:
+    return json.loads(json.dumps(value))
+
+
+def _is_under(path: str, ancestor: str) -> bool:
+    return ancestor == ROOT or path.startswith(ancestor + "/")
+
+
+# Sets (or with None, deletes) parts inside value, creating objects on the way
+def _set_in(value: Any, parts: List[str], new: Any) -> Any:
+    if not parts:
+        return new
+    if not isinstance(value, dict):
+        value = {}
+    head, rest = parts[0], parts[1:]
+    child = _set_in(value.get(head), rest, new)
+    if child is None:
+        value.pop(head, None)
+    else:
+        value[head] = child
+    return value
+
+
+class CloudOutbox:
+    """
+    Durable queue of cloud updates that haven't been acknowledged yet.
+
+    Entries are RTDB paths under users/{uid} ("activeProfile",
+    "profiles/work/BTN:1", "" for the whole node) with their latest value
+    (None deletes) and when the oldest change folded into them was queued.
+    Adding a path replaces the entries below it, and a path below a pending
+    entry is merged into that entry's value, so the queue never holds
+    overlapping paths and its size is bounded by what actually differs
+    from the cloud. Every change is written to `path` (cloud_outbox.json),
+    so updates made offline or right before exit are sent on the next run.
+    """
+    def __init__(self, path: Path | str | None = None):
+        self.path = Path(path) if path else None
+        self.uid: Optional[str] = None
+        self._lock = threading.Lock()
+        self._entries: Dict[str, list] = {}
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        data = config_io.read_json(self.path, recover=False)
+        if not isinstance(data, dict):
+            return
+        entries = data.get("entries")
+        if isinstance(entries, dict):
+            self._entries = {p: list(e) for p, e in entries.items() if isinstance(e, list) and len(e) == 2}
+        self.uid = data.get("uid")
+        if self._entries:
+            log.info("%d cloud update(s) pending from a previous run", len(self._entries))
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            config_io.write_json(self.path, {"uid": self.uid, "entries": self._entries}, backup=False)
+        except Exception as e:
+            log.warning("Could not persist cloud outbox: %s", e)
+
+    # Ties the queue to an account; updates queued for another account are dropped
+    def bind(self, uid: str) -> None:
+        with self._lock:
+            if self.uid == uid:
+                return
+            if self.uid is not None and self._entries:
+                log.warning("Dropping %d cloud update(s) queued for another account", len(self._entries))
+                self._entries = {}
+            self.uid = uid
+            self._save()
+
+    def add(self, updates: Dict[str, Any], now: float | None = None) -> None:
+        if not updates:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            for path, value in updates.items():
+                self._add(path, _copy(value), now)
+            self._save()
+
+    def _add(self, path: str, value: Any, now: float):
+        for pending in self._entries:
+            if path != pending and _is_under(path, pending):
+                entry = self._entries[pending]
+                parts = path.split("/") if pending == ROOT else path[len(pending) + 1:].split("/")
+                entry[0] = _set_in(entry[0], parts, value)
+                return
+        since = now
+        for pending in [p for p in self._entries if p == path or _is_under(p, path)]:
+            since = min(since, self._entries.pop(pending)[1])
+        self._entries[path] = [value, since]
+
+    # Copy of everything pending, as a multi-location update (path -> value)
+    def take(self) -> Dict[str, Any]:
+        with self._lock:
+            return {path: _copy(entry[0]) for path, entry in self._entries.items()}
+
+    # Drops what sent covered, unless it was changed again while the request was in flight
+    def done(self, sent: Dict[str, Any]) -> None:
+        with self._lock:
+            for path, value in sent.items():
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] == value:
+                    del self._entries[path]
+            self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._entries:
+                self._entries = {}
+                self._save()
+
+    # config with every pending update applied: what the cloud will hold once the queue drains
+    def apply_to(self, config: Optional[Dict[str, Any]]) -> Any:
+        result = _copy(config)
+        for path, value in self.take().items():
+            result = _set_in(result, path.split("/") if path else [], value)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def oldest_age(self, now: float | None = None) -> float | None:
+        with self._lock:
+            if not self._entries:
+                return None
+            oldest = min(entry[1] for entry in self._entries.values())
+        return max(0.0, (time.time() if now is None else now) - oldest)
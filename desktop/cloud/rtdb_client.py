@@ -3,34 +3,50 @@ import json
 from typing import Any, Dict, Optional
 import requests
 
+from desktop.cloud import http_session
+
+
+class RTDBError(RuntimeError):
+    """A request the database answered with an error (HTTP status >= 400 or an "error" body)."""
+    def __init__(self, status: int, message: str):
+        self.status = status
+        super().__init__(f"RTDB error {status}: {message}")
+
+
 class RTDBClient:
-    def __init__(self, database_url: str):
+    # session defaults to the shared keep-alive pool (http_session.get_session())
+    def __init__(self, database_url: str, session: requests.Session | None = None):
         if not database_url:
             raise ValueError("Database URL is required for RTDBClient.")
         self.database_url = database_url.rstrip('/')
+        self.session = session or http_session.get_session()
 
     def _url(self, path: str) -> str:
         path = path.strip("/")
         return f"{self.database_url}/{path}.json"
         
     def get(self, path: str, id_token: str) -> Any:
-        r = requests.get(self._url(path), params={"auth": id_token}, timeout=20)
+        r = self.session.get(self._url(path), params={"auth": id_token}, timeout=20)
         return self._handle(r)
 
     def put(self, path: str, id_token: str, data: Any) -> Any:
-        r = requests.put(self._url(path), params={"auth": id_token}, json=data, timeout=20)
+        r = self.session.put(self._url(path), params={"auth": id_token}, json=data, timeout=20)
         return self._handle(r)
 
     def patch(self, path: str, id_token: str, data: Dict[str, Any]) -> Any:
-        r = requests.patch(self._url(path), params={"auth": id_token}, json=data, timeout=20)
+        r = self.session.patch(self._url(path), params={"auth": id_token}, json=data, timeout=20)
         return self._handle(r)
     
+    # Firebase reports failures (expired token, rules, bad path) as {"error": "..."} bodies
     def _handle(self, response: requests.Response) -> Any:
         try:
             data = response.json()
         except Exception as e:
             response.raise_for_status()
             raise RuntimeError("Invalid response from RTDB") from e
+        if response.status_code >= 400 or (isinstance(data, dict) and "error" in data):
+            message = data.get("error") if isinstance(data, dict) else data
+            raise RTDBError(response.status_code, str(message))
         return data
     
 def seed_if_missing(
@@ -76,5 +92,10 @@ def set_active_profile(rtdb: RTDBClient, uid: str, id_token: str, profile: str)
 def set_profiles(rtdb: RTDBClient, uid: str, id_token: str, profiles: Dict[str, Any]) -> None:
     rtdb.patch(f"users/{uid}/profiles", id_token, profiles)
 
+# Multi-location update: updates maps "profiles/<name>/<button>"-style paths under users/{uid}
+# to new values (None deletes). RTDB applies all of them atomically.
+def patch_user_config(rtdb: RTDBClient, uid: str, id_token: str, updates: Dict[str, Any]) -> None:
+    rtdb.patch(f"users/{uid}", id_token, updates)
+
 def put_user_config(rtdb: RTDBClient, uid: str, id_token: str, config: Dict[str, Any]) -> None:
     rtdb.put(f"users/{uid}", id_token, config)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+import difflib
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence, Tuple
+
+from desktop.core.injection import VK_CODES
+
+# Compiles the key lists in buttonControls.json into Action objects.
+#
+# Key names are canonicalized to pyautogui's names: case is folded for named
+# keys, common spellings ("control", "cmd", "escape"...) map to one name, and
+# anything pyautogui doesn't know is rejected with a message naming the
+# profile, the button and the key. Single characters keep their case ("A" and
+# "!" are typed with shift, as pyautogui does). When every key is in the
+# injection key table (VK_CODES) the result carries the VK codes too, so the
+# hot path never resolves names; otherwise codes is None and the chord is
+# pressed by name.
+
+# Spellings people type -> the name VK_CODES and pyautogui use
+KEY_ALIASES: Dict[str, str] = {
+    "control": "ctrl", "ctl": "ctrl", "lctrl": "ctrlleft", "rctrl": "ctrlright",
+    "lshift": "shiftleft", "rshift": "shiftright",
+    "option": "alt", "lalt": "altleft", "ralt": "altright",
+    "cmd": "win", "command": "win", "super": "win", "meta": "win", "windows": "win", "lwin": "winleft", "rwin": "winright",
+    "return": "enter", "escape": "esc", "del": "delete", "ins": "insert",
+    "pgup": "pageup", "pgdn": "pagedown", "prtsc": "printscreen", "prtscr": "printscreen", "prntscrn": "printscreen",
+    "spacebar": "space", "caps": "capslock", "menu": "apps",
+    "mute": "volumemute", "play": "playpause", "next": "nexttrack", "prev": "prevtrack",
+    "minus": "-", "comma": ",", "period": ".", "slash": "/", "backslash": "\\",
+    "semicolon": ";", "quote": "'", "backtick": "`", "grave": "`",
+}
+
+# Every key name pyautogui accepts (pyautogui.KEYBOARD_KEYS, plus capital letters)
+PYAUTOGUI_KEYS = frozenset(
+    [chr(c) for c in range(0x20, 0x7F)] + ["\t", "\n", "\r"] + [
+        "accept", "add", "alt", "altleft", "altright", "apps", "backspace",
+        "browserback", "browserfavorites", "browserforward", "browserhome", "browserrefresh",
+        "browsersearch", "browserstop", "capslock", "clear", "convert", "ctrl", "ctrlleft", "ctrlright",
+        "decimal", "del", "delete", "divide", "down", "end", "enter", "esc", "escape", "execute",
+        "final", "fn", "hanguel", "hangul", "hanja", "help", "home", "insert", "junja", "kana", "kanji",
+        "launchapp1", "launchapp2", "launchmail", "launchmediaselect", "left", "modechange", "multiply",
+        "nexttrack", "nonconvert", "numlock", "pagedown", "pageup", "pause", "pgdn", "pgup", "playpause",
+        "prevtrack", "print", "printscreen", "prntscrn", "prtsc", "prtscr", "return", "right", "scrolllock",
+        "select", "separator", "shift", "shiftleft", "shiftright", "sleep", "space", "stop", "subtract",
+        "tab", "up", "volumedown", "volumemute", "volumeup", "win", "winleft", "winright", "yen",
+        "command", "option", "optionleft", "optionright",
+    ]
+    + [f"f{i}" for i in range(1, 25)] + [f"num{i}" for i in range(10)]
+)
+
+MODIFIERS = frozenset({
+    "ctrl", "ctrlleft", "ctrlright", "shift", "shiftleft", "shiftright",
+    "alt", "altleft", "altright", "win", "winleft", "winright",
+})
+
+# Names suggested in "did you mean" hints: canonical, human-typeable ones
+_SUGGESTIONS = sorted({name for name in PYAUTOGUI_KEYS if len(name) > 1} | set(KEY_ALIASES))
+
+
+class InvalidMapping(ValueError):
+    pass
+
+
+class MappingError(NamedTuple):
+    profile: str
+    button_id: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.profile} / {self.button_id}: {self.message}"
+
+
+class ConfigError(ValueError):
+    """Raised at save time with every invalid mapping in the config."""
+    def __init__(self, problems: Sequence[MappingError]):
+        self.problems = list(problems)
+        super().__init__("Invalid key mappings:\n" + "\n".join(f"  {p}" for p in self.problems))
+
+
+class Action(NamedTuple):
+    """One compiled chord: canonical key names and their pre-resolved virtual-key codes (None if any key has none)."""
+    keys: Tuple[str, ...]
+    codes: Tuple[int, ...] | None
+
+    @property
+    def label(self) -> str:
+        return "+".join(self.keys)
+
+
+def canonical_key(name: Any) -> str:
+    if not isinstance(name, str) or not name.strip():
+        raise InvalidMapping(f"key names must be non-empty strings, got {name!r}")
+    # Single characters are keys as written (" ", "A", "!"); anything longer is a name with stray whitespace
+    key = name if len(name) == 1 else name.strip().lower()
+    key = KEY_ALIASES.get(key, key)
+    if key not in PYAUTOGUI_KEYS:
+        hint = difflib.get_close_matches(key, _SUGGESTIONS, n=1)
+        raise InvalidMapping(f"unknown key '{name}'" + (f" (did you mean '{KEY_ALIASES.get(hint[0], hint[0])}'?)" if hint else ""))
+    return key
+
+
+def compile_action(keys: Iterable[Any]) -> Action:
+    if isinstance(keys, (str, bytes)) or not isinstance(keys, Iterable):
+        raise InvalidMapping(f"keys must be a list of key names, got {keys!r}")
+    names = tuple(canonical_key(k) for k in keys)
+    if not names:
+        raise InvalidMapping("no keys")
+    dupes = sorted({k for k in names if names.count(k) > 1})
+    if dupes:
+        raise InvalidMapping(f"key '{dupes[0]}' appears more than once")
+    if all(k in MODIFIERS for k in names):
+        raise InvalidMapping(f"'{'+'.join(names)}' has only modifiers; add a non-modifier key (ex: ctrl+a)")
+    codes = tuple(VK_CODES[k] for k in names) if all(k in VK_CODES for k in names) else None
+    return Action(names, codes)
+
+
+# (profile, button_id) -> Action for every valid mapping, plus what was wrong with the rest.
+# Buttons with an empty key list are simply unmapped.
+def compile_config(config: Mapping[str, Any] | None) -> Tuple[Dict[Tuple[str, str], Action], List[MappingError]]:
+    table: Dict[Tuple[str, str], Action] = {}
+    problems: List[MappingError] = []
+    profiles = (config or {}).get("profiles") or {}
+    if not isinstance(profiles, Mapping):
+        return table, [MappingError("*", "*", "profiles must be an object")]
+
+    for profile, buttons in profiles.items():
+        compile_profile(profile, buttons, table, problems)
+    return table, problems
+
+
+# compile_config for one profile, adding to table and problems
+def compile_profile(profile: str, buttons: Any, table: Dict[Tuple[str, str], Action], problems: List[MappingError]) -> None:
+    if not isinstance(buttons, Mapping):
+        problems.append(MappingError(profile, "*", "profile must be an object of buttons"))
+        return
+    for button_id, mapping in buttons.items():
+        if not isinstance(mapping, Mapping):
+            problems.append(MappingError(profile, button_id, 'mapping must be an object like {"keys": [...]}'))
+            continue
+        keys = mapping.get("keys")
+        if not keys:
+            continue
+        try:
+            table[(profile, button_id)] = compile_action(keys)
+        except InvalidMapping as e:
+            problems.append(MappingError(profile, button_id, str(e)))
+
+
+# Rewrites every key list to canonical names in place; raises ConfigError if any mapping is invalid
+def validate_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    table, problems = compile_config(config)
+    if problems:
+        raise ConfigError(problems)
+    for (profile, button_id), action in table.items():
+        config["profiles"][profile][button_id]["keys"] = list(action.keys)
+    return config
@@ -0,0 +1,223 @@
+from __future__ import annotations
+import json
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from desktop.core import config_io
+from desktop.core.log import get_logger
+
+log = get_logger("config_history")
+
+# Bounded on-disk history of the config, for undoing a bad save or cloud restore.
+#
+# Only the newest version (the head) is stored in full. Every older version is
+# a reverse delta: the zlib-compressed list of edits that turns the next newer
+# version back into it, at dict-key granularity (one changed button is one small
+# op). Going back k versions applies k deltas to the head; dropping the oldest
+# version just drops its delta.
+#
+# File: b"CKH1", then length-prefixed zlib records. The first holds the head and
+# the entry list; the rest are the deltas, newest first. Delta records are copied
+# as-is when a version is added, so a save only compresses the head and one delta.
+MAX_VERSIONS = 50
+# Store changes that don't get a history entry: startup loads and tray profile switches
+SKIP_SOURCES = ("load", "profile")
+
+_MAGIC = b"CKH1"
+_LEN = struct.Struct("<I")
+
+
+class HistoryEntry(NamedTuple):
+    id: int
+    ts: float
+    source: str
+    restored_from: Optional[int] = None
+
+
+# Ops that turn old into new: ["set", path, value], ["del", path], ["order", path, keys]
+def diff(old: Any, new: Any) -> List[list]:
+    ops: List[list] = []
+    _diff(old, new, [], ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: List[str], ops: List[list]):
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        ops.append(["set", path, new])
+        return
+    removed = [k for k in old if k not in new]
+    for k in removed:
+        ops.append(["del", path + [k]])
+    for k, v in new.items():
+        if k not in old:
+            ops.append(["set", path + [k], v])
+        elif old[k] != v:
+            _diff(old[k], v, path + [k], ops)
+    # New keys land at the end when applied; record the order if that isn't the right one
+    kept = [k for k in old if k in new]
+    if kept + [k for k in new if k not in old] != list(new):
+        ops.append(["order", path, list(new)])
+
+
+def apply(config: Any, ops: List[list]) -> Any:
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            config = op[2] if kind == "set" else config
+            continue
+        parent = config
+        for k in path[:-1]:
+            parent = parent[k]
+        if kind == "set":
+            parent[path[-1]] = op[2]
+        elif kind == "del":
+            parent.pop(path[-1], None)
+        elif kind == "order":
+            target = parent[path[-1]]
+            reordered = {k: target[k] for k in op[2] if k in target}
+            target.clear()
+            target.update(reordered)
+    return config
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+def _copy(config: Dict[str, Any]) -> Dict[str, Any]:
+    return json.loads(json.dumps(config))
+
+
+class ConfigHistory:
+    """
+    Keeps the last `max_versions` versions of the config store's content.
+
+    attach(store) records every store change (except SKIP_SOURCES). restore()
+    puts an older version back through the store with source "rollback",
+    which is itself recorded, so a rollback can be undone too. undo_target()
+    walks back past versions that were restored, so repeated undos keep
+    going further back instead of toggling.
+    """
+    def __init__(self, path: Path | str, max_versions: int = MAX_VERSIONS):
+        self.path = Path(path)
+        self.max_versions = max(1, max_versions)
+        self._lock = threading.RLock()
+        self._head: Dict[str, Any] | None = None
+        self._entries: List[HistoryEntry] = []
+        # _deltas[i] turns entries[i]'s config into entries[i + 1]'s
+        self._deltas: List[bytes] = []
+        self._restoring: Optional[int] = None
+        self._load()
+
+    def _load(self):
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            return
+        try:
+            if not raw.startswith(_MAGIC):
+                raise ValueError("bad header")
+            records, pos = [], len(_MAGIC)
+            while pos < len(raw):
+                (n,) = _LEN.unpack_from(raw, pos)
+                pos += _LEN.size
+                records.append(raw[pos:pos + n])
+                pos += n
+            header = _unpack(records[0])
+            self._head = header["head"]
+            self._entries = [HistoryEntry(*e) for e in header["entries"]]
+            self._deltas = records[1:len(self._entries)]
+        except Exception as e:
+            log.warning("Config history is unreadable, starting a new one: %s", e)
+            self._head, self._entries, self._deltas = None, [], []
+
+    def _save(self):
+        header = _pack({"head": self._head, "entries": [list(e) for e in self._entries]})
+        out = [_MAGIC]
+        for record in [header] + self._deltas:
+            out.append(_LEN.pack(len(record)))
+            out.append(record)
+        config_io.write_bytes(self.path, b"".join(out))
+
+    def record(self, config: Dict[str, Any], source: str, restored_from: Optional[int] = None) -> HistoryEntry | None:
+        with self._lock:
+            if config == self._head:
+                return None
+            config = _copy(config)
+            entry = HistoryEntry((self._entries[0].id + 1) if self._entries else 1, time.time(), source, restored_from)
+            if self._head is not None:
+                self._deltas.insert(0, _pack(diff(config, self._head)))
+            self._entries.insert(0, entry)
+            self._head = config
+            del self._entries[self.max_versions:]
+            del self._deltas[self.max_versions - 1:]
+            self._save()
+            return entry
+
+    def entries(self) -> List[HistoryEntry]:
+        with self._lock:
+            return list(self._entries)
+
+    def config_at(self, entry_id: int) -> Dict[str, Any]:
+        with self._lock:
+            for i, entry in enumerate(self._entries):
+                if entry.id == entry_id:
+                    config = _copy(self._head)
+                    for blob in self._deltas[:i]:
+                        config = apply(config, _unpack(blob))
+                    return config
+        raise KeyError(f"No config version {entry_id}")
+
+    # The version an "undo" should go to: the one before the current, skipping over restored ones
+    def undo_target(self) -> HistoryEntry | None:
+        with self._lock:
+            if not self._entries:
+                return None
+            current = self._entries[0]
+            start = 1
+            if current.restored_from is not None:
+                ids = [e.id for e in self._entries]
+                if current.restored_from in ids:
+                    start = ids.index(current.restored_from) + 1
+            return self._entries[start] if start < len(self._entries) else None
+
+    # Puts a version back through the store (default: undo_target()); returns the entry restored
+    def restore(self, store, entry_id: int | None = None) -> HistoryEntry | None:
+        target = self.undo_target() if entry_id is None else next((e for e in self.entries() if e.id == entry_id), None)
+        if target is None:
+            return None
+        config = self.config_at(target.id)
+        self._restoring = target.id
+        try:
+            store.replace(config, source="rollback")
+        finally:
+            self._restoring = None
+        log.info("Restored config version %s", target.id, source=target.source)
+        return target
+
+    # Records the store's current content if it differs from the last recorded version, then follows changes
+    def attach(self, store):
+        current = store.snapshot().thaw()
+        if current != self._head:
+            self.record(current, "startup")
+        return store.subscribe(self._on_change)
+
+    def _on_change(self, snapshot, source: str):
+        if source in SKIP_SOURCES:
+            return
+        self.record(snapshot.thaw(), source, self._restoring if source == "rollback" else None)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        return {"versions": len(self._entries), "bytes": size}
@@ -0,0 +1,187 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from desktop.core.log import get_logger
+
+log = get_logger("config_io")
+
+# The one way JSON files in the app data dir are written and read.
+#
+# write_json serializes, and if the bytes hash the same as what this process last
+# wrote (or read) for that path and the file hasn't been touched since (same size
+# and mtime), nothing touches the disk. Otherwise:
+#   1. the new content goes to <name>.tmp and is fsync'ed
+#   2. the current file, if it still parses, is renamed to <name>.bak
+#   3. <name>.tmp is renamed over <name>
+# A crash at any point leaves either the old or the new file complete, plus the
+# previous version in .bak. read_json falls back to .bak (and restores it) when
+# the main file is missing or unparsable.
+_IO_LOCK = threading.RLock()
+# resolved path -> (sha256 of the content, (size, mtime_ns) right after we wrote/read it)
+_LAST_HASH: Dict[str, Tuple[str, Tuple[int, int] | None]] = {}
+_STATS = {"writes": 0, "skipped": 0, "recovered": 0}
+_REPLACE_RETRIES = 5
+
+
+def backup_path(path: Path) -> Path:
+    return path.with_name(path.name + ".bak")
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _key(path: Path) -> str:
+    return str(Path(path).resolve())
+
+
+def digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+# Content hash of what this process last wrote or read for path (None if nothing yet)
+def last_digest(path: Path) -> str | None:
+    last = _LAST_HASH.get(_key(Path(path)))
+    return last[0] if last else None
+
+
+# Records raw as the current content of path, e.g. after a file watcher applied it
+def remember(path: Path, raw: bytes) -> None:
+    path = Path(path)
+    with _IO_LOCK:
+        _remember(_key(path), path, digest(raw))
+
+
+# (size, mtime_ns), or None if the file doesn't exist
+def stamp(path: Path) -> Tuple[int, int] | None:
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _remember(key: str, path: Path, content_hash: str):
+    _LAST_HASH[key] = (content_hash, stamp(path))
+
+
+def serialize(data: Any) -> bytes:
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+# os.replace can briefly fail on Windows while another process (an editor, antivirus) has the file open
+def _replace(src: Path, dst: Path):
+    for attempt in range(_REPLACE_RETRIES):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == _REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.02 * (attempt + 1))
+
+
+def _fsync_dir(path: Path):
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(str(path.parent), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _is_valid_json(path: Path) -> bool:
+    try:
+        json.loads(path.read_text(encoding="utf-8"))
+        return True
+    except Exception:
+        return False
+
+
+# Returns True if the file was written, False if the content was unchanged
+def write_json(path: Path, data: Any, backup: bool = True) -> bool:
+    return write_bytes(path, serialize(data), backup=backup)
+
+
+# Same atomic, hash-skipping write for any content; the .bak rotation only applies to valid JSON
+def write_bytes(path: Path, raw: bytes, backup: bool = False) -> bool:
+    path = Path(path)
+    content_hash = digest(raw)
+    key = _key(path)
+
+    with _IO_LOCK:
+        last = _LAST_HASH.get(key)
+        if last and last[0] == content_hash and last[1] is not None and last[1] == stamp(path):
+            _STATS["skipped"] += 1
+            return False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(path)
+        with open(tmp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Only a file that still parses becomes the last-known-good copy
+        if backup and path.exists() and _is_valid_json(path):
+            _replace(path, backup_path(path))
+        _replace(tmp, path)
+        _fsync_dir(path)
+
+        _remember(key, path, content_hash)
+        _STATS["writes"] += 1
+    return True
+
+
+# Parsed content of path, falling back to (and restoring) the .bak copy; None if neither is usable
+def read_json(path: Path, recover: bool = True) -> Any | None:
+    path = Path(path)
+    key = _key(path)
+    with _IO_LOCK:
+        try:
+            raw = path.read_bytes()
+            data = json.loads(raw)
+            _remember(key, path, digest(raw))
+            return data
+        except FileNotFoundError:
+            problem = "missing"
+        except Exception as e:
+            problem = f"unreadable ({e})"
+
+        bak = backup_path(path)
+        if not recover or not bak.exists():
+            return None
+        try:
+            raw = bak.read_bytes()
+            data = json.loads(raw)
+        except Exception as e:
+            log.error("%s is %s and the backup is unusable too: %s", path.name, problem, e)
+            return None
+
+        log.warning("%s is %s; restoring last known good copy", path.name, problem)
+        tmp = _tmp_path(path)
+        with open(tmp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmp, path)
+        _fsync_dir(path)
+        _remember(key, path, digest(raw))
+        _STATS["recovered"] += 1
+        return data
+
+
+def stats() -> Dict[str, int]:
+    return dict(_STATS)
@@ -1,10 +1,20 @@
+from __future__ import annotations
 import json
+import os
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple
 from desktop.core.paths import get_config_path, get_default_config_path
-from threading import RLock
+from threading import Condition, Lock, RLock, Thread
 from desktop.cloud.rtdb_client import RTDBClient, set_profiles, set_active_profile
 from desktop.cloud.auth_client import ensure_logged_in
+from desktop.core import actions, config_io, keymap
+from desktop.core.log import get_logger
 import desktop.cloud.cloud as cloud
 
+log = get_logger("config")
+
 EMBEDDED_DEFAULT_CONFIG = {
     "activeProfile": "default",
     "profiles": {
@@ -12,48 +22,433 @@ EMBEDDED_DEFAULT_CONFIG = {
     }
 }
 
+# Config values are JSON: dicts (MappingProxyType once frozen), lists/tuples and scalars.
+# Concrete type checks only; isinstance(x, typing.Mapping) goes through the ABC machinery on every node.
+def _freeze(value):
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(v) for v in value]
+    return value
+
+
+# Reuses the previous snapshot's object for every profile that didn't change, so consumers
+# that cache per profile (the keymap) can tell unchanged profiles apart by identity
+def _share_profiles(frozen: Mapping[str, Any], previous: "ConfigSnapshot | None") -> Mapping[str, Any]:
+    profiles = frozen.get("profiles")
+    old_profiles = previous.data.get("profiles") if previous is not None else None
+    if not isinstance(profiles, MappingProxyType) or not isinstance(old_profiles, MappingProxyType):
+        return frozen
+    shared = {}
+    for name, buttons in profiles.items():
+        old = old_profiles.get(name)
+        shared[name] = old if old is not None and old is not buttons and old == buttons else buttons
+    root = dict(frozen)
+    root["profiles"] = MappingProxyType(shared)
+    return MappingProxyType(root)
+
+
+class ConfigSnapshot(NamedTuple):
+    """One version of the config. data is deeply read-only; thaw() gives an editable copy."""
+    version: int
+    data: Mapping[str, Any]
+
+    @property
+    def active_profile(self) -> str | None:
+        return self.data.get("activeProfile")
+
+    def thaw(self) -> Dict[str, Any]:
+        return _thaw(self.data)
+
+    # Editable copy of one profile's buttons, for ConfigStore.patch(); None if there's no such profile
+    def thaw_profile(self, name: str) -> Dict[str, Any] | None:
+        buttons = (self.data.get("profiles") or {}).get(name)
+        return None if buttons is None else _thaw(buttons)
+
+
+# callback(snapshot, source); source says who changed it: "load", "warm", "repair", "save", "profile", "cloud", "defaults"
+Subscriber = Callable[[ConfigSnapshot, str], None]
+
+
+class JsonFileStorage:
+    """Default persistence: the whole config as buttonControls.json, written through config_io."""
+    transactional = False
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    # A crash between renames can leave only the last known good copy; reading it restores the file
+    def exists(self) -> bool:
+        return self.path.exists() or config_io.read_json(self.path) is not None
+
+    def read(self) -> Dict[str, Any] | None:
+        return config_io.read_json(self.path)
+
+    # previous is the last persisted config; engines that store rows use it to write only the difference
+    def write(self, data: Dict[str, Any], previous: Mapping[str, Any] | None = None) -> None:
+        config_io.write_json(self.path, data)
+
+
+class ConfigStore:
+    """
+    Owns the parsed buttonControls.json for the running app.
+
+    Readers call snapshot() and get the current immutable ConfigSnapshot
+    without taking any lock (it's a single reference swap). Writers go
+    through update()/replace(): they serialize on the file lock, edit a
+    private copy, persist it via config_io and only then swap in the new
+    snapshot with version + 1 and notify subscribers (the keymap, the GUI,
+    cloud backup). Subscribers run on the writer's thread, in version
+    order, so they must hand anything slow off to another thread.
+
+    With write_delay > 0 the file write is deferred: each change is only
+    appended to <name>.journal (one fsync'ed line holding the whole
+    config, still cheaper than the atomic rewrite + .bak rotation) and the
+    "config-writer" thread writes the latest snapshot once the window has
+    passed, so a burst of profile switches costs one real rewrite. load()
+    replays a journal left behind by a crash; flush()/close() write out
+    anything pending immediately.
+
+    storage decides where the config lives: JsonFileStorage (default) or
+    profile_db.ProfileDB, which keeps profiles as SQLite rows. Storage that
+    is transactional (commits only the changed rows) is always written
+    through: journaling the whole config would cost more than the write.
+
+    update() hands the mutator a full copy, so it costs O(config size).
+    patch() replaces whole profiles and top-level keys instead: the other
+    profiles are shared with the previous snapshot, and storage that has
+    write_changes() is given just the changed profiles.
+    """
+    def __init__(self, path: Path, file_lock: RLock | None = None, write_delay: float = 0.0, storage=None):
+        self.path = Path(path)
+        self.file_lock = file_lock or RLock()
+        self.write_delay = write_delay
+        self.storage = storage or JsonFileStorage(self.path)
+        self._persisted: Mapping[str, Any] | None = None
+        self._snapshot: ConfigSnapshot | None = None
+        self._subscribers: List[Subscriber] = []
+
+        self.flushes = 0
+        self.coalesced = 0
+        self._cond = Condition(Lock())
+        self._dirty_since: float | None = None
+        self._closing = False
+        self._writer: Thread | None = None
+
+    @property
+    def journal_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".journal")
+
+    def snapshot(self) -> ConfigSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            snap = self.load()
+        return snap
+
+    @property
+    def version(self) -> int:
+        snap = self._snapshot
+        return snap.version if snap else 0
+
+    # (Re)reads the file. A file that needed repairs is written back (locally only)
+    def load(self) -> ConfigSnapshot:
+        with self.file_lock:
+            pending = self._read_journal()
+            if pending is not None:
+                log.warning("Recovering config changes that were not flushed before exit")
+                self._write(pending)
+                self._mark_clean()
+                self._clear_journal()
+            raw = self.storage.read()
+            self._persisted = raw
+            data, changed = normalize_config(_thaw(raw) if isinstance(raw, Mapping) else {})
+            if changed and raw is not None:
+                self._write(data)
+            return self._install(data, "repair" if changed and raw is not None else "load")
+
+    # Installs content known to match storage (warm start) without reading it; no-op once loaded
+    def prime(self, data: Mapping[str, Any], source: str = "warm") -> ConfigSnapshot:
+        with self.file_lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            data = _thaw(data)
+            self._persisted = data
+            return self._install(data, source)
+
+    # mutate(data) edits the copy in place or returns a replacement; no-op edits keep the version
+    def update(self, mutate: Callable[[Dict[str, Any]], Dict[str, Any] | None], source: str, persist: bool = True) -> ConfigSnapshot:
+        with self.file_lock:
+            current = self.snapshot()
+            data = current.thaw()
+            result = mutate(data)
+            if result is not None:
+                data = result
+            data, _ = normalize_config(data)
+            frozen = _freeze(data)
+            if frozen == current.data:
+                return current
+            return self._commit(data, source, persist, frozen)
+
+    # Sets whole profiles (None deletes one) and top-level keys; unchanged values keep the version
+    def patch(self, source: str, profiles: Mapping[str, Any] | None = None, top: Mapping[str, Any] | None = None,
+              persist: bool = True) -> ConfigSnapshot:
+        with self.file_lock:
+            current = self.snapshot()
+            old_profiles = current.data.get("profiles") or MappingProxyType({})
+            changed = {}
+            for name, buttons in (profiles or {}).items():
+                frozen = None if buttons is None else _freeze(buttons)
+                if frozen != old_profiles.get(name) and (frozen is not None or name in old_profiles):
+                    changed[name] = frozen
+            new_top = {k: _freeze(v) for k, v in (top or {}).items() if k != "profiles" and current.data.get(k) != _freeze(v)}
+            if not changed and not new_top:
+                return current
+
+            new_profiles = dict(old_profiles)
+            for name, frozen in changed.items():
+                if frozen is None:
+                    del new_profiles[name]
+                else:
+                    new_profiles[name] = frozen
+            root = dict(current.data)
+            root.update(new_top)
+            root["profiles"] = MappingProxyType(new_profiles)
+            frozen_root = MappingProxyType(root)
+
+            write_changes = getattr(self.storage, "write_changes", None)
+            valid = bool(new_profiles) and root.get("activeProfile") in new_profiles
+            if not persist or write_changes is None or self._persisted is None or not valid:
+                return self._commit(_thaw(frozen_root), source, persist, frozen_root)
+
+            plain = {name: _thaw(frozen) for name, frozen in changed.items()}
+            write_changes(plain, {k: _thaw(v) for k, v in root.items() if k != "profiles"} if new_top else None, self._persisted)
+            persisted = dict(self._persisted)
+            persisted["profiles"] = {n: b for n, b in {**(persisted.get("profiles") or {}), **plain}.items() if b is not None}
+            persisted.update({k: _thaw(v) for k, v in new_top.items()})
+            self._persisted = persisted
+            return self._install(None, source, frozen_root)
+
+    def replace(self, data: Dict[str, Any], source: str, persist: bool = True) -> ConfigSnapshot:
+        if not isinstance(data, Mapping):
+            raise TypeError(f"config must be an object, got {type(data).__name__}")
+        with self.file_lock:
+            return self._commit(_thaw(data), source, persist)
+
+    # Every snapshot meets the config invariants (see normalize_config), whatever the source:
+    # RTDB drops empty objects and hand edits can leave anything out
+    def _commit(self, data: Dict[str, Any], source: str, persist: bool, frozen: Mapping[str, Any] | None = None) -> ConfigSnapshot:
+        data, changed = normalize_config(data)
+        if changed:
+            log.warning("Config from %s had no profiles or an unknown activeProfile; repaired", source)
+            frozen = None
+        if not persist:
+            # The file already holds this content (e.g. a hand edit); nothing older may overwrite it
+            self._mark_clean()
+            self._persisted = data
+        elif self.write_delay > 0 and not getattr(self.storage, "transactional", False):
+            self._append_journal(data)
+            self._mark_dirty()
+        else:
+            self._write(data)
+        return self._install(data, source, frozen)
+
+    def _write(self, data: Dict[str, Any]):
+        self.storage.write(data, self._persisted)
+        self._persisted = data
+
+    def _append_journal(self, data: Dict[str, Any]):
+        with open(self.journal_path, "ab") as f:
+            f.write(json.dumps(data, separators=(",", ":")).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Last complete entry; a torn final line from a crash mid-append is skipped
+    def _read_journal(self) -> Dict[str, Any] | None:
+        try:
+            lines = self.journal_path.read_bytes().splitlines()
+        except FileNotFoundError:
+            return None
+        for line in reversed(lines):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                return data
+        return None
+
+    def _clear_journal(self):
+        try:
+            self.journal_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _mark_dirty(self):
+        with self._cond:
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            else:
+                self.coalesced += 1
+            if self._writer is None or not self._writer.is_alive():
+                self._closing = False
+                self._writer = Thread(target=self._run_writer, name="config-writer", daemon=True)
+                self._writer.start()
+            self._cond.notify()
+
+    def _mark_clean(self):
+        with self._cond:
+            was_dirty = self._dirty_since is not None
+            self._dirty_since = None
+        if was_dirty:
+            self._clear_journal()
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                while self._dirty_since is None and not self._closing:
+                    self._cond.wait()
+                if self._dirty_since is None:
+                    return
+                remaining = self._dirty_since + self.write_delay - time.monotonic()
+                if remaining > 0 and not self._closing:
+                    self._cond.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                # The journal still has the change; try again after another window
+                log.error("Config flush failed: %s", e)
+                with self._cond:
+                    if self._dirty_since is not None:
+                        self._dirty_since = time.monotonic()
+                    if self._closing:
+                        return
+
+    # Writes the latest snapshot now if a deferred write is pending; True if it wrote
+    def flush(self) -> bool:
+        with self.file_lock:
+            with self._cond:
+                if self._dirty_since is None:
+                    return False
+            self._write(self.snapshot().thaw())
+            self._mark_clean()
+            self.flushes += 1
+            return True
+
+    @property
+    def pending(self) -> bool:
+        return self._dirty_since is not None
+
+    # Flushes and stops the writer thread; safe to call more than once
+    def close(self, timeout: float = 2.0) -> None:
+        self.flush()
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        writer = self._writer
+        if writer is not None:
+            writer.join(timeout)
+            self._writer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self.version, "pending": self.pending, "flushes": self.flushes, "coalesced": self.coalesced}
+
+    # frozen, when the caller already has it, must be _freeze(data); data=None means frozen
+    # was built from the current snapshot and already shares its unchanged profiles (patch())
+    def _install(self, data: Dict[str, Any] | None, source: str, frozen: Mapping[str, Any] | None = None) -> ConfigSnapshot:
+        if data is not None:
+            frozen = _share_profiles(frozen if frozen is not None else _freeze(data), self._snapshot)
+        snap = ConfigSnapshot(self.version + 1, frozen)
+        self._snapshot = snap
+        for callback in list(self._subscribers):
+            try:
+                callback(snap, source)
+            except Exception as e:
+                log.error("Config subscriber %r failed: %s", callback, e)
+        return snap
+
+    # Returns a function that removes the subscription
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            try:
+                self._subscribers.remove(callback)
+            except ValueError:
+                pass
+        return unsubscribe
+
+
+_STORES: Dict[str, ConfigStore] = {}
+_STORES_LOCK = Lock()
+
+
+def _publish_keymap(snapshot: ConfigSnapshot, source: str):
+    if source == "warm":
+        return  # warm_start installed the cached compiled keymap already
+    keymap.publish(snapshot.data)
+
+
+# One store per config file; the first caller's file_lock (and storage) are the ones used
+def get_store(path: Path | None = None, file_lock: RLock | None = None, storage=None) -> ConfigStore:
+    path = Path(path or get_config_path())
+    key = str(path.resolve())
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = ConfigStore(path, file_lock, storage=storage)
+                store.subscribe(_publish_keymap)
+                _STORES[key] = store
+    return store
+
+
+def reset_stores() -> None:
+    with _STORES_LOCK:
+        _STORES.clear()
+
+
 # # Load the active profile before closing the program
 def load_prev_state(file_lock: RLock) -> str | None:
-    with file_lock:
-        with get_config_path().open("r", encoding="utf-8") as f:
-            temp_config = json.load(f)
-    return temp_config.get("activeProfile")
+    return get_store(get_config_path(), file_lock).snapshot().active_profile
 
 def load_config(file_lock):
 
-    from desktop.core.paths import get_config_path
-    print("GUI reading config from:", get_config_path())
+    log.debug("GUI reading config from: %s", get_config_path())
     
     ensure_local_config_exists(file_lock)
     
-    with file_lock:
-        try:
-            data = json.loads(get_config_path().read_text(encoding="utf-8"))
-        except Exception:
-            data = {}
+    return get_store(get_config_path(), file_lock).snapshot().thaw()
+        
+# Cloud backup of saves happens in CloudSync's store subscriber ("save" source) once it is connected.
+# Key names are canonicalized in data; any invalid mapping raises actions.ConfigError before anything is written.
+def save_config(file_lock, data, cloud_sync=cloud.cloud_sync, prof: str | None = None):
 
-        data, changed = normalize_config(data)
+    actions.validate_config(data)
+    ensure_local_config_exists(file_lock)
 
-        if changed:
-            # Write back repaired config (LOCAL ONLY; don't trigger cloud backup here)
-            get_config_path().write_text(json.dumps(data, indent=2), encoding="utf-8")
+    get_store(get_config_path(), file_lock).replace(data, source="save" if cloud_sync else "local")
 
-        return data
-        
-def save_config(file_lock, data, cloud_sync=cloud.cloud_sync, prof: str | None = None):
+# Saves one profile's buttons (and optionally makes it active) without rewriting the rest of the config
+def save_profile(file_lock, name: str, buttons: dict, cloud_sync=cloud.cloud_sync, activate: bool = True):
 
+    actions.validate_config({"profiles": {name: buttons}})
     ensure_local_config_exists(file_lock)
 
-    with file_lock:
-        with get_config_path().open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-    
-    if cloud_sync:
-        try:
-            cloud.cloud_sync.backup_config(data)
-            # set_active_profile(cloud_sync.rtdb, cloud_sync.uid, cloud_sync.id_token, prof or data.get("activeProfile"))
-        except Exception as e:
-            print("Cloud backup failed:", e)
+    get_store(get_config_path(), file_lock).patch(
+        "save" if cloud_sync else "local",
+        profiles={name: buttons},
+        top={"activeProfile": name} if activate else None,
+    )
 
 def get_mapping_str(profile_data: dict, button_id: str) -> str:
     """
@@ -94,43 +489,35 @@ def delete_profile(data: dict, profile_name: str):
 def ensure_local_config_exists(file_lock):
 
     with file_lock:
-        if get_config_path().exists():
-            print("Local config file exists.")
+        if get_store(get_config_path(), file_lock).storage.exists():
+            log.debug("Local config exists.")
             return
 
     # Try to restore from cloud if available
     if cloud.cloud_sync:
         try:
-            print("Local config missing. Attempting to restore from cloud...")
+            log.info("Local config missing. Attempting to restore from cloud...")
             restored = cloud.cloud_sync.restore_to_local_if_possible()
             if restored:
                 return
         except Exception as e:
-            print("Cloud restore failed:", e)
+            log.warning("Cloud restore failed: %s", e)
 
     # Fallback: create defaults locally
     if get_default_config_path().exists():
         try:
             default_config = json.loads(get_default_config_path().read_text(encoding="utf-8"))
         except Exception as e:
-            print("Default config file is unreadable, using embedded defaults:", e)
+            log.warning("Default config file is unreadable, using embedded defaults: %s", e)
             default_config = EMBEDDED_DEFAULT_CONFIG
     else:
-        print("Default config file missing, using embedded defaults.")
+        log.warning("Default config file missing, using embedded defaults.")
         default_config = EMBEDDED_DEFAULT_CONFIG
 
-    # 4) Write local config
-    with file_lock:
-        get_config_path().write_text(json.dumps(default_config, indent=2), encoding="utf-8")
-
-    # 5) Optional: seed cloud so future restores work
-    if cloud.cloud_sync:
-        try:
-            cloud.cloud_sync.backup_config(default_config)
-        except Exception as e:
-            print("Cloud seed failed:", e)
+    # 4) Write local config; a connected CloudSync seeds the cloud from the "defaults" change
+    get_store(get_config_path(), file_lock).replace(default_config, source="defaults")
 
-    print("Local config created.")
+    log.info("Local config created.")
 
 def normalize_config(data: dict) -> tuple[dict, bool]:
     """
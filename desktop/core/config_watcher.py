@@ -0,0 +1,121 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from desktop.core import config_io, metrics
+from desktop.core.log import get_logger
+
+log = get_logger("config_watcher")
+
+
+class ConfigWatcher:
+    """
+    Hot-reloads buttonControls.json when it is edited outside the app.
+
+    A daemon thread polls the file's (size, mtime) every `interval` seconds;
+    only when that changes is the file read. A change has to hold still for
+    `debounce` seconds before it is applied, so an editor's save (truncate,
+    write, rename...) counts as one reload. Content whose hash matches what the
+    app itself last wrote or read is ignored, which filters out our own saves.
+
+    New content must be a JSON object; normalize_config then fills in the
+    profile/activeProfile invariants and the result replaces the store's
+    snapshot with source "file" (the file itself is left as the user wrote it).
+    Anything unparsable is logged and skipped, and the previous mapping stays
+    active until the file is fixed.
+    """
+    def __init__(self, store, interval: float = 0.5, debounce: float = 0.3):
+        self.store = store
+        self.interval = interval
+        self.debounce = debounce
+
+        self.reloads = 0
+        self.rejected = 0
+        self.own_writes = 0
+
+        self._seen: Tuple[int, int] | None = config_io.stamp(store.path)
+        self._pending: Tuple[int, int] | None = None
+        self._pending_since = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "ConfigWatcher":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        metrics.register_gauges("config_watcher", self.stats)
+        return self
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        metrics.unregister_gauges("config_watcher")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                log.error("Config watcher poll failed: %s", e)
+
+    # One polling step; returns True if new content was applied
+    def poll(self, now: float | None = None) -> bool:
+        if now is None:
+            now = time.monotonic()
+        current = config_io.stamp(self.store.path)
+        if current == self._seen:
+            self._pending = None
+            return False
+        if current != self._pending:
+            # Still changing (or just started to): wait for it to settle
+            self._pending = current
+            self._pending_since = now
+            return False
+        if now - self._pending_since < self.debounce:
+            return False
+
+        self._seen = current
+        self._pending = None
+        if current is None:
+            log.info("%s was removed; keeping the current mapping", self.store.path.name)
+            return False
+        return self._reload()
+
+    def _reload(self) -> bool:
+        from desktop.core.config_store import normalize_config
+
+        path = self.store.path
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            log.warning("Could not read %s: %s", path.name, e)
+            return False
+
+        if config_io.digest(raw) == config_io.last_digest(path):
+            self.own_writes += 1
+            return False
+
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            self.rejected += 1
+            log.warning("Ignoring edit to %s, keeping the previous mapping: %s", path.name, e)
+            return False
+        if not isinstance(data, dict) or not isinstance(data.get("profiles", {}), dict):
+            self.rejected += 1
+            log.warning("Ignoring edit to %s, keeping the previous mapping: expected an object with a profiles object", path.name)
+            return False
+
+        data, _ = normalize_config(data)
+        config_io.remember(path, raw)
+        snap = self.store.replace(data, source="file", persist=False)
+        self.reloads += 1
+        log.info("Reloaded %s after external edit", path.name, version=snap.version)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"reloads": self.reloads, "rejected": self.rejected, "own_writes": self.own_writes}
@@ -0,0 +1,289 @@
+from __future__ import annotations
+import functools
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from desktop.core.log import get_logger
+
+log = get_logger("injection")
+
+# Output backends for trigger_macro. Every backend takes a chord as a tuple of
+# pyautogui-style key names ("ctrl", "shift", "a") and presses it once:
+# keys down in order, then up in reverse.
+#
+#   sendinput  Windows only: the whole chord in one SendInput call, INPUT arrays cached per chord
+#   pyautogui  portable fallback, with pyautogui's per-call PAUSE disabled
+#   recording  in-memory, records (perf_counter_ns, keys) for tests and benchmarks
+#
+# KEY_BACKEND=auto|sendinput|pyautogui|recording picks one (auto: sendinput on Windows, else pyautogui).
+BACKEND_NAMES = ("auto", "sendinput", "pyautogui", "recording")
+
+
+class UnsupportedKey(ValueError):
+    pass
+
+
+class InjectionBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def send_chord(self, keys: Sequence[str]) -> None:
+        ...
+
+    # action is a compiled actions.Action; backends that can use its pre-resolved codes override this
+    def send_action(self, action) -> None:
+        self.send_chord(action.keys)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_pyautogui():
+    """
+    Lazy import pyautogui so tests can import this module on headless Linux CI.
+    Returns None if GUI automation is unavailable. The result is cached: the
+    environment and import state are only probed once per process.
+    """
+    # On Linux CI, DISPLAY is usually not set => headless => pyautogui import will crash
+    if os.name != "nt" and not os.environ.get("DISPLAY"):
+        return None
+    try:
+        import pyautogui  # type: ignore
+        return pyautogui
+    except Exception:
+        return None
+
+
+class PyAutoGuiBackend(InjectionBackend):
+    name = "pyautogui"
+
+    # pause=None keeps pyautogui's own PAUSE (0.1 s after every call); the worker already serializes chords
+    def __init__(self, module=None, pause: float | None = 0.0):
+        self.gui = module or _get_pyautogui()
+        if self.gui is None:
+            raise RuntimeError("pyautogui is unavailable (no display?)")
+        if pause is not None:
+            self.gui.PAUSE = pause
+
+    def send_chord(self, keys: Sequence[str]) -> None:
+        self.gui.hotkey(*keys)
+
+
+class RecordingBackend(InjectionBackend):
+    name = "recording"
+
+    def __init__(self):
+        self.events: List[Tuple[int, Tuple[str, ...]]] = []
+        self._lock = threading.Lock()
+
+    def send_chord(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            self.events.append((time.perf_counter_ns(), tuple(keys)))
+
+    def keys(self) -> List[Tuple[str, ...]]:
+        with self._lock:
+            return [keys for _, keys in self.events]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.events.clear()
+
+
+# ---- Windows virtual-key table (pyautogui key names -> VK code) ----
+# Punctuation uses the US-layout OEM codes, like pyautogui does.
+VK_CODES: Dict[str, int] = {
+    "backspace": 0x08, "\b": 0x08, "tab": 0x09, "\t": 0x09, "enter": 0x0D, "return": 0x0D, "\n": 0x0D,
+    "shift": 0x10, "ctrl": 0x11, "alt": 0x12, "pause": 0x13, "capslock": 0x14,
+    "esc": 0x1B, "escape": 0x1B, "space": 0x20, " ": 0x20,
+    "pageup": 0x21, "pgup": 0x21, "pagedown": 0x22, "pgdn": 0x22, "end": 0x23, "home": 0x24,
+    "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+    "printscreen": 0x2C, "prtsc": 0x2C, "prtscr": 0x2C, "prntscrn": 0x2C,
+    "insert": 0x2D, "delete": 0x2E, "del": 0x2E,
+    "win": 0x5B, "winleft": 0x5B, "winright": 0x5C, "apps": 0x5D,
+    "multiply": 0x6A, "add": 0x6B, "separator": 0x6C, "subtract": 0x6D, "decimal": 0x6E, "divide": 0x6F,
+    "numlock": 0x90, "scrolllock": 0x91,
+    "shiftleft": 0xA0, "shiftright": 0xA1, "ctrlleft": 0xA2, "ctrlright": 0xA3, "altleft": 0xA4, "altright": 0xA5,
+    "browserback": 0xA6, "browserforward": 0xA7, "browserrefresh": 0xA8, "browserhome": 0xAC,
+    "volumemute": 0xAD, "volumedown": 0xAE, "volumeup": 0xAF,
+    "nexttrack": 0xB0, "prevtrack": 0xB1, "stop": 0xB2, "playpause": 0xB3,
+    ";": 0xBA, "=": 0xBB, ",": 0xBC, "-": 0xBD, ".": 0xBE, "/": 0xBF, "`": 0xC0,
+    "[": 0xDB, "\\": 0xDC, "]": 0xDD, "'": 0xDE,
+}
+VK_CODES.update({chr(c): c for c in range(ord("0"), ord("9") + 1)})
+VK_CODES.update({chr(c): c - 32 for c in range(ord("a"), ord("z") + 1)})
+VK_CODES.update({f"num{i}": 0x60 + i for i in range(10)})
+VK_CODES.update({f"f{i}": 0x6F + i for i in range(1, 25)})
+
+# Keys that need KEYEVENTF_EXTENDEDKEY, otherwise Windows sends the numpad variant
+_EXTENDED_VK = {
+    0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2C, 0x2D, 0x2E,
+    0x5B, 0x5C, 0x5D, 0x6F, 0x90, 0xA3, 0xA5,
+}
+
+
+# Maps a chord to VK codes; raises UnsupportedKey naming the first key the table doesn't know
+def chord_to_vk(keys: Sequence[str]) -> Tuple[int, ...]:
+    codes = []
+    for key in keys:
+        # Single characters are case-sensitive: "A" needs shift, which pyautogui adds for us
+        vk = VK_CODES.get(key if len(key) == 1 else key.lower())
+        if vk is None:
+            raise UnsupportedKey(f"No virtual-key code for '{key}'")
+        codes.append(vk)
+    return tuple(codes)
+
+
+class SendInputBackend(InjectionBackend):
+    """
+    Presses a whole chord with one SendInput call: N key-down events followed
+    by N key-up events in reverse order. The INPUT array for each chord is
+    built once and reused. Chords with keys outside VK_CODES go to fallback.
+    """
+    name = "sendinput"
+
+    def __init__(self, fallback: InjectionBackend | None = None):
+        if os.name != "nt":
+            raise RuntimeError("SendInput is only available on Windows")
+        import ctypes
+        from ctypes import wintypes
+
+        ULONG_PTR = ctypes.c_size_t
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [
+                ("wVk", wintypes.WORD),
+                ("wScan", wintypes.WORD),
+                ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD),
+                ("dwExtraInfo", ULONG_PTR),
+            ]
+
+        # INPUT's union must be as large as MOUSEINPUT, the biggest member
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [
+                ("dx", wintypes.LONG),
+                ("dy", wintypes.LONG),
+                ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD),
+                ("dwExtraInfo", ULONG_PTR),
+            ]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _anonymous_ = ("u",)
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self._ctypes = ctypes
+        self._INPUT = INPUT
+        self._user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self._user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self._user32.SendInput.restype = wintypes.UINT
+        self._size = ctypes.sizeof(INPUT)
+        self._chords: Dict[Tuple[str, ...], object] = {}
+        self._by_codes: Dict[Tuple[int, ...], object] = {}
+        self.fallback = fallback
+
+    def _build(self, keys: Tuple[str, ...]):
+        return self._build_codes(chord_to_vk(keys))
+
+    def _build_codes(self, codes: Tuple[int, ...]):
+        INPUT_KEYBOARD, KEYEVENTF_EXTENDEDKEY, KEYEVENTF_KEYUP = 1, 0x0001, 0x0002
+        events = [(vk, 0) for vk in codes] + [(vk, KEYEVENTF_KEYUP) for vk in reversed(codes)]
+        arr = (self._INPUT * len(events))()
+        for i, (vk, flags) in enumerate(events):
+            arr[i].type = INPUT_KEYBOARD
+            arr[i].ki.wVk = vk
+            arr[i].ki.dwFlags = flags | (KEYEVENTF_EXTENDEDKEY if vk in _EXTENDED_VK else 0)
+        return arr
+
+    def send_chord(self, keys: Sequence[str]) -> None:
+        keys = tuple(keys)
+        arr = self._chords.get(keys)
+        if arr is None:
+            try:
+                arr = self._build(keys)
+            except UnsupportedKey:
+                if self.fallback is None:
+                    raise
+                self.fallback.send_chord(keys)
+                return
+            self._chords[keys] = arr
+        self._send(arr)
+
+    # Compiled actions carry their VK codes, so there is no name lookup at all
+    def send_action(self, action) -> None:
+        if action.codes is None:
+            # Shifted characters and keys outside VK_CODES: by name, through the fallback
+            self.send_chord(action.keys)
+            return
+        arr = self._by_codes.get(action.codes)
+        if arr is None:
+            arr = self._by_codes[action.codes] = self._build_codes(action.codes)
+        self._send(arr)
+
+    def _send(self, arr) -> None:
+        sent = self._user32.SendInput(len(arr), arr, self._size)
+        if sent != len(arr):
+            raise OSError(self._ctypes.get_last_error(), f"SendInput injected {sent}/{len(arr)} events")
+
+
+def _try(factory):
+    try:
+        return factory()
+    except Exception as e:
+        log.warning("Key backend unavailable: %s", e)
+        return None
+
+
+# Builds a backend by name; returns None if nothing can inject on this machine
+def create_backend(name: str = "auto") -> Optional[InjectionBackend]:
+    name = (name or "auto").lower()
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Unknown key backend '{name}'. Use one of {BACKEND_NAMES}.")
+
+    if name == "recording":
+        return RecordingBackend()
+    if name == "pyautogui":
+        return _try(PyAutoGuiBackend)
+
+    fallback = _try(PyAutoGuiBackend)
+    if os.name == "nt":
+        native = _try(lambda: SendInputBackend(fallback=fallback))
+        if native is not None:
+            return native
+    return fallback
+
+
+_BACKEND: Optional[InjectionBackend] = None
+_RESOLVED = False
+_BACKEND_LOCK = threading.Lock()
+
+
+# The process-wide backend, chosen from KEY_BACKEND on first use
+def get_backend() -> Optional[InjectionBackend]:
+    global _BACKEND, _RESOLVED
+    if not _RESOLVED:
+        with _BACKEND_LOCK:
+            if not _RESOLVED:
+                _BACKEND = create_backend(os.getenv("KEY_BACKEND") or "auto")
+                _RESOLVED = True
+                log.info("Key backend: %s", _BACKEND.name if _BACKEND else "none")
+    return _BACKEND
+
+
+def set_backend(backend: Optional[InjectionBackend]) -> None:
+    global _BACKEND, _RESOLVED
+    with _BACKEND_LOCK:
+        _BACKEND = backend
+        _RESOLVED = True
+
+
+def reset_backend() -> None:
+    global _BACKEND, _RESOLVED
+    with _BACKEND_LOCK:
+        _BACKEND = None
+        _RESOLVED = False
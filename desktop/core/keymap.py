@@ -0,0 +1,105 @@
+from __future__ import annotations
+from threading import RLock
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from desktop.core import config_io
+from desktop.core.actions import Action, MappingError, compile_config, compile_profile
+from desktop.core.log import get_logger
+from desktop.core.paths import get_config_path
+
+log = get_logger("keymap")
+
+# (profile, button_id) -> Action(keys=("ctrl", "a"), codes=(0x11, 0x41))
+Keymap = Mapping[Tuple[str, str], Action]
+
+# The live table. Writers build a complete new table and swap this single
+# reference, so the notification path never sees a half-built keymap.
+_KEYMAP: Optional[Keymap] = None
+
+# profile -> (buttons, compiled entries, problems) from the last publish(). Only read-only
+# buttons objects (ConfigStore snapshots) are kept: a later snapshot that still holds the
+# same object has the same mappings, so a save recompiles just the profiles it changed.
+_COMPILED: Dict[str, Tuple[Mapping[str, Any], Dict[Tuple[str, str], Action], list[MappingError]]] = {}
+
+
+def compile_keymap(config: Mapping[str, Any] | None) -> Keymap:
+    """
+    Flattens profiles[profile][button_id] = {"keys": [...]} into a read-only
+    lookup table of compiled Actions. Buttons without keys are left out, so a
+    miss means "nothing mapped". Invalid mappings (only reachable through
+    hand edits, saves reject them) are logged and left out too.
+    """
+    table, problems = compile_config(config)
+    for problem in problems:
+        log.warning("Skipping invalid mapping: %s", problem)
+    return MappingProxyType(table)
+
+
+# Compiles config and swaps it in as the live keymap
+def publish(config: Mapping[str, Any] | None) -> Keymap:
+    global _KEYMAP, _COMPILED
+    profiles = (config or {}).get("profiles")
+    if not isinstance(profiles, MappingProxyType):
+        _COMPILED = {}
+        compiled = compile_keymap(config)
+        _KEYMAP = compiled
+        return compiled
+
+    previous = _COMPILED
+    cache = {}
+    table: Dict[Tuple[str, str], Action] = {}
+    for profile, buttons in profiles.items():
+        hit = previous.get(profile)
+        if hit is None or hit[0] is not buttons:
+            entries, problems = {}, []
+            compile_profile(profile, buttons, entries, problems)
+            for problem in problems:
+                log.warning("Skipping invalid mapping: %s", problem)
+            hit = (buttons, entries, problems)
+        if isinstance(buttons, MappingProxyType):
+            cache[profile] = hit
+        table.update(hit[1])
+    _COMPILED = cache
+    compiled = MappingProxyType(table)
+    _KEYMAP = compiled
+    return compiled
+
+
+# Swaps in an already compiled table (warm start)
+def install(table: Keymap) -> Keymap:
+    global _KEYMAP
+    _KEYMAP = table
+    return table
+
+
+# Builds the keymap from buttonControls.json (startup, or first keypress if nothing was published yet)
+def load_from_disk(file_lock: RLock) -> Keymap:
+    with file_lock:
+        config = config_io.read_json(get_config_path()) or {}
+    return publish(config)
+
+
+def get_keymap(file_lock: RLock | None = None) -> Keymap:
+    keymap = _KEYMAP
+    if keymap is None:
+        if file_lock is None:
+            return MappingProxyType({})
+        keymap = load_from_disk(file_lock)
+    return keymap
+
+
+def lookup_action(profile: str, button_id: str, file_lock: RLock | None = None) -> Action | None:
+    return get_keymap(file_lock).get((profile, button_id))
+
+
+# Key names only, e.g. ("ctrl", "a")
+def lookup(profile: str, button_id: str, file_lock: RLock | None = None) -> Tuple[str, ...] | None:
+    action = get_keymap(file_lock).get((profile, button_id))
+    return action.keys if action else None
+
+
+def reset() -> None:
+    global _KEYMAP, _COMPILED
+    _KEYMAP = None
+    _COMPILED = {}
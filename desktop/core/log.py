@@ -0,0 +1,238 @@
+from __future__ import annotations
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Structured, leveled logging that never blocks the caller.
+#
+# log.debug("Received %s", button_id, profile=profile) only appends a tuple to
+# an in-memory ring (deque.append is atomic, no lock); formatting and file I/O
+# happen on the "log-writer" thread, which drains the ring into a rotating file
+# next to the config (and echoes to the console when there is one).
+# Below LOG_LEVEL (default INFO) a call is one integer comparison.
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+_LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARN", ERROR: "ERROR"}
+
+RING_SIZE = 4096
+FLUSH_INTERVAL = 0.25
+MAX_BYTES = 1_000_000
+BACKUPS = 3
+
+# (wall time, level, logger name, message, args, fields)
+Record = Tuple[float, int, str, str, tuple, Dict[str, Any]]
+
+
+_LEVEL_ALIASES = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARNING, "WARNING": WARNING, "ERROR": ERROR}
+
+
+def parse_level(value) -> int:
+    if isinstance(value, int):
+        return value
+    text = str(value or "").strip().upper()
+    if text.isdigit():
+        return int(text)
+    return _LEVEL_ALIASES.get(text, INFO)
+
+
+_level = parse_level(os.getenv("LOG_LEVEL"))
+_ring: Deque[Record] = deque(maxlen=RING_SIZE)
+_wake = threading.Event()
+_write_lock = threading.Lock()
+_writer: Optional["_Writer"] = None
+_emitted = 0
+_written = 0
+
+
+def _emit(level: int, name: str, msg: str, args: tuple, fields: Dict[str, Any]) -> None:
+    global _emitted
+    _ring.append((time.time(), level, name, msg, args, fields))
+    _emitted += 1
+    if level >= ERROR:
+        _wake.set()
+
+
+class Logger:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    # Guard for call sites that would build expensive arguments
+    def enabled(self, level: int) -> bool:
+        return level >= _level
+
+    def debug(self, msg: str, *args, **fields) -> None:
+        if _level <= DEBUG:
+            _emit(DEBUG, self.name, msg, args, fields)
+
+    def info(self, msg: str, *args, **fields) -> None:
+        if _level <= INFO:
+            _emit(INFO, self.name, msg, args, fields)
+
+    def warning(self, msg: str, *args, **fields) -> None:
+        if _level <= WARNING:
+            _emit(WARNING, self.name, msg, args, fields)
+
+    def error(self, msg: str, *args, **fields) -> None:
+        if _level <= ERROR:
+            _emit(ERROR, self.name, msg, args, fields)
+
+
+_LOGGERS: Dict[str, Logger] = {}
+
+
+def get_logger(name: str) -> Logger:
+    logger = _LOGGERS.get(name)
+    if logger is None:
+        logger = _LOGGERS.setdefault(name, Logger(name))
+    return logger
+
+
+def set_level(level) -> None:
+    global _level
+    _level = parse_level(level)
+
+
+def get_level() -> int:
+    return _level
+
+
+def format_record(record: Record) -> str:
+    ts, level, name, msg, args, fields = record
+    if args:
+        try:
+            msg = msg % args
+        except Exception:
+            msg = f"{msg} {args!r}"
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}"
+    line = f"{stamp} {_LEVEL_NAMES.get(level, level):<5} {name}: {msg}"
+    if fields:
+        line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+    return line
+
+
+class _Writer(threading.Thread):
+    def __init__(self, path: Path | None, max_bytes: int, backups: int, console: bool):
+        super().__init__(name="log-writer", daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.console = console
+        self.stopping = False
+        self._fh = None
+
+    def run(self):
+        while not self.stopping:
+            _wake.wait(FLUSH_INTERVAL)
+            _wake.clear()
+            self.drain()
+        self.drain()
+        self.close()
+
+    def _open(self):
+        if self._fh is None and self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = self.path.open("a", encoding="utf-8")
+        return self._fh
+
+    def _rotate(self):
+        self.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def drain(self):
+        global _written
+        with _write_lock:
+            lines = []
+            while True:
+                try:
+                    lines.append(format_record(_ring.popleft()))
+                except IndexError:
+                    break
+            if not lines:
+                return
+            _written += len(lines)
+            text = "\n".join(lines) + "\n"
+
+            if self.console and sys.stdout is not None:
+                try:
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+                except Exception:
+                    pass
+
+            if self.path is None:
+                return
+            try:
+                fh = self._open()
+                if fh.tell() + len(text) > self.max_bytes and fh.tell() > 0:
+                    self._rotate()
+                    fh = self._open()
+                fh.write(text)
+                fh.flush()
+            except Exception as e:
+                if sys.stderr is not None:
+                    sys.stderr.write(f"Log write failed: {e}\n")
+
+    def close(self):
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except Exception:
+                pass
+            self._fh = None
+
+
+# Starts the background writer. console=None echoes to stdout only when the process has one
+# (the windowed PyInstaller build doesn't). LOG_CONSOLE=0 turns the echo off.
+def start(path: Path | str | None = None, max_bytes: int = MAX_BYTES, backups: int = BACKUPS, console: bool | None = None) -> None:
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    if path is None:
+        from desktop.core.paths import get_log_path
+        path = get_log_path()
+    if console is None:
+        console = sys.stdout is not None and os.getenv("LOG_CONSOLE", "1") != "0"
+    _writer = _Writer(Path(path), max_bytes, backups, console)
+    _writer.start()
+
+    from desktop.core import metrics
+    metrics.register_gauges("log", stats)
+
+
+# Writes out everything buffered so far (no-op until start() was called)
+def flush() -> None:
+    if _writer is not None:
+        _writer.drain()
+
+
+def stop(timeout: float = 2.0) -> None:
+    global _writer
+    writer = _writer
+    if writer is None:
+        return
+    writer.stopping = True
+    _wake.set()
+    writer.join(timeout)
+    _writer = None
+
+
+def stats() -> Dict[str, Any]:
+    buffered = len(_ring)
+    return {
+        "level": _LEVEL_NAMES.get(_level, _level),
+        "buffered": buffered,
+        "written": _written,
+        "dropped": max(0, _emitted - _written - buffered),
+    }
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from desktop.core import metrics
+from desktop.core.log import get_logger
+
+log = get_logger("loop_monitor")
+
+# Frames under this directory are "ours"; a stall is attributed to the innermost one
+_PROJECT_ROOT = str(Path(__file__).resolve().parents[2])
+_STACK_LIMIT = 20
+
+
+class LoopMonitor:
+    """
+    Watches the asyncio loop that hosts BLE sessions and cloud calls.
+
+    A heartbeat coroutine wakes every `interval` seconds and records how late
+    it ran (loop.lag histogram). A watchdog thread notices when the heartbeat
+    is more than `threshold` seconds overdue, i.e. some callback is blocking
+    the loop, and grabs the loop thread's stack while it is still blocked.
+    When the heartbeat finally runs, the stall is booked against the innermost
+    project frame of that stack, so repeated offenders (a synchronous requests
+    call, a file read...) add up in worst_offenders().
+
+    LOOP_STALL_MS overrides the default threshold (100 ms).
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0.05, threshold: float | None = None, max_offenders: int = 50):
+        if threshold is None:
+            threshold = float(os.getenv("LOOP_STALL_MS") or 100) / 1000.0
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.max_offenders = max_offenders
+
+        self.stalls = 0
+        self.worst_lag_s = 0.0
+        self.offenders: Dict[str, Dict[str, Any]] = {}
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._beat: float | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        # (heartbeat it belongs to, where, stack) for the stall in progress
+        self._pending: Optional[tuple] = None
+
+    # Safe to call from any thread
+    def start(self) -> "LoopMonitor":
+        self._stop.clear()
+        self.loop.call_soon_threadsafe(self._start_on_loop)
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        metrics.register_gauges("event_loop", self.stats)
+        return self
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._stop.set()
+        if self._watchdog:
+            self._watchdog.join(timeout)
+            self._watchdog = None
+        task = self._task
+        if task and not task.done():
+            if threading.get_ident() == self._loop_thread:
+                task.cancel()
+            else:
+                try:
+                    self.loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    pass  # loop already closed
+        metrics.unregister_gauges("event_loop")
+
+    def _start_on_loop(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._task = self.loop.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        expected = time.perf_counter() + self.interval
+        while not self._stop.is_set():
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            metrics.record_ns("loop.lag", int(lag * 1e9))
+            if lag > self.threshold:
+                self._book_stall(lag)
+            with self._lock:
+                self._beat = now
+                self._pending = None
+            expected = now + self.interval
+
+    def _watch(self):
+        step = max(0.005, self.threshold / 4)
+        while not self._stop.wait(step):
+            with self._lock:
+                beat = self._beat
+                pending = self._pending
+            if beat is None or self._loop_thread is None:
+                continue
+            overdue = time.perf_counter() - beat - self.interval
+            if overdue <= self.threshold or (pending and pending[0] == beat):
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame, limit=_STACK_LIMIT)
+            with self._lock:
+                if self._beat == beat:
+                    self._pending = (beat, _blame(stack), stack.format())
+
+    # Runs on the loop once the stall is over; lag is the exact stall length
+    def _book_stall(self, lag: float):
+        with self._lock:
+            pending = self._pending
+            where, stack = (pending[1], pending[2]) if pending else ("<not sampled>", [])
+            self.stalls += 1
+            self.worst_lag_s = max(self.worst_lag_s, lag)
+
+            entry = self.offenders.get(where)
+            if entry is None:
+                if len(self.offenders) >= self.max_offenders:
+                    # Forget the least significant offender to keep memory bounded
+                    smallest = min(self.offenders, key=lambda k: self.offenders[k]["total_ms"])
+                    del self.offenders[smallest]
+                entry = self.offenders[where] = {"where": where, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "stack": stack}
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + lag * 1000, 1)
+            if lag * 1000 > entry["max_ms"]:
+                entry["max_ms"] = round(lag * 1000, 1)
+                if stack:
+                    entry["stack"] = stack
+        metrics.record_ns("loop.stall", int(lag * 1e9))
+        log.warning("Event loop blocked for %.0f ms", lag * 1000, where=where)
+
+    # Sorted by total blocked time, worst first
+    def worst_offenders(self, n: int = 5) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = [dict(e) for e in self.offenders.values()]
+        entries.sort(key=lambda e: (e["total_ms"], e["max_ms"]), reverse=True)
+        return entries[:n]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "stalls": self.stalls,
+            "worst_lag_ms": round(self.worst_lag_s * 1000, 1),
+            "offenders": [{k: v for k, v in e.items() if k != "stack"} for e in self.worst_offenders()],
+        }
+
+    def report(self, n: int = 5) -> str:
+        offenders = self.worst_offenders(n)
+        if not offenders:
+            return "No event-loop stalls recorded."
+        lines = [f"{self.stalls} stall(s) over {self.threshold * 1000:.0f} ms, worst {self.worst_lag_s * 1000:.0f} ms"]
+        for e in offenders:
+            lines.append(f"  {e['total_ms']:>8.1f} ms total  {e['count']:>4}x  max {e['max_ms']:.1f} ms  {e['where']}")
+            lines.extend("      " + line.rstrip() for line in e["stack"][-4:])
+        return "\n".join(lines)
+
+
+# Innermost project frame of the blocked stack, e.g. "desktop/cloud/cloud.py:42 full_reload_from_db"
+def _blame(stack: traceback.StackSummary) -> str:
+    chosen = stack[-1] if stack else None
+    for fs in reversed(stack):
+        if fs.filename.startswith(_PROJECT_ROOT) and "loop_monitor" not in fs.filename:
+            chosen = fs
+            break
+    if chosen is None:
+        return "<unknown>"
+    filename = chosen.filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT).replace(os.sep, "/")
+    return f"{filename}:{chosen.lineno} {chosen.name}"
@@ -0,0 +1,183 @@
+from __future__ import annotations
+import bisect
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from desktop.core.paths import get_metrics_path
+
+# Bucket upper bounds in microseconds: 1us .. ~100s, growing 20% per bucket.
+# Every histogram shares them, so recording is one bisect + one increment.
+_BUCKET_GROWTH = 1.2
+_BUCKET_LIMIT_US = 100_000_000
+
+
+def _build_bounds() -> List[float]:
+    bounds = [1.0]
+    while bounds[-1] < _BUCKET_LIMIT_US:
+        bounds.append(bounds[-1] * _BUCKET_GROWTH)
+    return bounds
+
+
+BUCKET_BOUNDS_US = _build_bounds()
+
+
+class Histogram:
+    """
+    Fixed-size latency histogram (microseconds).
+    Memory does not grow with the number of samples; percentiles are
+    accurate to one bucket (~20%), max is exact.
+    """
+    __slots__ = ("name", "_counts", "_lock", "count", "total_us", "max_us")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._counts = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, value_us: float) -> None:
+        if value_us < 0:
+            value_us = 0.0
+        idx = bisect.bisect_left(BUCKET_BOUNDS_US, value_us)
+        with self._lock:
+            self._counts[idx] += 1
+            self.count += 1
+            self.total_us += value_us
+            if value_us > self.max_us:
+                self.max_us = value_us
+
+    def percentile(self, pct: float) -> float:
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+            target = max(1, int(round(self.count * pct / 100.0)))
+            seen = 0
+            for idx, n in enumerate(self._counts):
+                seen += n
+                if seen >= target:
+                    if idx >= len(BUCKET_BOUNDS_US):
+                        return self.max_us
+                    return min(BUCKET_BOUNDS_US[idx], self.max_us)
+            return self.max_us
+
+    def summary(self) -> Dict[str, Any]:
+        count = self.count
+        return {
+            "count": count,
+            "mean_us": round(self.total_us / count, 1) if count else 0.0,
+            "p50_us": round(self.percentile(50), 1),
+            "p95_us": round(self.percentile(95), 1),
+            "p99_us": round(self.percentile(99), 1),
+            "max_us": round(self.max_us, 1),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(BUCKET_BOUNDS_US) + 1)
+            self.count = 0
+            self.total_us = 0.0
+            self.max_us = 0.0
+
+
+_HISTOGRAMS: Dict[str, Histogram] = {}
+_GAUGES: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    h = _HISTOGRAMS.get(name)
+    if h is None:
+        with _REGISTRY_LOCK:
+            h = _HISTOGRAMS.setdefault(name, Histogram(name))
+    return h
+
+
+def record_ns(name: str, elapsed_ns: int) -> None:
+    histogram(name).record(elapsed_ns / 1000.0)
+
+
+# Registers a callable whose dict is included in every snapshot (queue depths, counters, ...)
+def register_gauges(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    with _REGISTRY_LOCK:
+        _GAUGES[name] = provider
+
+
+def unregister_gauges(name: str) -> None:
+    with _REGISTRY_LOCK:
+        _GAUGES.pop(name, None)
+
+
+def snapshot() -> Dict[str, Any]:
+    gauges = {}
+    for name, provider in sorted(_GAUGES.items()):
+        try:
+            gauges[name] = provider()
+        except Exception as e:
+            gauges[name] = {"error": str(e)}
+
+    return {
+        "timestamp": time.time(),
+        "histograms": {name: h.summary() for name, h in sorted(_HISTOGRAMS.items())},
+        "gauges": gauges,
+    }
+
+
+# Writes the current snapshot as JSON (default: latency_stats.json next to the config)
+def dump(path: Path | None = None) -> Path:
+    path = Path(path) if path else get_metrics_path()
+    path.write_text(json.dumps(snapshot(), indent=2), encoding="utf-8")
+    return path
+
+
+def reset() -> None:
+    with _REGISTRY_LOCK:
+        _HISTOGRAMS.clear()
+        _GAUGES.clear()
+
+
+class KeypressTrace:
+    """
+    Monotonic timestamps (perf_counter_ns) for one button press, from the
+    BLE notification arriving until the hotkey call returns.
+    Stages that never happened (e.g. nothing mapped) stay 0 and are skipped.
+    """
+    __slots__ = ("received", "decoded", "dequeued", "looked_up", "inject_start", "inject_end")
+
+    def __init__(self, received: int | None = None):
+        self.received = received or time.perf_counter_ns()
+        self.decoded = 0
+        self.dequeued = 0
+        self.looked_up = 0
+        self.inject_start = 0
+        self.inject_end = 0
+
+    def finish(self) -> None:
+        if self.decoded:
+            record_ns("keypress.decode", self.decoded - self.received)
+        if self.dequeued and self.decoded:
+            record_ns("keypress.queue", self.dequeued - self.decoded)
+        if self.looked_up and self.decoded:
+            record_ns("keypress.lookup", self.looked_up - (self.dequeued or self.decoded))
+        if self.inject_start and self.looked_up:
+            record_ns("keypress.dispatch", self.inject_start - self.looked_up)
+        if self.inject_end and self.inject_start:
+            record_ns("keypress.inject", self.inject_end - self.inject_start)
+            record_ns("keypress.total", self.inject_end - self.received)
+
+
+# One-line summary of the end-to-end histogram, used for tray notifications
+def format_keypress_summary() -> str:
+    total = _HISTOGRAMS.get("keypress.total")
+    if total is None or total.count == 0:
+        return "No keypresses measured yet."
+    s = total.summary()
+    return (
+        f"{s['count']} keypresses: p50 {s['p50_us'] / 1000:.1f} ms, "
+        f"p95 {s['p95_us'] / 1000:.1f} ms, p99 {s['p99_us'] / 1000:.1f} ms, "
+        f"max {s['max_us'] / 1000:.1f} ms"
+    )
@@ -32,6 +32,31 @@ def get_assets_path() -> Path:
 def get_config_path() -> Path:
     return appdata_dir() / "buttonControls.json"
 
+# SQLite profile store (CONFIG_STORAGE=sqlite)
+def get_profile_db_path() -> Path:
+    return appdata_dir() / "profiles.db"
+
+# Compressed undo history of the config (ConfigHistory)
+def get_history_path() -> Path:
+    return appdata_dir() / "config_history.bin"
+
+# Compiled startup state written on clean shutdown (warm_start)
+def get_warm_start_path() -> Path:
+    return appdata_dir() / "warm_start.bin"
+
+# Cloud updates not yet acknowledged by the database (cloud.outbox)
+def get_cloud_outbox_path() -> Path:
+    return appdata_dir() / "cloud_outbox.json"
+
+def get_device_cache_path() -> Path:
+    return appdata_dir() / "device_cache.json"
+
+def get_metrics_path() -> Path:
+    return appdata_dir() / "latency_stats.json"
+
+def get_log_path() -> Path:
+    return appdata_dir() / "macro_controller.log"
+
 # DEBUGGING: Print paths to verify correctness
 # print("Config path:", get_config_path())
 # print("Default config path:", get_default_config_path())
@@ -0,0 +1,278 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from desktop.core import config_io
+from desktop.core.log import get_logger
+
+log = get_logger("profile_db")
+
+# SQLite storage engine for ConfigStore (CONFIG_STORAGE=sqlite), for large,
+# generated profile libraries.
+#
+#   meta      top-level keys other than "profiles" (activeProfile...), as JSON
+#   profiles  one row per profile; position keeps the JSON object order
+#   mappings  one row per (profile, button_id); action is the mapping object as JSON
+#
+# A save writes only the rows that differ from the previously persisted config,
+# in one transaction. ConfigStore.patch() (the GUI's Save, profile switches)
+# hands over just the changed profiles through write_changes(), so changing one
+# button of one profile is one upsert no matter how many profiles exist; a
+# generic store.update() still compares every profile to find the change.
+# The running app reads profiles from the store's in-memory snapshot, not from
+# here. export_config()/import_config() convert to and from the
+# buttonControls.json format unchanged.
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mappings (
+    profile TEXT NOT NULL REFERENCES profiles(name) ON DELETE CASCADE ON UPDATE CASCADE,
+    button_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    PRIMARY KEY (profile, button_id)
+) WITHOUT ROWID;
+"""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _plain(value: Any) -> Any:
+    # Snapshots hand out read-only mappings/tuples; compare and store them as plain JSON values
+    return json.loads(_dumps(_thaw(value)))
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class ProfileDB:
+    """
+    Profiles and button mappings as SQLite rows (WAL mode).
+
+    Implements the ConfigStore storage interface (exists/read/write, plus
+    write_changes for patches) and adds indexed per-profile access for tools
+    that generate or inspect large libraries. Writes made through those direct methods bypass any running
+    ConfigStore, so use them offline or call store.load() afterwards.
+    """
+    # A write commits only the changed rows, so ConfigStore skips its write-behind journal
+    transactional = True
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: once write() returns, ConfigStore drops its own journal, so the commit must be on disk
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self.rows_written = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    # ---- ConfigStore storage interface ----
+
+    def exists(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM meta WHERE key = 'top' UNION ALL SELECT 1 FROM profiles LIMIT 1").fetchone()
+        return row is not None
+
+    def read(self) -> Dict[str, Any] | None:
+        return self.export_config() if self.exists() else None
+
+    # data and previous are plain dicts (ConfigStore passes thawed copies), so profiles compare cheaply by ==
+    def write(self, data: Mapping[str, Any], previous: Mapping[str, Any] | None = None) -> None:
+        if previous is None:
+            self.import_config(data)
+            return
+        new_profiles = data.get("profiles") or {}
+        old_profiles = previous.get("profiles") or {}
+        top = {k: v for k, v in data.items() if k != "profiles"}
+        old_top = {k: v for k, v in previous.items() if k != "profiles"}
+
+        rows = 0
+        with self._lock, self._transaction() as cur:
+            if top != old_top:
+                cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('top', ?)", (_dumps(top),))
+                rows += 1
+            for name in old_profiles.keys() - new_profiles.keys():
+                cur.execute("DELETE FROM profiles WHERE name = ?", (name,))
+                rows += 1
+
+            if [n for n in new_profiles if n in old_profiles] != [n for n in old_profiles if n in new_profiles]:
+                # Reordered: rare enough that renumbering everything is fine
+                cur.executemany("UPDATE profiles SET position = ? WHERE name = ?", [(i, n) for i, n in enumerate(new_profiles)])
+                rows += len(new_profiles)
+
+            for name, buttons in new_profiles.items():
+                rows += self._write_profile(cur, name, buttons, old_profiles.get(name))
+        self.rows_written += rows
+
+    # Writes just the given profiles (None deletes one) and, unless None, the top-level keys.
+    # previous is the last persisted config, used to touch only the buttons that changed.
+    def write_changes(self, profiles: Mapping[str, Any], top: Mapping[str, Any] | None, previous: Mapping[str, Any] | None) -> None:
+        old_profiles = (previous or {}).get("profiles") or {}
+        rows = 0
+        with self._lock, self._transaction() as cur:
+            if top is not None:
+                cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('top', ?)", (_dumps(top),))
+                rows += 1
+            for name, buttons in profiles.items():
+                if buttons is None:
+                    rows += cur.execute("DELETE FROM profiles WHERE name = ?", (name,)).rowcount
+                else:
+                    rows += self._write_profile(cur, name, buttons, old_profiles.get(name))
+        self.rows_written += rows
+
+    # New profiles go after the existing ones; known ones get row updates for the changed buttons
+    def _write_profile(self, cur, name: str, buttons: Mapping[str, Any] | None, old_buttons: Mapping[str, Any] | None) -> int:
+        buttons = buttons or {}
+        if old_buttons is None:
+            cur.execute(
+                "INSERT OR REPLACE INTO profiles(name, position) SELECT ?, COALESCE(MAX(position), -1) + 1 FROM profiles",
+                (name,),
+            )
+            return 1 + self._put_buttons(cur, name, buttons)
+        if buttons == old_buttons:
+            return 0
+        rows = 0
+        for button_id in old_buttons.keys() - buttons.keys():
+            cur.execute("DELETE FROM mappings WHERE profile = ? AND button_id = ?", (name, button_id))
+            rows += 1
+        changed = {b: a for b, a in buttons.items() if old_buttons.get(b) != a}
+        return rows + self._put_buttons(cur, name, changed)
+
+    def _put_buttons(self, cur, profile: str, buttons: Mapping[str, Any]) -> int:
+        cur.executemany(
+            "INSERT OR REPLACE INTO mappings(profile, button_id, action) VALUES (?, ?, ?)",
+            [(profile, button_id, _dumps(action)) for button_id, action in buttons.items()],
+        )
+        return len(buttons)
+
+    # ---- buttonControls.json compatibility ----
+
+    # Replaces everything with config (buttonControls.json format)
+    def import_config(self, config: Mapping[str, Any]) -> None:
+        config = _plain(config)
+        profiles = config.get("profiles") or {}
+        if not isinstance(profiles, dict):
+            raise ValueError("profiles must be an object")
+        top = {k: v for k, v in config.items() if k != "profiles"}
+        with self._lock, self._transaction() as cur:
+            cur.execute("DELETE FROM profiles")
+            cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('top', ?)", (_dumps(top),))
+            cur.executemany("INSERT INTO profiles(name, position) VALUES (?, ?)", [(name, i) for i, name in enumerate(profiles)])
+            cur.executemany(
+                "INSERT INTO mappings(profile, button_id, action) VALUES (?, ?, ?)",
+                [(name, button_id, _dumps(action)) for name, buttons in profiles.items() for button_id, action in (buttons or {}).items()],
+            )
+        self.rows_written += 1 + len(profiles) + sum(len(b or {}) for b in profiles.values())
+
+    def export_config(self) -> Dict[str, Any]:
+        with self._lock:
+            top_row = self._conn.execute("SELECT value FROM meta WHERE key = 'top'").fetchone()
+            # Each profile comes back as one JSON object text, so the whole library is parsed in one json.loads
+            rows = self._conn.execute(
+                "SELECT p.name, m.buttons FROM profiles p"
+                " LEFT JOIN (SELECT profile, json_group_object(button_id, json(action)) AS buttons FROM mappings GROUP BY profile) m"
+                " ON m.profile = p.name ORDER BY p.position"
+            ).fetchall()
+        config: Dict[str, Any] = json.loads(top_row[0]) if top_row else {}
+        config["profiles"] = json.loads("{" + ",".join(f"{json.dumps(name)}:{buttons or '{}'}" for name, buttons in rows) + "}")
+        return config
+
+    def import_json(self, path: Path | str) -> bool:
+        data = config_io.read_json(Path(path))
+        if not isinstance(data, dict):
+            return False
+        self.import_config(data)
+        return True
+
+    def export_json(self, path: Path | str) -> bool:
+        return config_io.write_json(Path(path), self.export_config())
+
+    # ---- per-profile access ----
+
+    def profile_names(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT name FROM profiles ORDER BY position")]
+
+    def get_profile(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM profiles WHERE name = ?", (name,)).fetchone() is None:
+                return None
+            rows = self._conn.execute("SELECT button_id, action FROM mappings WHERE profile = ?", (name,)).fetchall()
+        return {button_id: json.loads(action) for button_id, action in rows}
+
+    def put_profile(self, name: str, buttons: Mapping[str, Any]) -> None:
+        with self._lock, self._transaction() as cur:
+            exists = cur.execute("SELECT 1 FROM profiles WHERE name = ?", (name,)).fetchone()
+            if exists:
+                cur.execute("DELETE FROM mappings WHERE profile = ?", (name,))
+            else:
+                cur.execute("INSERT INTO profiles(name, position) SELECT ?, COALESCE(MAX(position), -1) + 1 FROM profiles", (name,))
+            self.rows_written += 1 + self._put_buttons(cur, name, _plain(buttons))
+
+    def set_mapping(self, profile: str, button_id: str, action: Mapping[str, Any]) -> None:
+        with self._lock, self._transaction() as cur:
+            if cur.execute("SELECT 1 FROM profiles WHERE name = ?", (profile,)).fetchone() is None:
+                raise KeyError(f"Profile not found: {profile}")
+            self.rows_written += self._put_buttons(cur, profile, {button_id: _plain(action)})
+
+    def delete_profile(self, name: str) -> bool:
+        with self._lock, self._transaction() as cur:
+            deleted = cur.execute("DELETE FROM profiles WHERE name = ?", (name,)).rowcount
+        self.rows_written += deleted
+        return bool(deleted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            profiles = self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+            mappings = self._conn.execute("SELECT COUNT(*) FROM mappings").fetchone()[0]
+        return {"profiles": profiles, "mappings": mappings, "rows_written": self.rows_written}
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# Opens the database, importing buttonControls.json the first time so switching engines keeps the config
+def open_profile_db(path: Path | str, legacy_json: Path | str | None = None) -> ProfileDB:
+    db = ProfileDB(path)
+    if legacy_json is not None and not db.exists() and db.import_json(legacy_json):
+        log.info("Imported %s into %s", Path(legacy_json).name, db.path.name)
+    return db
@@ -49,6 +49,10 @@ class SessionManager:
 
         return self._cache["idToken"]
 
+    # The database rejected the current idToken (401); the next get_id_token() refreshes it
+    def invalidate_id_token(self) -> None:
+        self._cache.pop("idToken", None)
+
     def update_from_login(self, signed: Dict[str, Any]) -> None:
         """
         If you do an explicit login/signup and get a response with user_id/idToken/refreshToken,
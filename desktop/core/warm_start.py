@@ -0,0 +1,92 @@
+from __future__ import annotations
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, NamedTuple, Tuple
+
+import msgpack
+
+from desktop.ble import device_cache
+from desktop.core import config_io, keymap
+from desktop.core.actions import Action
+from desktop.core.log import get_logger
+from desktop.version import __version__
+
+log = get_logger("warm_start")
+
+# warm_start.bin: what a launch needs before the first keypress, as msgpack,
+# written on clean shutdown:
+#
+#   config        the normalized config the store held
+#   config_hash   sha256 of buttonControls.json as it was on disk at that point
+#   keymap        [[profile, button_id, keys, codes], ...], the compiled Actions
+#   devices       device_cache.json content (last address per pad, GATT handles)
+#
+# At launch the config file is only hashed, not parsed: if the hash (and the
+# app version, which pins the key-code table) still match, the keymap and the
+# store's snapshot are installed straight from the cache. Anything else falls
+# back to the normal cold start.
+FORMAT_VERSION = 1
+
+
+class WarmState(NamedTuple):
+    config: Dict[str, Any]
+    keymap: keymap.Keymap
+    config_raw: bytes
+    devices: Dict[str, Any]
+    devices_stamp: Tuple[int, int] | None
+
+
+# Writes the current store/keymap/device state; skipped while the config file isn't settled
+def save(path: Path, store) -> bool:
+    config_hash = config_io.last_digest(store.path)
+    if config_hash is None or store.pending:
+        return False
+    device_cache.flush()  # the stamp must describe what load_device_cache() returns
+    devices_stamp = config_io.stamp(device_cache.get_device_cache_path())
+    payload = {
+        "v": FORMAT_VERSION,
+        "app": __version__,
+        "config_hash": config_hash,
+        "config": store.snapshot().thaw(),
+        "keymap": [[p, b, list(a.keys), list(a.codes) if a.codes is not None else None] for (p, b), a in keymap.get_keymap().items()],
+        "devices": device_cache.load_device_cache(),
+        "devices_stamp": list(devices_stamp) if devices_stamp else None,
+    }
+    try:
+        return config_io.write_bytes(Path(path), msgpack.packb(payload, use_bin_type=True))
+    except Exception as e:
+        log.warning("Could not write warm-start cache: %s", e)
+        return False
+
+
+# The cached state if it still matches config_path, else None
+def load(path: Path, config_path: Path) -> WarmState | None:
+    try:
+        raw = Path(path).read_bytes()
+        config_raw = Path(config_path).read_bytes()
+    except OSError:
+        return None
+    try:
+        payload = msgpack.unpackb(raw, raw=False)
+        if payload.get("v") != FORMAT_VERSION or payload.get("app") != __version__:
+            return None
+        if payload.get("config_hash") != config_io.digest(config_raw):
+            log.info("Config changed since last run; cold start")
+            return None
+        table = {(p, b): Action(tuple(keys), tuple(codes) if codes is not None else None) for p, b, keys, codes in payload["keymap"]}
+        stamp = payload.get("devices_stamp")
+        return WarmState(payload["config"], MappingProxyType(table), config_raw, payload.get("devices") or {}, tuple(stamp) if stamp else None)
+    except Exception as e:
+        log.warning("Ignoring unreadable warm-start cache: %s", e)
+        return None
+
+
+# Installs the cached keymap, config snapshot and device cache; False means do a cold start
+def apply(state: WarmState, store) -> bool:
+    if store.journal_path.exists():
+        return False  # unflushed changes from a crash; load() replays them
+    keymap.install(state.keymap)
+    config_io.remember(store.path, state.config_raw)
+    store.prime(state.config)
+    device_cache.prime(state.devices, state.devices_stamp)
+    return True
@@ -1,11 +1,14 @@
 import asyncio
+import time
 from email.mime import message
 import webbrowser
-from desktop.cloud.rtdb_client import set_active_profile
 from desktop.ui.gui_host import GuiHost
 # from firebase_admin import db
 from desktop.core.paths import get_config_path
-import json
+from desktop.core import config_store, metrics, warm_start, log as applog
+from desktop.core.log import get_logger
+from desktop.ble import device_cache
+from desktop.ble.ble_client import shutdown_macro_worker
 import os
 import desktop.cloud.cloud as cloud
 import requests
@@ -14,6 +17,8 @@ import dotenv
 dotenv.load_dotenv()
 
 URL = os.getenv("DATABASE_URL")
+log = get_logger("app_controller")
+
 class AppController:
     def __init__(
         self,
@@ -43,6 +48,10 @@ class AppController:
         self._gui = GuiHost(self.FILE_LOCK, self.state, self)
         self.icon = None
         self.cloud_sync = None
+        # ConfigHistory, set by main() once the store is loaded
+        self.history = None
+        # Where flush_pending() saves the warm-start cache (None: don't)
+        self.warm_start_path = None
 
     def set_icon(self, icon):
         self.icon = icon
@@ -65,30 +74,35 @@ class AppController:
         self.icon.title = f"Custom Keyboard - {status}"
 
     def notify(self, message: str, title: str = "Custom Keyboard"):
-        print("NOTIFY:", message)
+        log.info("Notify: %s", message)
         if self.icon:
             self.apply_tray_title()   # <-- correct name
             try:
                 self.icon.notify(message, title)
             except Exception as e:
-                print("Tray notify failed:", e)
+                log.warning("Tray notify failed: %s", e)
 
     # Kills everything
     def exit_app(self, icon):
         icon.stop()
         if self.LOOP:
             self.LOOP.call_soon_threadsafe(self.LOOP.stop)
+        # os._exit below skips main()'s cleanup: finish queued presses, write pending config,
+        # then drain the log ring last so the records from the steps before it reach the file
+        shutdown_macro_worker()
+        self.flush_pending()
+        applog.stop()
         os._exit(0)
 
     # Used in pystray menu to connect. For pystray, the method used in its menu has to be sync
     def tray_connect(self, *_):
         # called from tray thread → schedule work on asyncio loop
-        print("Connecting to device")
+        log.info("Connecting to device")
         self.LOOP.call_soon_threadsafe(lambda: self.start_ble_session(self.name, self.FILE_LOCK, self.state, self.LOOP, on_connected=self.on_ble_connected, on_disconnected=self.on_ble_disconnected, on_error=self.on_ble_error))
 
     # Used in pystray menu to disconnect
     def tray_disconnect(self, *_):
-        print("Disconnecting from the device")
+        log.info("Disconnecting from the device")
         self.LOOP.call_soon_threadsafe(self.stop_ble_session)
 
     def tray_sign_in(self, *_):
@@ -109,36 +123,75 @@ class AppController:
         except Exception as e:
             self.notify(f"Cloud sign-in crashed: {e}")
 
+    # Shows the keypress latency summary and writes every histogram to latency_stats.json
+    def show_latency_stats(self, *_):
+        try:
+            path = metrics.dump()
+        except Exception as e:
+            self.notify(f"Failed to write latency stats: {e}")
+            return
+        self.notify(f"{metrics.format_keypress_summary()}\nFull stats: {path}")
+
+    # Tray label for the cloud outbox: how many updates are waiting and for how long
+    def cloud_status_label(self) -> str:
+        sync = cloud.cloud_sync
+        if not sync:
+            return "Cloud: not connected"
+        stats = sync.writer.stats()
+        if not stats["depth"]:
+            return "Cloud: up to date"
+        age = stats["oldest_age_s"] or 0
+        waited = f"{age:.0f}s" if age < 60 else f"{age / 60:.0f}m" if age < 3600 else f"{age / 3600:.1f}h"
+        return f"Cloud: {stats['depth']} pending (oldest {waited})"
+
+    def show_cloud_status(self, *_):
+        self.notify(self.cloud_status_label())
+
     # Goes to the database website
     def open_website(self, icon, item):
         webbrowser.open(URL)
         
     # Changes the active profile in the local json file    
     def set_state(self, new_profile: str):
-        with self.FILE_LOCK:
-            try:
-                with get_config_path().open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except FileNotFoundError:
-                data = {}
-        
-            data["activeProfile"] = new_profile
-            
-            with get_config_path().open("w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-        
-        # Only update cloud if connected
+        # The disk write and the cloud patch (when connected) are both write-behind, so
+        # cycling through profiles ends in one rewrite and one request for the last pick
+        config_store.get_store(get_config_path(), self.FILE_LOCK).patch("profile", top={"activeProfile": new_profile})
+
+    # Store subscriber: hand edits, cloud reloads and undo can change activeProfile too,
+    # and BLE sessions read the profile to use from state
+    def on_config_changed(self, snapshot, source):
+        if snapshot.active_profile:
+            self.state["activeProfile"] = snapshot.active_profile
+
+    # Puts the config back to the version before the last change (repeat to go further back)
+    def undo_config_change(self, *_):
+        if not self.history:
+            self.notify("Config history is not available.")
+            return
+        store = config_store.get_store(get_config_path(), self.FILE_LOCK)
+        try:
+            entry = self.history.restore(store)
+        except Exception as e:
+            self.notify(f"Failed to restore config: {e}")
+            return
+        if entry is None:
+            self.notify("No earlier config version to restore.")
+            return
+        when = time.strftime("%H:%M:%S", time.localtime(entry.ts))
+        self.notify(f"Restored config from {when} ({entry.source}).")
+
+    # Writes out config changes still inside their write-behind window, then the warm-start cache
+    def flush_pending(self):
+        store = config_store.get_store(get_config_path(), self.FILE_LOCK)
         try:
-            if cloud.cloud_sync and getattr(cloud.cloud_sync, "rtdb", None):
-                set_active_profile(
-                    cloud.cloud_sync.rtdb,
-                    cloud.cloud_sync.uid,
-                    cloud.cloud_sync.id_token,
-                    new_profile
-                )
+            store.close()
         except Exception as e:
-            # Don't crash the app if cloud update fails
-            print("Cloud activeProfile update failed:", e)
+            log.error("Config flush failed: %s", e)
+        device_cache.flush()
+        if self.warm_start_path:
+            warm_start.save(self.warm_start_path, store)
+        if cloud.cloud_sync:
+            cloud.cloud_sync.close()
 
     # Used to change the active profile 
     def change_profile(self, step):
@@ -146,12 +199,12 @@ class AppController:
 
         n = len(self.config_list)
         if n == 0:
-            print("No profiles available")
+            log.warning("No profiles available")
             return
         self.array_index = (self.array_index + step) % n
         new_active_profile = self.config_list[self.array_index]
 
-        print(f"currently in {new_active_profile} mode")
+        log.info("Switched to profile %s", new_active_profile)
         self.set_state(new_active_profile)
         self.state["activeProfile"] = new_active_profile
         # self.db.reference(f"profiles/{new_active_profile}").listen(self.make_listener(new_active_profile, self.FILE_LOCK))
@@ -5,8 +5,12 @@ import customtkinter as ctk
 
 from desktop.cloud.rtdb_client import set_active_profile
 # from firebase_admin import db
-from desktop.core.config_store import load_config, save_config, get_profiles, get_mapping_str, set_mapping
+from desktop.core.config_store import get_store, load_config, save_config, save_profile, get_profiles, get_mapping_str, set_mapping
 import desktop.cloud.cloud as cloud
+from desktop.core.actions import ConfigError, InvalidMapping, compile_action
+from desktop.core.log import get_logger
+
+log = get_logger("gui")
 
 BUTTON_IDS = ["BTN:1", "BTN:2", "BTN:3", "BTN:4"]
 
@@ -26,7 +30,7 @@ def parse_hotkey(text: str) -> list[str]:
 
 
 class ConfigGui(ctk.CTkToplevel):
-    def __init__(self, master, file_lock, state, controller):
+    def __init__(self, master, file_lock, state, controller, post):
         super().__init__(master)
 
         # ---- Theme ----
@@ -40,6 +44,8 @@ class ConfigGui(ctk.CTkToplevel):
         self.file_lock = file_lock
         self.app_state = state
         self.controller = controller
+        # Queues a callable onto the Tk thread (GuiHost's pump); Tk itself isn't thread-safe
+        self._post = post
 
         self._did_cleanup = False
         self.bind("<Destroy>", self._on_destroy, add="+")
@@ -54,6 +60,9 @@ class ConfigGui(ctk.CTkToplevel):
             self.profiles = ["default"]
             self.app_state["activeProfile"] = "default"
 
+        # Follow changes made elsewhere (tray profile switch, cloud refresh)
+        self._unsubscribe = get_store(None, self.file_lock).subscribe(self._on_config_changed)
+
         # Root layout
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
@@ -162,11 +171,21 @@ class ConfigGui(ctk.CTkToplevel):
         bottom.grid(row=2, column=0, sticky="ew", padx=14, pady=(8, 14))
         bottom.grid_columnconfigure(0, weight=1)
 
+        left = ctk.CTkFrame(bottom, fg_color="transparent")
+        left.grid(row=0, column=0, padx=14, pady=12, sticky="w")
+
         ctk.CTkButton(
-            bottom, text="Reload", width=120,
+            left, text="Reload", width=120,
             fg_color="#3a3a3a", hover_color="#444",
             command=self._reload_from_disk
-        ).grid(row=0, column=0, padx=14, pady=12, sticky="w")
+        ).grid(row=0, column=0, padx=(0, 8))
+
+        # Restores the previous config version; the store change refreshes the fields
+        ctk.CTkButton(
+            left, text="Undo", width=90,
+            fg_color="#3a3a3a", hover_color="#444",
+            command=self.controller.undo_config_change
+        ).grid(row=0, column=1)
 
         right = ctk.CTkFrame(bottom, fg_color="transparent")
         right.grid(row=0, column=1, padx=14, pady=12, sticky="e")
@@ -202,6 +221,22 @@ class ConfigGui(ctk.CTkToplevel):
             self.profile_var.set(self.profiles[0])
         self._load_profile_into_fields()
 
+    # Store subscriber; runs on whichever thread changed the config, so it only queues
+    def _on_config_changed(self, snapshot, source):
+        if source in ("save", "local"):
+            return  # our own saves; self.data already matches
+        self._post(lambda: self._apply_snapshot(snapshot))
+
+    def _apply_snapshot(self, snapshot):
+        if self._did_cleanup or not self.winfo_exists():
+            return  # closed while the update was queued
+        self.data = snapshot.thaw()
+        self.profiles = get_profiles(self.data)
+        self.profile_menu.configure(values=self.profiles)
+        if self.profile_var.get() not in self.profiles and self.profiles:
+            self.profile_var.set(self.profiles[0])
+        self._load_profile_into_fields()
+
     def _load_profile_into_fields(self):
         prof = self.profile_var.get()
         prof_data = (self.data.get("profiles") or {}).get(prof) or {}
@@ -217,9 +252,12 @@ class ConfigGui(ctk.CTkToplevel):
             raw = self.entry_vars[btn].get()
             keys = parse_hotkey(raw)
 
-            if keys and all(k in ("ctrl", "alt", "shift", "win") for k in keys):
-                messagebox.showerror("Invalid hotkey", f"Button {btn}: include a non-modifier key (ex: ctrl+a).")
-                return
+            if keys:
+                try:
+                    keys = list(compile_action(keys).keys)
+                except InvalidMapping as e:
+                    messagebox.showerror("Invalid hotkey", f"Button {btn}: {e}")
+                    return
 
             set_mapping(prof_data, btn, keys)
 
@@ -227,16 +265,28 @@ class ConfigGui(ctk.CTkToplevel):
         self.app_state["activeProfile"] = prof
         
         try:
-            save_config(self.file_lock, self.data, cloud.cloud_sync, prof)
+            save_profile(self.file_lock, prof, prof_data, cloud.cloud_sync)
             # db.reference("/").update({"activeProfile": prof})
             # db.reference(f"profiles/{prof}").set(prof_data)
 
+        except ConfigError as e:
+            messagebox.showerror("Invalid config", str(e))
+            return
         except Exception as e:
             messagebox.showwarning("Saved locally", f"Saved locally, but Firebase update failed:\n{e}")
             return
 
         messagebox.showinfo("Saved", "Config saved successfully.")
 
+    # Saves self.data; a hand-edited mapping elsewhere in the config can still be invalid
+    def _save_or_report(self) -> bool:
+        try:
+            save_config(self.file_lock, self.data, cloud.cloud_sync)
+        except ConfigError as e:
+            messagebox.showerror("Invalid config", str(e))
+            return False
+        return True
+
     def _add_profile(self):
         # CustomTkinter input dialog
         dialog = ctk.CTkInputDialog(title="Add Profile", text="Enter new profile name:")
@@ -258,7 +308,8 @@ class ConfigGui(ctk.CTkToplevel):
         self.data["activeProfile"] = name
         self.app_state["activeProfile"] = name
 
-        save_config(self.file_lock, self.data, cloud.cloud_sync)
+        if not self._save_or_report():
+            return
 
         # Refresh
         self.profiles = get_profiles(self.data)
@@ -286,7 +337,8 @@ class ConfigGui(ctk.CTkToplevel):
             self.data["activeProfile"] = new_active
             self.app_state["activeProfile"] = new_active
 
-        save_config(self.file_lock, self.data, cloud.cloud_sync)
+        if not self._save_or_report():
+            return
 
         self.profiles = get_profiles(self.data)
         self._refresh_profile_menu()
@@ -297,7 +349,11 @@ class ConfigGui(ctk.CTkToplevel):
         if self._did_cleanup:
             return
         self._did_cleanup = True
-        print("GUI: cleanup")
+        log.debug("GUI: cleanup")
+
+        unsubscribe = getattr(self, "_unsubscribe", None)
+        if unsubscribe:
+            unsubscribe()
 
         try:
             self.app_state["gui_window"] = None
@@ -312,12 +368,12 @@ class ConfigGui(ctk.CTkToplevel):
     def _on_destroy(self, event):
         # Only run once, and only when THIS toplevel is being destroyed
         if event.widget is self:
-            print("GUI: <Destroy> fired")
+            log.debug("GUI: <Destroy> fired")
             self._cleanup()
 
     def _on_close(self):
         import traceback
-        print("GUI: _on_close called")
+        log.debug("GUI: _on_close called")
         # traceback.print_stack(limit=30) 
         self._cleanup()
         try:
@@ -340,7 +396,7 @@ class ConfigGui(ctk.CTkToplevel):
         except Exception:
             pass
 
-def open_config_gui(master, file_lock, state, controller):
+def open_config_gui(master, file_lock, state, controller, post):
 
     # root = tk._default_root
     # if root is None:
@@ -349,7 +405,7 @@ def open_config_gui(master, file_lock, state, controller):
     #     root.withdraw()
     
     root = master
-    win = ConfigGui(root, file_lock=file_lock, state=state, controller=controller)
+    win = ConfigGui(root, file_lock=file_lock, state=state, controller=controller, post=post)
     state["gui_window"] = win
     try:
         win.set_connected(bool(state.get("connected")))
@@ -4,8 +4,11 @@ import queue
 import tkinter as tk
 import customtkinter as ctk
 
+from desktop.core.log import get_logger
 from desktop.ui.gui import ConfigGui, open_config_gui
 
+log = get_logger("gui")
+
 class GuiHost:
     def __init__(self, file_lock, state, controller):
         self.file_lock = file_lock
@@ -44,7 +47,7 @@ class GuiHost:
                 try:
                     fn()
                 except Exception as e:
-                    print("GUI task error:", e)
+                    log.error("GUI task error: %s", e)
             self._root.after(50, pump)
 
         self._root.after(50, pump)
@@ -59,7 +62,7 @@ class GuiHost:
 
         def _open():
             if self._root is None:
-                print("GUI: _open() called but root is None")
+                log.warning("GUI: _open() called but root is None")
                 return
 
             # If already open, just focus it
@@ -74,7 +77,7 @@ class GuiHost:
                 pass
 
             # Create window using the correct master
-            self.win_ref = open_config_gui(self._root, self.file_lock, self.state, self.controller)
+            self.win_ref = open_config_gui(self._root, self.file_lock, self.state, self.controller, self._q.put)
 
             # Ensure it appears (some Windows setups need this)
             win = self.state.get("gui_window")
@@ -87,7 +90,7 @@ class GuiHost:
             except Exception:
                 pass
 
-            print("GUI: state gui_window =", self.state.get("gui_window"))
+            log.debug("GUI: state gui_window = %s", self.state.get("gui_window"))
             
         
         self._q.put(_open)
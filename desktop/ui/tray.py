@@ -23,9 +23,13 @@ def build_tray(app):
         pystray.MenuItem("Connect to DB", lambda icon, item: app.tray_sign_in(icon, item)),
         pystray.MenuItem("Open GUI", lambda icon, item: app.open_gui()),
         pystray.MenuItem("Refresh json", lambda icon, item: app.refresh_json(app.FILE_LOCK)),
+        pystray.MenuItem("Undo config change", lambda icon, item: app.undo_config_change(icon, item)),
         pystray.MenuItem("Change profile", lambda icon, item: app.change_profile(step=1)),
         pystray.MenuItem("Connect BLE", lambda icon, item: app.tray_connect(icon, item)),
         pystray.MenuItem("Disconnect BLE", lambda icon, item: app.tray_disconnect(icon, item)),
+        # Label is re-evaluated every time the menu opens
+        pystray.MenuItem(lambda item: app.cloud_status_label(), lambda icon, item: app.show_cloud_status(icon, item)),
+        pystray.MenuItem("Latency stats", lambda icon, item: app.show_latency_stats(icon, item)),
         pystray.MenuItem("Exit", lambda icon, item: app.exit_app(icon)),
         
     )
@@ -0,0 +1,66 @@
+import pytest
+
+from desktop.core import actions
+
+
+def test_compile_action_canonicalizes_names_and_resolves_codes():
+    action = actions.compile_action(["Control", " Shift ", "ESCAPE"])
+    assert action.keys == ("ctrl", "shift", "esc")
+    assert action.codes == (0x11, 0x10, 0x1B)
+    assert action.label == "ctrl+shift+esc"
+
+
+def test_compile_action_is_immutable():
+    action = actions.compile_action(["ctrl", "a"])
+    with pytest.raises(AttributeError):
+        action.keys = ("b",)
+
+
+@pytest.mark.parametrize("keys, message", [
+    (["ctrl", "ctrll"], "unknown key 'ctrll'"),
+    (["ctrl", "shift"], "only modifiers"),
+    (["a", "a"], "appears more than once"),
+    (["ctrl", ""], "non-empty strings"),
+    ("ctrl+a", "list of key names"),
+])
+def test_compile_action_rejects_with_precise_message(keys, message):
+    with pytest.raises(actions.InvalidMapping, match=message):
+        actions.compile_action(keys)
+
+
+def test_keys_without_vk_codes_are_pressed_by_name():
+    for keys in (["ctrl", "!"], ["ctrl", "+"], ["ctrl", "{"], ["hanguel"], ["clear"], ["ctrl", "A"]):
+        action = actions.compile_action(keys)
+        assert action.keys == tuple(keys)
+        assert action.codes is None
+    assert actions.compile_action(["ctrl", "a"]).codes == (0x11, 0x41)
+
+
+def test_plus_is_not_an_alias_for_equals():
+    with pytest.raises(actions.InvalidMapping, match="unknown key 'plus'"):
+        actions.compile_action(["ctrl", "plus"])
+
+
+def test_unknown_key_suggests_close_name():
+    with pytest.raises(actions.InvalidMapping, match="did you mean 'pagedown'"):
+        actions.compile_action(["pagedwn"])
+
+
+def test_validate_config_canonicalizes_in_place():
+    config = {"profiles": {"default": {"BTN:1": {"keys": ["CTRL", "Return"]}, "BTN:2": {"keys": []}}}}
+    actions.validate_config(config)
+    assert config["profiles"]["default"]["BTN:1"]["keys"] == ["ctrl", "enter"]
+    assert config["profiles"]["default"]["BTN:2"]["keys"] == []
+
+
+def test_validate_config_reports_every_problem():
+    config = {"profiles": {
+        "default": {"BTN:1": {"keys": ["ctrl", "qq"]}, "BTN:2": "oops"},
+        "work": {"BTN:3": {"keys": ["alt"]}},
+    }}
+    with pytest.raises(actions.ConfigError) as excinfo:
+        actions.validate_config(config)
+
+    problems = {(p.profile, p.button_id) for p in excinfo.value.problems}
+    assert problems == {("default", "BTN:1"), ("default", "BTN:2"), ("work", "BTN:3")}
+    assert "default / BTN:1: unknown key 'qq'" in str(excinfo.value)
@@ -182,7 +182,7 @@ def test_change_profile_wraps_and_calls_set_state(monkeypatch):
     assert called[-1] == "default"
 
 
-def test_set_state_writes_json_and_calls_cloud(monkeypatch, tmp_path):
+def test_set_state_writes_json_and_queues_cloud(monkeypatch, tmp_path):
     loop = FakeLoop()
     lock = threading.RLock()
     state = {"connected": False, "activeProfile": "default"}
@@ -197,24 +197,18 @@ def test_set_state_writes_json_and_calls_cloud(monkeypatch, tmp_path):
 
     # Patch config path
     cfg_path = tmp_path / "buttonControls.json"
+    cfg_path.write_text(json.dumps({"activeProfile": "default", "profiles": {"default": {}, "computer": {}}}))
     monkeypatch.setattr(app_controller, "get_config_path", lambda: cfg_path)
 
-    # Patch set_active_profile call + cloud.cloud_sync
-    calls = []
-    monkeypatch.setattr(app_controller, "set_active_profile", lambda rtdb, uid, token, prof: calls.append((uid, prof)))
-
-    class FakeCloudSync:
-        rtdb = object()
-        uid = "UID"
-        id_token = "TOKEN"
-
-    monkeypatch.setattr(app_controller.cloud, "cloud_sync", FakeCloudSync())
+    # CloudSync picks profile changes up from the store and patches them write-behind
+    changes = []
+    app_controller.config_store.get_store(cfg_path, lock).subscribe(lambda snap, source: changes.append((source, snap.active_profile)))
 
     app.set_state("computer")
 
     saved = json.loads(cfg_path.read_text(encoding="utf-8"))
     assert saved["activeProfile"] == "computer"
-    assert calls == [("UID", "computer")]
+    assert changes[-1] == ("profile", "computer")
 
 def test_set_state_does_not_crash_when_cloud_sync_missing(monkeypatch, tmp_path):
     import desktop.ui.app_controller as app_controller
@@ -231,4 +225,80 @@ def test_set_state_does_not_crash_when_cloud_sync_missing(monkeypatch, tmp_path)
     monkeypatch.setattr(app_controller.cloud, "cloud_sync", None)
 
     # Right now this will likely crash unless you guard it.
-    app.set_state("default")
\ No newline at end of file
+    app.set_state("default")
+
+def test_show_latency_stats_dumps_and_notifies(monkeypatch, tmp_path):
+    loop = FakeLoop()
+    app = app_controller.AppController(loop, threading.RLock(), {"connected": False}, ["default"], "X", "Y",
+                                       lambda *a, **k: None, lambda *a, **k: None,
+                                       lambda *a, **k: None, lambda *a, **k: None, 0)
+    icon = FakeIcon()
+    app.set_icon(icon)
+
+    out = tmp_path / "latency_stats.json"
+    monkeypatch.setattr(app_controller.metrics, "get_metrics_path", lambda: out)
+
+    app.show_latency_stats()
+    assert out.exists()
+    assert str(out) in icon.notifications[-1][1]
+
+
+def test_cloud_status_label_shows_outbox_depth_and_age(monkeypatch):
+    app = app_controller.AppController(FakeLoop(), threading.RLock(), {"connected": False}, ["default"], "X", "Y",
+                                       lambda *a, **k: None, lambda *a, **k: None,
+                                       lambda *a, **k: None, lambda *a, **k: None, 0)
+    monkeypatch.setattr(app_controller.cloud, "cloud_sync", None)
+    assert app.cloud_status_label() == "Cloud: not connected"
+
+    class FakeWriter:
+        def __init__(self):
+            self.depth = 0
+
+        def stats(self):
+            return {"depth": self.depth, "oldest_age_s": 150.0 if self.depth else None}
+
+    writer = FakeWriter()
+    monkeypatch.setattr(app_controller.cloud, "cloud_sync", type("Sync", (), {"writer": writer})())
+    assert app.cloud_status_label() == "Cloud: up to date"
+    writer.depth = 3
+    assert app.cloud_status_label() == "Cloud: 3 pending (oldest 2m)"
+
+
+def test_config_changes_from_anywhere_update_the_active_profile(tmp_path):
+    lock = threading.RLock()
+    state = {"connected": False, "activeProfile": "default"}
+    app = app_controller.AppController(
+        FakeLoop(), lock, state, ["default"], "X", "Y",
+        start_ble_session=lambda *a, **k: None,
+        stop_ble_session=lambda *a, **k: None,
+        full_reload_from_db=lambda *a, **k: None,
+        connecting_to_db=lambda *a, **k: None,
+        array_index=0
+    )
+    store = app_controller.config_store.ConfigStore(tmp_path / "buttonControls.json", lock)
+    store.subscribe(app.on_config_changed)
+
+    # A hand edit picked up by the file watcher
+    store.replace({"activeProfile": "games", "profiles": {"default": {}, "games": {}}}, source="file", persist=False)
+    assert state["activeProfile"] == "games"
+
+
+def test_exit_app_drains_worker_and_log_before_exiting(monkeypatch):
+    loop = FakeLoop()
+    loop.stop = lambda: None
+    app = app_controller.AppController(
+        loop, threading.RLock(), {"connected": False, "activeProfile": "default"}, ["default"], "X", "Y",
+        start_ble_session=lambda *a, **k: None,
+        stop_ble_session=lambda *a, **k: None,
+        full_reload_from_db=lambda *a, **k: None,
+        connecting_to_db=lambda *a, **k: None,
+        array_index=0
+    )
+    steps = []
+    monkeypatch.setattr(app_controller, "shutdown_macro_worker", lambda: steps.append("worker"))
+    monkeypatch.setattr(app, "flush_pending", lambda: steps.append("config"))
+    monkeypatch.setattr(app_controller.applog, "stop", lambda: steps.append("log"))
+    monkeypatch.setattr(app_controller.os, "_exit", lambda code: steps.append(("exit", code)))
+
+    app.exit_app(FakeIcon())
+    assert steps == ["worker", "config", "log", ("exit", 0)]
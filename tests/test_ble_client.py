@@ -3,6 +3,8 @@ import threading
 import pytest
 from pathlib import Path
 from desktop.ble import ble_client
+from desktop.core import injection, keymap
+from desktop.ble.macro_worker import MacroWorker
 
 def test_verify_char_uuid_missing():
     class FakeServices:
@@ -19,30 +21,373 @@ def test_verify_char_uuid_missing():
         )
 
 
-def test_trigger_macro(tmp_path, monkeypatch):
-    config_path = tmp_path / "buttonControls.json"
-    config_path.write_text(json.dumps({
+def test_trigger_macro(monkeypatch):
+    keymap.publish({
         "profiles": {
             "default": {
                 "BTN:1": {"keys": ["ctrl", "a"]}
             }
         }
-    }))
+    })
 
-    monkeypatch.setattr(
-        ble_client,
-        "get_config_path",
-        lambda: config_path
-    )
+    rec = injection.RecordingBackend()
+    monkeypatch.setattr(injection, "get_backend", lambda: rec)
 
-    calls = []
+    ble_client.trigger_macro("BTN:1", "default", threading.RLock())
+    assert rec.keys() == [("ctrl", "a")]
 
-    from unittest.mock import MagicMock
 
-    fake = MagicMock()
-    fake.hotkey = lambda *keys: calls.append(keys)
+def test_trigger_macro_does_not_read_config(tmp_path, monkeypatch):
+    keymap.publish({"profiles": {"default": {"BTN:2": {"keys": ["alt", "tab"]}}}})
 
-    monkeypatch.setattr(ble_client, "_get_pyautogui", lambda: fake)
+    def fail():
+        raise AssertionError("trigger_macro touched the config file")
 
-    ble_client.trigger_macro("BTN:1", "default", threading.RLock())
-    assert calls == [("ctrl", "a")]
+    monkeypatch.setattr(keymap, "get_config_path", fail)
+
+    rec = injection.RecordingBackend()
+    monkeypatch.setattr(injection, "get_backend", lambda: rec)
+
+    ble_client.trigger_macro("BTN:2", "default", threading.RLock())
+    ble_client.trigger_macro("BTN:9", "default", threading.RLock())
+    assert rec.keys() == [("alt", "tab")]
+
+
+def test_notification_handler_records_latency(monkeypatch):
+    from desktop.core import metrics
+
+    metrics.reset()
+    keymap.publish({"profiles": {"default": {"BTN:1": {"keys": ["ctrl", "a"]}}}})
+    monkeypatch.setattr(injection, "get_backend", lambda: injection.RecordingBackend())
+
+    worker = MacroWorker(ble_client._execute_macro_event).start()
+    handler = ble_client.make_notification_handler({"activeProfile": "default"}, threading.RLock(), worker)
+    handler(None, bytearray(b"BTN:1"))
+    assert worker.wait_idle(timeout=2)
+    worker.stop()
+
+    snap = metrics.snapshot()["histograms"]
+    for stage in ("decode", "queue", "lookup", "dispatch", "inject", "total"):
+        assert snap[f"keypress.{stage}"]["count"] == 1
+
+
+def test_notification_handler_only_enqueues():
+    submitted = []
+
+    class FakeWorker:
+        def submit(self, event):
+            submitted.append((event.button_id, event.profile))
+            return True
+
+    handler = ble_client.make_notification_handler({"activeProfile": "computer"}, threading.RLock(), FakeWorker())
+    handler(None, bytearray(b"BTN:3\r\n"))
+    assert submitted == [("BTN:3", "computer")]
+
+
+class FakeBleakClient:
+    reachable = set()
+    created = []
+
+    def __init__(self, address_or_device, timeout=None, disconnected_callback=None, **kwargs):
+        self.address = getattr(address_or_device, "address", address_or_device)
+        self.is_connected = False
+        FakeBleakClient.created.append(self.address)
+
+    async def connect(self):
+        if self.address not in FakeBleakClient.reachable:
+            raise TimeoutError("not reachable")
+        self.is_connected = True
+
+
+def _patch_ble(monkeypatch, tmp_path, reachable, scan_result=None, name="Macropad"):
+    import asyncio
+    from types import SimpleNamespace
+
+    FakeBleakClient.reachable = set(reachable)
+    FakeBleakClient.created = []
+    scans = []
+
+    class FakeScanner:
+        @staticmethod
+        async def find_device_by_filter(filterfunc, timeout=10.0, **kwargs):
+            scans.append(kwargs)
+            if scan_result is None:
+                return None
+            adv = SimpleNamespace(service_uuids=[ble_client.SERVICE_UUID], local_name=name)
+            dev = SimpleNamespace(address=scan_result, name=name)
+            return dev if filterfunc(dev, adv) else None
+
+    monkeypatch.setattr(ble_client, "BleakClient", FakeBleakClient)
+    monkeypatch.setattr(ble_client, "BleakScanner", FakeScanner)
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    return scans
+
+
+def test_open_client_warm_path_skips_scan(monkeypatch, tmp_path):
+    import asyncio
+    scans = _patch_ble(monkeypatch, tmp_path, reachable={"AA:BB"})
+    ble_client.device_cache.remember_address("Macropad", "AA:BB")
+
+    session = ble_client.BleSession("Macropad", {}, threading.RLock())
+    client = asyncio.run(ble_client.open_client(session, lambda c: None))
+
+    assert client.address == "AA:BB"
+    assert scans == []
+
+
+def test_open_client_falls_back_to_filtered_scan_and_caches(monkeypatch, tmp_path):
+    import asyncio
+    from desktop.core import metrics
+
+    metrics.reset()
+    scans = _patch_ble(monkeypatch, tmp_path, reachable={"CC:DD"}, scan_result="CC:DD")
+
+    session = ble_client.BleSession("Macropad", {}, threading.RLock(), seed_address="STALE")
+    client = asyncio.run(ble_client.open_client(session, lambda c: None))
+
+    assert client.address == "CC:DD"
+    assert FakeBleakClient.created == ["STALE", "CC:DD"]
+    assert scans[0]["service_uuids"] == [ble_client.SERVICE_UUID]
+    assert ble_client.device_cache.get_cached_address("Macropad") == "CC:DD"
+    assert metrics.snapshot()["histograms"]["ble.connect.cold"]["count"] == 1
+
+
+def test_wait_for_advertisement_returns_first_match(monkeypatch, tmp_path):
+    import asyncio
+    from types import SimpleNamespace
+
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    monkeypatch.delenv("ADDRESS", raising=False)
+    stopped = []
+
+    class FakeScanner:
+        def __init__(self, detection_callback):
+            self.cb = detection_callback
+
+        async def start(self):
+            loop = asyncio.get_running_loop()
+            other = SimpleNamespace(address="11:11", name="Phone")
+            pad = SimpleNamespace(address="AA:BB", name=None)
+            loop.call_soon(self.cb, other, SimpleNamespace(service_uuids=[], local_name="Phone"))
+            loop.call_soon(self.cb, pad, SimpleNamespace(service_uuids=[ble_client.SERVICE_UUID.upper()], local_name=None))
+
+        async def stop(self):
+            stopped.append(True)
+
+    monkeypatch.setattr(ble_client, "BleakScanner", FakeScanner)
+
+    device = asyncio.run(ble_client.wait_for_advertisement("Macropad", timeout=1.0))
+    assert device.address == "AA:BB"
+    assert stopped == [True]
+
+
+class FakeChar:
+    def __init__(self, handle=42):
+        self.handle = handle
+        self.properties = ["notify", "read"]
+
+
+class GattClient:
+    """Client whose services appear after `ready_after` polls and which exposes a DB hash."""
+    def __init__(self, ready_after=0, db_hash=b"\x01\x02", layout=None, handle=42):
+        self.address = "AA:BB"
+        self.polls = 0
+        self.ready_after = ready_after
+        self.db_hash = db_hash
+        self.layout = layout
+        self.handle = handle
+
+    @property
+    def services(self):
+        self.polls += 1
+        if self.polls <= self.ready_after:
+            raise Exception("Service Discovery has not been performed yet")
+        return type("S", (), {"get_characteristic": lambda s, uuid: FakeChar(self.handle)})()
+
+    async def read_gatt_char(self, uuid):
+        value = self.db_hash if uuid == ble_client.DB_HASH_CHAR_UUID else self.layout
+        if value is None:
+            raise Exception(f"no characteristic {uuid}")
+        return bytearray(value)
+
+
+def test_wait_for_gatt_ready_polls_until_discovered():
+    import asyncio
+    client = GattClient(ready_after=3)
+    char = asyncio.run(ble_client.wait_for_gatt_ready(client, "uuid", timeout=1.0, interval=0.001))
+    assert char.handle == 42
+    assert client.polls == 4
+
+
+def test_wait_for_gatt_ready_times_out():
+    import asyncio
+    client = GattClient(ready_after=10_000)
+    with pytest.raises(RuntimeError, match="GATT not ready"):
+        asyncio.run(ble_client.wait_for_gatt_ready(client, "uuid", timeout=0.02, interval=0.001))
+
+
+def test_resolve_notify_char_caches_handle_and_enables_os_cache(tmp_path, monkeypatch):
+    import asyncio
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+
+    assert "winrt" not in ble_client._client_kwargs("AA:BB")
+    asyncio.run(ble_client.resolve_notify_char(GattClient(), "uuid"))
+
+    entry = ble_client.device_cache.get_gatt_entry("AA:BB")
+    assert entry == {"char_uuid": "uuid", "handle": 42, "db_hash": "0102"}
+    assert ble_client._client_kwargs("AA:BB")["winrt"] == {"use_cached_services": True}
+
+
+def test_resolve_notify_char_drops_cache_when_db_hash_changes(tmp_path, monkeypatch):
+    import asyncio
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    ble_client.device_cache.remember_gatt("AA:BB", "uuid", 42, "0102")
+
+    with pytest.raises(RuntimeError, match="GATT database changed"):
+        asyncio.run(ble_client.resolve_notify_char(GattClient(db_hash=b"\x09"), "uuid"))
+    assert ble_client.device_cache.get_gatt_entry("AA:BB") is None
+
+
+def test_resolve_notify_char_uses_layout_version_and_cached_handle(tmp_path, monkeypatch):
+    import asyncio
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+
+    # Firmware without 0x2B2A: the layout characteristic validates the OS cache instead
+    asyncio.run(ble_client.resolve_notify_char(GattClient(db_hash=None, layout=b"1"), "uuid"))
+    assert ble_client.device_cache.get_gatt_entry("AA:BB")["db_hash"] == "31"
+    assert ble_client._client_kwargs("AA:BB")["winrt"] == {"use_cached_services": True}
+
+    # Same layout version but the notify characteristic moved: the cached table is stale
+    with pytest.raises(RuntimeError, match="GATT database changed"):
+        asyncio.run(ble_client.resolve_notify_char(GattClient(db_hash=None, layout=b"1", handle=7), "uuid"))
+    assert ble_client.device_cache.get_gatt_entry("AA:BB") is None
+
+
+def test_decode_payload_legacy_text():
+    assert ble_client.decode_payload(bytearray(b"BTN:2\r\n")) == [ble_client.ButtonEvent("BTN:2", True, None)]
+
+
+def test_decode_payload_v1_batch():
+    import struct
+    data = bytes([ble_client.PROTOCOL_V1, 2]) + struct.pack("<BBH", 1, 1, 7) + struct.pack("<BBH", 1, 0, 8)
+    assert ble_client.decode_payload(bytearray(data)) == [
+        ble_client.ButtonEvent("BTN:1", True, 7),
+        ble_client.ButtonEvent("BTN:1", False, 8),
+    ]
+
+
+def test_decode_payload_rejects_truncated_v1():
+    with pytest.raises(ValueError):
+        ble_client.decode_payload(bytes([ble_client.PROTOCOL_V1, 2, 1, 1, 0, 0]))
+    with pytest.raises(ValueError):
+        ble_client.decode_payload(bytes([0x07, 1]))
+
+
+def test_sequence_tracker_counts_gaps_and_wraparound():
+    t = ble_client.SequenceTracker()
+    assert t.observe(0xFFFE)
+    assert t.observe(0xFFFF)
+    assert t.observe(2)          # 0 and 1 lost across the wrap
+    assert not t.observe(1)      # late duplicate
+    assert t.stats() == {"received": 4, "lost": 2, "duplicates": 1}
+
+
+def test_each_connection_tracks_sequence_numbers_afresh():
+    session = ble_client.BleSession("Macropad", {}, None)
+    first = session.new_tracker()
+    for seq in range(500):
+        first.observe(seq)
+    assert not first.observe(3)
+
+    # The pad rebooted and starts counting at 0 again: nothing is taken for a duplicate
+    second = session.new_tracker()
+    assert all(second.observe(seq) for seq in range(5))
+    assert session.event_stats() == {"received": 506, "lost": 0, "duplicates": 1}
+
+
+def test_notification_handler_submits_presses_only():
+    import struct
+    submitted = []
+
+    class FakeWorker:
+        def submit(self, event):
+            submitted.append(event.button_id)
+
+    handler = ble_client.make_notification_handler({"activeProfile": "default"}, threading.RLock(), FakeWorker())
+    data = bytes([ble_client.PROTOCOL_V1, 3])
+    data += struct.pack("<BBH", 1, 1, 0) + struct.pack("<BBH", 1, 0, 1) + struct.pack("<BBH", 4, 1, 2)
+    handler(None, bytearray(data))
+    handler(None, bytearray(b"\x01"))  # malformed: ignored, doesn't raise into bleak
+    assert submitted == ["BTN:1", "BTN:4"]
+
+
+def test_open_client_skips_addresses_held_by_other_sessions(monkeypatch, tmp_path):
+    import asyncio
+    _patch_ble(monkeypatch, tmp_path, reachable={"AA:BB", "CC:DD"}, scan_result="CC:DD", name="Right")
+    monkeypatch.setattr(ble_client, "SESSIONS", ble_client.SessionRegistry())
+
+    other = ble_client.BleSession("Left", {}, threading.RLock())
+    other.client = FakeBleakClient("AA:BB")
+    other.client.is_connected = True
+    ble_client.SESSIONS.add(other)
+
+    session = ble_client.BleSession("Right", {}, threading.RLock(), seed_address="AA:BB")
+    ble_client.SESSIONS.add(session)
+    client = asyncio.run(ble_client.open_client(session, lambda c: None))
+
+    assert client.address == "CC:DD"
+    assert "AA:BB" not in FakeBleakClient.created[1:]
+
+
+def test_sessions_track_connection_and_profile_per_device(monkeypatch):
+    monkeypatch.setattr(ble_client, "SESSIONS", ble_client.SessionRegistry())
+    state = {"activeProfile": "default", "connected": False}
+
+    left = ble_client.BleSession("Left", state, threading.RLock(), profile="gaming")
+    right = ble_client.BleSession("Right", state, threading.RLock())
+    ble_client.SESSIONS.add(left)
+    ble_client.SESSIONS.add(right)
+
+    assert left.active_profile() == "gaming"
+    assert right.active_profile() == "default"
+
+    left.set_connected(True)
+    right.set_connected(True)
+    left.set_connected(False)
+    assert state["connected"] is True   # Right is still up
+    right.set_connected(False)
+    assert state["connected"] is False
+
+
+def test_start_and_stop_sessions_by_device(monkeypatch, tmp_path):
+    import asyncio
+    monkeypatch.setattr(ble_client, "SESSIONS", ble_client.SessionRegistry())
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    monkeypatch.setenv("ADDRESS", "AA:BB:CC:DD:EE:FF")
+    ble_client.device_cache.set_device_profile("Right", "media")
+    ran = []
+
+    async def fake_run(self, char_uuid=None, **kwargs):
+        assert self.seed_address is None  # the single-pad ADDRESS seed isn't handed to either pad
+        ran.append((self.device_name, self.active_profile()))
+        await self.stop_event.wait()
+
+    monkeypatch.setattr(ble_client.BleSession, "run", fake_run)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        state = {"activeProfile": "default", "connected": False}
+        tasks = ble_client.start_ble_session("Left, Right", threading.RLock(), state, loop)
+        await asyncio.sleep(0)
+        assert len(ble_client.SESSIONS) == 2
+
+        ble_client.stop_ble_session("Left")
+        await asyncio.sleep(0.01)
+        assert [s.device_name for s in ble_client.SESSIONS.all()] == ["Right"]
+
+        ble_client.stop_ble_session()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert len(ble_client.SESSIONS) == 0
+
+    asyncio.run(scenario())
+    assert sorted(ran) == [("Left", "default"), ("Right", "media")]
@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+
+from desktop.ble import ble_client, faults, simulator
+from desktop.ble.macro_worker import MacroWorker
+from desktop.core import injection, keymap
+
+
+@pytest.fixture
+def fault_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("ADDRESS", "SIM:00:00")
+    monkeypatch.setenv("CHAR_UUID", simulator.FIRMWARE_CHAR_UUID)
+    monkeypatch.delenv("BLE_RECORD_DIR", raising=False)
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    monkeypatch.setattr(ble_client, "SESSIONS", ble_client.SessionRegistry())
+
+    keymap.publish({"profiles": {"default": {f"BTN:{i}": {"keys": ["ctrl", str(i)]} for i in range(1, 5)}}})
+    monkeypatch.setattr(injection, "get_backend", lambda: injection.RecordingBackend())
+
+    worker = MacroWorker(ble_client._execute_macro_event).start()
+    monkeypatch.setattr(ble_client, "MACRO_WORKER", worker)
+    backend = simulator.SimulatedBackend()
+    yield backend, backend.add_pad("Macropad")
+    worker.stop()
+
+
+def _run(backend, pad, scenario):
+    async def main():
+        async with faults.FaultHarness(backend, pad) as h:
+            result = await scenario(h)
+        return h, result
+    return asyncio.run(main())
+
+
+def test_disconnect_mid_stream_recovers_within_slo(fault_env):
+    backend, pad = fault_env
+    h, result = _run(backend, pad, lambda h: h.disconnect_mid_stream())
+
+    assert result.violations(faults.SLOS["disconnect_mid_stream"]) == []
+    assert backend.connects == 2
+    assert h.leaks == []
+
+
+@pytest.mark.parametrize("fault", ["discovery_failures", "notify_timeouts"])
+def test_failed_setup_attempts_are_retried_within_slo(fault_env, fault):
+    backend, pad = fault_env
+    h, result = _run(backend, pad, lambda h: getattr(h, fault)(2))
+
+    assert result.failed_attempts == 2
+    assert result.violations(faults.SLOS[fault]) == []
+    assert backend.connects == 4
+    assert h.leaks == []
+
+
+def test_slow_disconnect_does_not_hold_up_stop(fault_env):
+    backend, pad = fault_env
+    h, result = _run(backend, pad, lambda h: h.slow_disconnect(delay=5.0))
+
+    assert result.violations(faults.SLOS["slow_disconnect"]) == []
+    assert h.leaks == []
+
+
+@pytest.mark.parametrize("stop_first", [True, False])
+def test_stop_racing_disconnect_callback_ends_cleanly(fault_env, stop_first):
+    backend, pad = fault_env
+    h, result = _run(backend, pad, lambda h: h.stop_races_disconnect(stop_first))
+
+    assert result.violations(faults.SLOS["stop_races_disconnect"]) == []
+    assert backend.connects == 1
+    assert h.leaks == []
+
+
+def test_harness_reports_leaked_tasks_and_subscriptions(fault_env):
+    backend, pad = fault_env
+
+    async def main():
+        async with faults.FaultHarness(backend, pad) as h:
+            stray = asyncio.create_task(asyncio.Event().wait())
+            stray_pad = backend.add_pad("Other")
+            stray_pad.notify_callback = lambda *a: None
+        stray.cancel()
+        return h
+
+    leaks = asyncio.run(main()).leaks
+    assert any(l.startswith("task still running") for l in leaks)
+    assert "notify callback still subscribed on Other" in leaks
+
+
+def test_start_notify_timeout_fails_the_attempt(fault_env, monkeypatch):
+    backend, pad = fault_env
+    pad.notify_hangs = 1
+    monkeypatch.setattr(ble_client, "NOTIFY_TIMEOUT", 0.05)
+    errors = []
+    session = ble_client.BleSession("Macropad", {"activeProfile": "default", "connected": False, "gui_window": None}, None)
+
+    async def main():
+        with backend.installed():
+            return await ble_client.connect(session, simulator.FIRMWARE_CHAR_UUID, on_error=errors.append)
+
+    assert asyncio.run(main()) == ble_client.FAILED
+    assert "start_notify timed out" in errors[0]
+    assert pad.client is None
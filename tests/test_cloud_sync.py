@@ -0,0 +1,198 @@
+import time
+
+import pytest
+
+from desktop.cloud.cloud_sync import CloudSync, CloudWriter, cloud_delta
+from desktop.cloud.rtdb_client import RTDBClient, RTDBError
+from desktop.core.config_store import ConfigSnapshot
+
+
+def _snap(version, active, profiles=("default", "work", "games")):
+    return ConfigSnapshot(version, {"activeProfile": active, "profiles": {p: {} for p in profiles}})
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def writer(calls):
+    w = CloudWriter(lambda data: calls.append(("put", data["activeProfile"])),
+                    lambda prof: calls.append(("patch", prof)), delay=60.0)
+    yield w
+    w.close(timeout=0.5)
+
+
+def test_profile_switches_coalesce_into_one_patch(writer, calls):
+    for i, prof in enumerate(["work", "games", "default", "work"], start=1):
+        writer.submit(_snap(i, prof), "profile")
+
+    assert calls == []
+    assert writer.flush() is True
+    assert calls == [("patch", "work")]
+    assert writer.coalesced == 3
+
+
+def test_save_in_window_becomes_one_put_with_latest_profile(writer, calls):
+    writer.submit(_snap(1, "work"), "profile")
+    writer.submit(_snap(2, "work"), "save")
+    writer.submit(_snap(3, "games"), "profile")
+
+    writer.flush()
+    assert calls == [("put", "games")]
+
+
+def test_local_only_sources_are_not_uploaded(writer, calls):
+    for source in ("load", "repair", "cloud", "local"):
+        writer.submit(_snap(1, "work"), source)
+    assert not writer.pending
+    assert writer.flush() is False
+
+
+def test_failed_send_is_retried_and_merged(calls):
+    attempts = []
+
+    def flaky_put(data):
+        attempts.append(data["activeProfile"])
+        if len(attempts) == 1:
+            raise ConnectionError("offline")
+        calls.append(("put", data["activeProfile"]))
+
+    writer = CloudWriter(flaky_put, lambda prof: calls.append(("patch", prof)), delay=60.0)
+    writer.submit(_snap(1, "work"), "save")
+    assert writer.flush() is False
+    assert writer.pending and writer.failed == 1
+
+    writer.submit(_snap(2, "games"), "profile")
+    assert writer.flush() is True
+    assert calls == [("put", "games")]
+    writer.close(timeout=0.5)
+
+
+def test_worker_sends_after_window_and_close_flushes(calls):
+    writer = CloudWriter(lambda data: calls.append(("put", data["activeProfile"])),
+                         lambda prof: calls.append(("patch", prof)), delay=0.05)
+    writer.submit(_snap(1, "work"), "profile")
+    deadline = time.monotonic() + 2.0
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls == [("patch", "work")]
+
+    writer.delay = 60.0
+    writer.submit(_snap(2, "games"), "save")
+    writer.close(timeout=1.0)
+    assert calls[-1] == ("put", "games")
+
+
+def test_cloud_delta_lists_changed_paths_with_nulls_for_deletes():
+    old = {"activeProfile": "a", "profiles": {"a": {"BTN:1": {"keys": ["ctrl", "c"]}, "BTN:2": {"keys": ["x"]}}, "b": {}}}
+    new = {"activeProfile": "c", "profiles": {"a": {"BTN:1": {"keys": ["ctrl", "v"]}}, "c": {"BTN:1": {"keys": ["y"]}}}}
+
+    assert cloud_delta(old, new) == {
+        "activeProfile": "c",
+        "profiles/a/BTN:1/keys": ["ctrl", "v"],
+        "profiles/a/BTN:2": None,
+        "profiles/b": None,
+        "profiles/c": {"BTN:1": {"keys": ["y"]}},
+    }
+    assert cloud_delta(new, new) == {}
+    assert cloud_delta(None, new) is None
+
+
+def test_saves_are_sent_as_deltas_once_cloud_state_is_known():
+    sent = []
+    writer = CloudWriter(lambda data: sent.append(("put", data)), lambda prof: sent.append(("active", prof)),
+                         delay=60.0, patch_config=lambda updates: sent.append(("patch", updates)))
+    library = {f"app{i}": {"BTN:1": {"keys": ["ctrl", "a"]}} for i in range(500)}
+    base = {"activeProfile": "app0", "profiles": library}
+
+    # Unknown cloud state: full put
+    writer.submit(ConfigSnapshot(1, base), "save")
+    writer.flush()
+    full_bytes = writer.bytes_sent
+    assert sent[-1][0] == "put"
+
+    changed = {"activeProfile": "app0", "profiles": dict(library, app7={"BTN:1": {"keys": ["f13"]}})}
+    writer.submit(ConfigSnapshot(2, changed), "save")
+    writer.flush()
+    assert sent[-1] == ("patch", {"profiles/app7/BTN:1/keys": ["f13"]})
+    assert writer.bytes_sent - full_bytes < 100
+
+    # A failed patch stays queued and goes out with whatever changed since
+    def offline(updates):
+        raise ConnectionError("offline")
+
+    writer.patch_config = offline
+    retry = {"activeProfile": "app7", "profiles": dict(library, app7={"BTN:1": {"keys": ["f14"]}})}
+    writer.submit(ConfigSnapshot(3, retry), "save")
+    assert writer.flush() is False
+    writer.submit(ConfigSnapshot(4, dict(retry, profiles=dict(retry["profiles"], app9={}))), "save")
+    writer.patch_config = lambda updates: sent.append(("patch", updates))
+    writer.flush()
+    assert sent[-1] == ("patch", {"activeProfile": "app7", "profiles/app7/BTN:1/keys": ["f14"], "profiles/app9/BTN:1": None})
+    writer.close(timeout=0.5)
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status_code = status
+        self._body = body
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeHTTP:
+    """Answers RTDB calls from a script of (status, body); records the auth token of each call."""
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.tokens = []
+
+    def patch(self, url, params, json, timeout):
+        self.tokens.append(params["auth"])
+        return FakeResponse(*self.replies.pop(0))
+
+    put = patch
+
+
+def test_error_body_keeps_the_batch_queued():
+    http = FakeHTTP((401, {"error": "Permission denied"}), (200, {"activeProfile": "games"}))
+    rtdb = RTDBClient("https://db.example", session=http)
+    writer = CloudWriter(lambda data: None, lambda prof: rtdb.patch("users/u1", "token", {"activeProfile": prof}), delay=60.0)
+
+    writer.submit(_snap(1, "games"), "profile")
+    assert writer.flush() is False
+    assert writer.pending and writer.failed == 1
+
+    assert writer.flush() is True
+    assert not writer.pending
+    writer.close(timeout=0.5)
+
+
+def test_expired_token_is_refreshed_and_the_request_retried():
+    class FakeSession:
+        def __init__(self):
+            self.token = "old"
+
+        def get_id_token(self):
+            return self.token
+
+        def invalidate_id_token(self):
+            self.token = "new"
+
+    http = FakeHTTP((401, {"error": "Auth token is expired"}), (200, {"activeProfile": "games"}))
+    sync = CloudSync.__new__(CloudSync)
+    sync.rtdb = RTDBClient("https://db.example", session=http)
+    sync.session = FakeSession()
+    sync.uid = "u1"
+
+    sync.patch_active_profile("games")
+    assert http.tokens == ["old", "new"]
+
+    http.replies = [(400, {"error": "Invalid path"})]
+    with pytest.raises(RTDBError):
+        sync.patch_active_profile("games")
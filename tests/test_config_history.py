@@ -0,0 +1,96 @@
+import json
+
+from desktop.core import config_history
+from desktop.core.config_history import ConfigHistory
+from desktop.core.config_store import ConfigStore
+
+
+def make_config(profiles, active="app0"):
+    return {
+        "activeProfile": active,
+        "profiles": {f"app{i}": {"BTN:1": {"keys": ["ctrl", chr(ord("a") + i % 26)]}} for i in range(profiles)},
+    }
+
+
+def set_button(config, profile, keys):
+    config = json.loads(json.dumps(config))
+    config["profiles"][profile]["BTN:1"] = {"keys": keys}
+    return config
+
+
+def test_diff_and_apply_round_trip_keeps_key_order():
+    old = {"activeProfile": "a", "profiles": {"a": {"BTN:1": {"keys": ["x"]}}, "b": {}, "c": {}}}
+    new = {"profiles": {"c": {}, "a": {"BTN:1": {"keys": ["y"]}}, "d": {}}, "activeProfile": "d"}
+
+    for src, dst in ((old, new), (new, old)):
+        result = config_history.apply(json.loads(json.dumps(src)), config_history.diff(src, dst))
+        assert result == dst
+        assert list(result["profiles"]) == list(dst["profiles"])
+
+
+def test_records_deltas_and_restores_any_version(tmp_path):
+    history = ConfigHistory(tmp_path / "history.bin")
+    versions = [make_config(3)]
+    for i in range(5):
+        versions.append(set_button(versions[-1], "app1", ["f13", str(i)]))
+    for v in versions:
+        history.record(v, "save")
+    assert history.record(versions[-1], "save") is None  # unchanged
+
+    entries = history.entries()
+    assert len(entries) == 6
+    for entry, expected in zip(entries, reversed(versions)):
+        assert history.config_at(entry.id) == expected
+
+    # Reopening reads the same history back
+    reopened = ConfigHistory(tmp_path / "history.bin")
+    assert reopened.entries() == entries
+    assert reopened.config_at(entries[-1].id) == versions[0]
+
+
+def test_history_is_bounded_and_stays_small(tmp_path):
+    history = ConfigHistory(tmp_path / "history.bin", max_versions=10)
+    config = make_config(1000)
+    history.record(config, "save")
+    full_size = history.stats()["bytes"]
+
+    for i in range(30):
+        config = set_button(config, f"app{i}", ["f14"])
+        history.record(config, "save")
+
+    entries = history.entries()
+    assert len(entries) == 10
+    assert history.config_at(entries[-1].id)["profiles"]["app20"]["BTN:1"]["keys"] == ["f14"]
+    assert history.config_at(entries[-1].id)["profiles"]["app21"]["BTN:1"]["keys"] != ["f14"]
+    # Nine deltas add far less than nine more copies would
+    assert history.stats()["bytes"] < full_size * 1.5
+
+
+def test_undo_through_the_store_keeps_going_back(tmp_path):
+    store = ConfigStore(tmp_path / "buttonControls.json")
+    store.replace(make_config(2), source="defaults")
+    history = ConfigHistory(tmp_path / "history.bin")
+    history.attach(store)
+
+    store.replace(set_button(store.snapshot().thaw(), "app0", ["f1"]), source="save")
+    store.replace(set_button(store.snapshot().thaw(), "app0", ["f2"]), source="save")
+    store.update(lambda d: d.__setitem__("activeProfile", "app1"), source="profile")  # not recorded
+
+    assert history.restore(store).source == "save"
+    assert store.snapshot().thaw()["profiles"]["app0"]["BTN:1"]["keys"] == ["f1"]
+    assert json.loads(store.path.read_text())["profiles"]["app0"]["BTN:1"]["keys"] == ["f1"]
+
+    # A second undo goes further back instead of undoing the undo
+    assert history.restore(store).source == "startup"
+    assert store.snapshot().thaw() == make_config(2)
+    assert history.restore(store) is None
+    assert [e.source for e in history.entries()][:2] == ["rollback", "rollback"]
+
+
+def test_unreadable_history_starts_over(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(b"garbage")
+    history = ConfigHistory(path)
+    assert history.entries() == []
+    history.record(make_config(1), "save")
+    assert len(ConfigHistory(path).entries()) == 1
@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+from desktop.core import config_io
+
+
+def test_write_json_skips_unchanged_content(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    data = {"activeProfile": "default", "profiles": {"default": {}}}
+
+    assert config_io.write_json(path, data) is True
+    before = config_io.stats()["skipped"]
+    assert config_io.write_json(path, dict(data)) is False
+    assert config_io.stats()["skipped"] == before + 1
+
+    data["activeProfile"] = "work"
+    data["profiles"]["work"] = {}
+    assert config_io.write_json(path, data) is True
+    assert json.loads(path.read_text())["activeProfile"] == "work"
+
+
+def test_write_json_rewrites_after_external_edit(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    data = {"activeProfile": "default", "profiles": {"default": {}}}
+    config_io.write_json(path, data)
+
+    path.write_text('{"edited": true, "by": "hand"}')
+
+    assert config_io.write_json(path, data) is True
+    assert json.loads(path.read_text()) == data
+
+
+def test_write_json_keeps_previous_version_and_no_tmp(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    config_io.write_json(path, {"v": 1})
+    config_io.write_json(path, {"v": 2})
+
+    assert json.loads(path.read_text()) == {"v": 2}
+    assert json.loads(config_io.backup_path(path).read_text()) == {"v": 1}
+    assert not (tmp_path / "buttonControls.json.tmp").exists()
+
+
+def test_failed_rename_leaves_old_file_and_backup(tmp_path, monkeypatch):
+    path = tmp_path / "buttonControls.json"
+    config_io.write_json(path, {"v": 1})
+    config_io.write_json(path, {"v": 2})
+
+    def crash(src, dst):
+        raise OSError("power cut")
+
+    monkeypatch.setattr(config_io.os, "replace", crash)
+    with pytest.raises(OSError):
+        config_io.write_json(path, {"v": 3})
+
+    assert json.loads(path.read_text()) == {"v": 2}
+    assert json.loads(config_io.backup_path(path).read_text()) == {"v": 1}
+
+
+def test_invalid_file_is_not_promoted_to_backup(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    config_io.write_json(path, {"v": 1})
+    config_io.write_json(path, {"v": 2})
+    path.write_text("{ not json")
+
+    config_io.write_json(path, {"v": 3})
+
+    assert json.loads(config_io.backup_path(path).read_text()) == {"v": 1}
+
+
+def test_read_json_recovers_corrupted_file_from_backup(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    config_io.write_json(path, {"v": 1})
+    config_io.write_json(path, {"v": 2})
+    path.write_text("{ truncated")
+
+    before = config_io.stats()["recovered"]
+    assert config_io.read_json(path) == {"v": 1}
+    assert config_io.stats()["recovered"] == before + 1
+    # The good copy is back in place
+    assert json.loads(path.read_text()) == {"v": 1}
+
+
+def test_read_json_recovers_missing_file(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    config_io.write_json(path, {"v": 1})
+    config_io.write_json(path, {"v": 2})
+    os.remove(path)
+
+    assert config_io.read_json(path) == {"v": 1}
+    assert path.exists()
+
+
+def test_read_json_without_backup_returns_none(tmp_path):
+    path = tmp_path / "buttonControls.json"
+    assert config_io.read_json(path) is None
+
+    path.write_text("not json")
+    assert config_io.read_json(path) is None
+    assert config_io.read_json(path, recover=False) is None
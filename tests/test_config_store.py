@@ -1,5 +1,6 @@
 import json
 import threading
+import time
 import pytest
 from pathlib import Path
 
@@ -78,4 +79,188 @@ def test_get_mapping_str():
 def test_ensure_local_config_creates_file(temp_config):
     lock = threading.RLock()
     config_store.ensure_local_config_exists(lock)
-    assert temp_config.exists()
\ No newline at end of file
+    assert temp_config.exists()
+
+def test_save_config_publishes_keymap(temp_config):
+    from desktop.core import keymap
+
+    lock = threading.RLock()
+    data = {"activeProfile": "default", "profiles": {"default": {"BTN:1": {"keys": ["ctrl", "c"]}}}}
+    config_store.save_config(lock, data, cloud_sync=None)
+
+    assert keymap.lookup("default", "BTN:1") == ("ctrl", "c")
+
+
+def test_store_snapshots_are_versioned_and_read_only(temp_config):
+    lock = threading.RLock()
+    config_store.ensure_local_config_exists(lock)
+    store = config_store.get_store(temp_config, lock)
+
+    first = store.snapshot()
+    with pytest.raises(TypeError):
+        first.data["activeProfile"] = "other"
+
+    def add_profile(data):
+        data["profiles"]["work"] = {"BTN:1": {"keys": ["ctrl", "w"]}}
+    second = store.update(add_profile, source="save")
+
+    assert second.version == first.version + 1
+    assert "work" not in first.data["profiles"]  # old readers keep their version
+    assert second.data["profiles"]["work"]["BTN:1"]["keys"] == ("ctrl", "w")
+    assert json.loads(temp_config.read_text())["profiles"]["work"] == {"BTN:1": {"keys": ["ctrl", "w"]}}
+
+    # Editing a thawed copy doesn't touch the snapshot
+    copy = second.thaw()
+    copy["profiles"].clear()
+    assert "work" in store.snapshot().data["profiles"]
+
+
+def test_store_noop_update_keeps_version(temp_config):
+    store = config_store.get_store(temp_config, threading.RLock())
+    before = store.snapshot()
+    after = store.update(lambda data: None, source="save")
+    assert after is before
+
+
+def test_store_notifies_subscribers_until_unsubscribed(temp_config):
+    store = config_store.get_store(temp_config, threading.RLock())
+    seen = []
+    unsubscribe = store.subscribe(lambda snap, source: seen.append((snap.version, source, snap.active_profile)))
+
+    data = {"activeProfile": "a", "profiles": {"a": {}, "b": {}}}
+    store.replace(data, source="cloud")
+    store.update(lambda d: d.__setitem__("activeProfile", "b"), source="profile")
+    unsubscribe()
+    store.update(lambda d: d.__setitem__("activeProfile", "a"), source="profile")
+
+    assert [(source, prof) for _, source, prof in seen] == [("cloud", "a"), ("profile", "b")]
+    assert seen[1][0] == seen[0][0] + 1
+
+
+def test_store_readers_do_not_wait_for_writer(temp_config):
+    lock = threading.RLock()
+    store = config_store.get_store(temp_config, lock)
+    store.snapshot()
+
+    got = []
+    with lock:  # a writer (or anything else) holding the file lock
+        reader = threading.Thread(target=lambda: got.append(store.snapshot()))
+        reader.start()
+        reader.join(timeout=1.0)
+    assert got and got[0].version == store.version
+
+
+def test_store_failed_write_keeps_previous_snapshot(temp_config, monkeypatch):
+    store = config_store.get_store(temp_config, threading.RLock())
+    before = store.snapshot()
+
+    def broken(path, data, backup=True):
+        raise OSError("disk full")
+    monkeypatch.setattr(config_store.config_io, "write_json", broken)
+
+    with pytest.raises(OSError):
+        store.update(_switch_to("x"), source="profile")
+    assert store.snapshot() is before
+
+
+def _switch_to(profile):
+    def activate(data):
+        data["profiles"].setdefault(profile, {})
+        data["activeProfile"] = profile
+    return activate
+
+
+def test_write_behind_coalesces_into_one_flush(temp_config):
+    config_store.ensure_local_config_exists(threading.RLock())
+    store = config_store.ConfigStore(temp_config, write_delay=60.0)
+    store.load()
+
+    for prof in ["a", "b", "c", "d", "e"]:
+        store.update(_switch_to(prof), source="profile")
+
+    # Readers see the change immediately; the file only after the flush
+    assert store.snapshot().active_profile == "e"
+    assert json.loads(temp_config.read_text())["activeProfile"] == "default"
+    assert store.pending and store.coalesced == 4
+
+    assert store.flush() is True
+    assert json.loads(temp_config.read_text())["activeProfile"] == "e"
+    assert not store.journal_path.exists()
+    assert store.flushes == 1
+    assert store.flush() is False
+    store.close()
+
+
+def test_write_behind_flushes_after_window(temp_config):
+    config_store.ensure_local_config_exists(threading.RLock())
+    store = config_store.ConfigStore(temp_config, write_delay=0.05)
+    store.update(_switch_to("work"), source="profile")
+
+    deadline = time.monotonic() + 2.0
+    while store.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert json.loads(temp_config.read_text())["activeProfile"] == "work"
+    store.close()
+
+
+def test_patch_shares_untouched_profiles(temp_config):
+    store = config_store.ConfigStore(temp_config)
+    store.replace({"activeProfile": "a", "profiles": {"a": {}, "b": {"BTN:1": {"keys": ["x"]}}}}, source="defaults")
+    before = store.snapshot()
+
+    after = store.patch("save", profiles={"a": {"BTN:2": {"keys": ["y"]}}}, top={"activeProfile": "a"})
+    assert after.version == before.version + 1
+    assert after.data["profiles"]["b"] is before.data["profiles"]["b"]
+    assert json.loads(temp_config.read_text())["profiles"]["a"] == {"BTN:2": {"keys": ["y"]}}
+
+    assert store.patch("save", profiles={"a": {"BTN:2": {"keys": ["y"]}}}) is after
+    assert list(store.patch("save", profiles={"b": None}).data["profiles"]) == ["a"]
+
+
+def test_every_installed_snapshot_is_normalized(temp_config):
+    store = config_store.ConfigStore(temp_config)
+    # RTDB leaves out empty objects: a cloud copy of a fresh config can arrive without profiles
+    assert store.replace({"activeProfile": "default"}, source="cloud").thaw() == {"activeProfile": "default", "profiles": {"default": {}}}
+    snap = store.replace({"activeProfile": "gone", "profiles": {"work": {}}}, source="file", persist=False)
+    assert snap.active_profile == "work"
+    assert store.patch("save", profiles={"work": None}).data["profiles"] == {"default": {}}
+
+
+def test_unflushed_changes_survive_a_crash(temp_config):
+    config_store.ensure_local_config_exists(threading.RLock())
+    crashed = config_store.ConfigStore(temp_config, write_delay=60.0)
+    crashed.update(_switch_to("work"), source="profile")
+    # Half-written last journal line, as if the process died mid-append
+    with open(crashed.journal_path, "ab") as f:
+        f.write(b'{"activeProfile": "tor')
+
+    restarted = config_store.ConfigStore(temp_config)
+    assert restarted.load().active_profile == "work"
+    assert json.loads(temp_config.read_text())["activeProfile"] == "work"
+    assert not restarted.journal_path.exists()
+
+
+def test_unpersisted_replace_drops_pending_write(temp_config):
+    config_store.ensure_local_config_exists(threading.RLock())
+    store = config_store.ConfigStore(temp_config, write_delay=60.0)
+    store.update(_switch_to("work"), source="profile")
+
+    edited = {"activeProfile": "default", "profiles": {"default": {}, "hand": {}}}
+    store.replace(edited, source="file", persist=False)
+
+    assert not store.pending
+    assert not store.journal_path.exists()
+    assert store.flush() is False
+
+
+def test_save_config_rejects_invalid_mapping_before_writing(temp_config):
+    from desktop.core.actions import ConfigError
+
+    lock = threading.RLock()
+    config_store.ensure_local_config_exists(lock)
+    before = temp_config.read_text()
+
+    data = {"activeProfile": "default", "profiles": {"default": {"BTN:1": {"keys": ["ctrl", "nope"]}}}}
+    with pytest.raises(ConfigError, match="default / BTN:1"):
+        config_store.save_config(lock, data, cloud_sync=None)
+    assert temp_config.read_text() == before
@@ -0,0 +1,89 @@
+import json
+import threading
+
+import pytest
+
+from desktop.core import config_io, config_store, keymap
+from desktop.core.config_watcher import ConfigWatcher
+
+
+@pytest.fixture
+def store(tmp_path):
+    keymap.reset()
+    path = tmp_path / "buttonControls.json"
+    config_io.write_json(path, {"activeProfile": "default", "profiles": {"default": {"BTN:1": {"keys": ["a"]}}}})
+    s = config_store.ConfigStore(path, threading.RLock())
+    s.subscribe(lambda snap, source: keymap.publish(snap.data))
+    s.load()
+    yield s
+    keymap.reset()
+
+
+def _edit(path, data):
+    text = data if isinstance(data, str) else json.dumps(data)
+    path.write_text(text + "\n" * (1 + len(text) % 3))  # change the size too, mtime granularity varies
+
+
+# Settles a change: first poll notices it, the second (after the debounce) applies it
+def _settle(watcher, start=100.0):
+    watcher.poll(now=start)
+    return watcher.poll(now=start + watcher.debounce + 0.01)
+
+
+def test_external_edit_reloads_keymap(store):
+    watcher = ConfigWatcher(store, debounce=0.2)
+    _edit(store.path, {"activeProfile": "default", "profiles": {"default": {"BTN:1": {"keys": ["ctrl", "b"]}}}})
+
+    assert _settle(watcher) is True
+    assert keymap.lookup("default", "BTN:1") == ("ctrl", "b")
+    assert store.version == 2
+    assert watcher.reloads == 1
+
+
+def test_edit_waits_for_debounce(store):
+    watcher = ConfigWatcher(store, debounce=0.5)
+    _edit(store.path, {"profiles": {"default": {"BTN:1": {"keys": ["x"]}}}})
+
+    assert watcher.poll(now=10.0) is False
+    assert watcher.poll(now=10.1) is False
+    assert keymap.lookup("default", "BTN:1") == ("a",)
+    assert watcher.poll(now=10.6) is True
+    assert keymap.lookup("default", "BTN:1") == ("x",)
+
+
+def test_own_writes_are_ignored(store):
+    watcher = ConfigWatcher(store, debounce=0.0)
+    seen = []
+    store.subscribe(lambda snap, source: seen.append(source))
+
+    def add_profile(data):
+        data["profiles"]["work"] = {}
+    store.update(add_profile, source="save")
+    assert _settle(watcher) is False
+    assert watcher.own_writes == 1
+    assert seen == ["save"]
+
+
+def test_invalid_edit_keeps_previous_mapping(store):
+    watcher = ConfigWatcher(store, debounce=0.0)
+    _edit(store.path, '{"profiles": {"default": ')
+
+    assert _settle(watcher) is False
+    assert watcher.rejected == 1
+    assert keymap.lookup("default", "BTN:1") == ("a",)
+    assert store.version == 1
+    # The user's file is left alone for them to fix
+    assert store.path.read_text().startswith('{"profiles": {"default": ')
+
+    _edit(store.path, ["not", "an", "object"])
+    assert _settle(watcher, start=200.0) is False
+    assert watcher.rejected == 2
+
+
+def test_edit_is_normalized(store):
+    watcher = ConfigWatcher(store, debounce=0.0)
+    _edit(store.path, {"activeProfile": "gone", "profiles": {"work": {"BTN:2": {"keys": ["f5"]}}}})
+
+    assert _settle(watcher) is True
+    assert store.snapshot().active_profile == "work"
+    assert keymap.lookup("work", "BTN:2") == ("f5",)
@@ -0,0 +1,48 @@
+import json
+
+from desktop.ble import device_cache
+
+
+def test_remember_and_get_address(tmp_path, monkeypatch):
+    monkeypatch.setattr(device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+
+    assert device_cache.get_cached_address("Macropad") is None
+    device_cache.remember_address("Macropad", "AA:BB")
+    assert device_cache.get_cached_address("Macropad") == "AA:BB"
+
+    device_cache.forget_address("Macropad")
+    assert device_cache.get_cached_address("Macropad") is None
+
+
+def test_corrupt_cache_is_ignored(tmp_path, monkeypatch):
+    p = tmp_path / "device_cache.json"
+    p.write_text("{not json")
+    monkeypatch.setattr(device_cache, "get_device_cache_path", lambda: p)
+
+    assert device_cache.get_cached_address("Macropad") is None
+    device_cache.remember_address("Macropad", "AA:BB")
+    assert device_cache.get_cached_address("Macropad") == "AA:BB"
+
+
+def test_a_pad_named_gatt_keeps_its_own_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+
+    device_cache.remember_gatt("AA:BB", "uuid", 42, "0102")
+    device_cache.remember_address("gatt", "CC:DD")
+
+    assert device_cache.get_cached_address("gatt") == "CC:DD"
+    assert device_cache.get_gatt_entry("AA:BB")["handle"] == 42
+
+
+def test_flush_writes_changes_and_old_layout_is_read(tmp_path, monkeypatch):
+    p = tmp_path / "device_cache.json"
+    p.write_text(json.dumps({"Macropad": {"address": "AA:BB"}, "gatt": {"AA:BB": {"handle": 7}}}))
+    monkeypatch.setattr(device_cache, "get_device_cache_path", lambda: p)
+
+    assert device_cache.get_cached_address("Macropad") == "AA:BB"
+    device_cache.set_device_profile("Macropad", "media")
+    device_cache.flush()
+
+    on_disk = json.loads(p.read_text())
+    assert on_disk["devices"]["Macropad"] == {"address": "AA:BB", "profile": "media"}
+    assert on_disk["gatt"] == {"AA:BB": {"handle": 7}}
@@ -27,4 +27,17 @@ def test_parse_hotkey_normalizes_and_splits():
     assert parse_hotkey("Ctrl + A") == ["ctrl", "a"]
     assert parse_hotkey("shift+alt+s") == ["shift", "alt", "s"]
     assert parse_hotkey("") == []
-    assert parse_hotkey(None) == []
\ No newline at end of file
+    assert parse_hotkey(None) == []
+
+
+def test_config_changes_from_other_threads_go_through_the_pump():
+    from desktop.ui.gui import ConfigGui
+
+    queued = []
+    win = ConfigGui.__new__(ConfigGui)
+    win._post = queued.append
+    win.after = lambda *a: pytest.fail("Tk called off the GUI thread")
+
+    win._on_config_changed(object(), "cloud")
+    win._on_config_changed(object(), "save")
+    assert len(queued) == 1
@@ -0,0 +1,86 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from desktop.cloud import http_session
+from desktop.cloud.rtdb_client import RTDBClient
+
+
+@pytest.fixture
+def server():
+    hits = {"GET": 0, "PUT": 0, "POST": 0, "fail_next": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def _reply(self):
+            method = self.command
+            hits[method] = hits.get(method, 0) + 1
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b"null"
+            status = 200
+            if hits["fail_next"]:
+                hits["fail_next"] -= 1
+                status, body = 503, b'{"error": "busy"}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_PUT = do_POST = do_HEAD = _reply
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", hits
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_session():
+    http_session.close()
+    yield
+    http_session.close()
+
+
+def test_clients_share_one_keep_alive_connection(server):
+    url, _ = server
+    rtdb = RTDBClient(url)
+    assert rtdb.session is http_session.get_session()
+
+    rtdb.put("users/u1", "token", {"activeProfile": "default"})
+    for _ in range(4):
+        assert rtdb.get("users/u1", "token") is None
+
+    stats = http_session.stats()
+    assert stats["connections"] == 1
+    assert stats["reused"] == 4
+
+
+def test_idempotent_calls_are_retried_but_posts_are_not(server):
+    url, hits = server
+    session = http_session.new_session(retries=2, backoff=0)
+
+    hits["fail_next"] = 1
+    assert session.get(url + "/a.json", timeout=5).status_code == 200
+    assert hits["GET"] == 2
+
+    hits["fail_next"] = 1
+    assert session.post(url + "/a.json", data=json.dumps({}), timeout=5).status_code == 503
+    assert hits["POST"] == 1
+
+
+def test_prewarm_opens_the_connection_ahead_of_time(server):
+    url, hits = server
+    http_session.prewarm([url + "/users.json", url, None]).join(5)
+    assert hits["HEAD"] == 1
+
+    RTDBClient(url).get("users/u1", "token")
+    assert http_session.stats()["reused"] == 1
@@ -0,0 +1,77 @@
+import os
+import pytest
+
+from desktop.core import injection
+
+
+def test_chord_to_vk_maps_pyautogui_names():
+    assert injection.chord_to_vk(("ctrl", "shift", "a")) == (0x11, 0x10, 0x41)
+    assert injection.chord_to_vk(("alt", "F4")) == (0x12, 0x73)
+    assert injection.chord_to_vk(("win", "left", "num5", ";")) == (0x5B, 0x25, 0x65, 0xBA)
+
+
+def test_chord_to_vk_rejects_unknown_and_shifted_keys():
+    with pytest.raises(injection.UnsupportedKey, match="hyper"):
+        injection.chord_to_vk(("ctrl", "hyper"))
+    # Uppercase needs an implicit shift; left to the pyautogui fallback
+    with pytest.raises(injection.UnsupportedKey):
+        injection.chord_to_vk(("A",))
+
+
+def test_pyautogui_backend_disables_pause_and_sends_hotkey():
+    calls = []
+    fake = type("Fake", (), {"PAUSE": 0.1, "hotkey": staticmethod(lambda *keys: calls.append(keys))})
+
+    backend = injection.PyAutoGuiBackend(fake)
+    backend.send_chord(("ctrl", "c"))
+
+    assert fake.PAUSE == 0.0
+    assert calls == [("ctrl", "c")]
+
+
+def test_recording_backend_timestamps_chords():
+    rec = injection.RecordingBackend()
+    rec.send_chord(["ctrl", "a"])
+    rec.send_chord(("alt", "tab"))
+
+    assert rec.keys() == [("ctrl", "a"), ("alt", "tab")]
+    assert rec.events[0][0] <= rec.events[1][0]
+    rec.clear()
+    assert rec.keys() == []
+
+
+@pytest.mark.skipif(os.name == "nt", reason="headless fallback only applies off Windows")
+def test_auto_backend_is_none_without_gui(monkeypatch):
+    monkeypatch.setattr(injection, "_get_pyautogui", lambda: None)
+    assert injection.create_backend("auto") is None
+    with pytest.raises(ValueError):
+        injection.create_backend("xdotool")
+
+
+def test_get_backend_resolves_once(monkeypatch):
+    created = []
+    monkeypatch.setenv("KEY_BACKEND", "recording")
+    monkeypatch.setattr(injection, "create_backend", lambda name: created.append(name) or injection.RecordingBackend())
+    injection.reset_backend()
+    try:
+        first = injection.get_backend()
+        assert injection.get_backend() is first
+        assert created == ["recording"]
+    finally:
+        injection.reset_backend()
+
+
+def test_send_action_defaults_to_key_names():
+    from desktop.core.actions import compile_action
+
+    rec = injection.RecordingBackend()
+    rec.send_action(compile_action(["Control", "c"]))
+    assert rec.keys() == [("ctrl", "c")]
+
+
+def test_backend_without_send_chord_fails_when_built():
+    class Incomplete(injection.InjectionBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
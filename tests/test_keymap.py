@@ -0,0 +1,76 @@
+import json
+import threading
+import pytest
+
+from desktop.core import keymap
+
+
+@pytest.fixture(autouse=True)
+def fresh_keymap():
+    keymap.reset()
+    yield
+    keymap.reset()
+
+
+def test_compile_keymap_flattens_profiles():
+    table = keymap.compile_keymap({
+        "profiles": {
+            "default": {"BTN:1": {"keys": ["ctrl", "a"]}, "BTN:2": {"keys": []}},
+            "computer": {"BTN:1": {"keys": ["win", "d"]}},
+        }
+    })
+    assert table[("default", "BTN:1")].keys == ("ctrl", "a")
+    assert table[("default", "BTN:1")].codes == (0x11, 0x41)
+    assert table[("computer", "BTN:1")].keys == ("win", "d")
+    assert ("default", "BTN:2") not in table
+
+
+def test_compile_keymap_ignores_malformed_entries():
+    table = keymap.compile_keymap({"profiles": {"a": None, "b": {"BTN:1": "oops"}}})
+    assert len(table) == 0
+    assert len(keymap.compile_keymap(None)) == 0
+
+
+def test_publish_swaps_whole_table():
+    old = keymap.publish({"profiles": {"default": {"BTN:1": {"keys": ["a"]}}}})
+    keymap.publish({"profiles": {"default": {"BTN:1": {"keys": ["b"]}}}})
+
+    assert old[("default", "BTN:1")].keys == ("a",)  # readers holding the old table are unaffected
+    assert keymap.lookup("default", "BTN:1") == ("b",)
+
+
+def test_lookup_loads_from_disk_once(tmp_path, monkeypatch):
+    cfg = tmp_path / "buttonControls.json"
+    cfg.write_text(json.dumps({"profiles": {"default": {"BTN:3": {"keys": ["f5"]}}}}))
+    reads = []
+    monkeypatch.setattr(keymap, "get_config_path", lambda: reads.append(1) or cfg)
+
+    lock = threading.RLock()
+    assert keymap.lookup("default", "BTN:3", lock) == ("f5",)
+    assert keymap.lookup("default", "BTN:3", lock) == ("f5",)
+    assert len(reads) == 1
+
+
+def test_compile_keymap_canonicalizes_and_skips_invalid():
+    table = keymap.compile_keymap({
+        "profiles": {"default": {"BTN:1": {"keys": ["Control", "Escape"]}, "BTN:2": {"keys": ["ctrl", "nosuchkey"]}}}
+    })
+    assert table[("default", "BTN:1")].keys == ("ctrl", "esc")
+    assert ("default", "BTN:2") not in table
+
+
+def test_publish_recompiles_only_changed_profiles(monkeypatch, tmp_path):
+    from desktop.core.config_store import ConfigStore
+    store = ConfigStore(tmp_path / "buttonControls.json")
+    store.replace({"activeProfile": "a", "profiles": {"a": {"BTN:1": {"keys": ["ctrl", "c"]}}, "b": {"BTN:1": {"keys": ["x"]}}}}, source="defaults")
+    first = keymap.publish(store.snapshot().data)
+
+    compiled = []
+    real = keymap.compile_profile
+    monkeypatch.setattr(keymap, "compile_profile", lambda profile, *a: (compiled.append(profile), real(profile, *a)))
+    store.patch("save", profiles={"a": {"BTN:1": {"keys": ["ctrl", "v"]}}})
+    second = keymap.publish(store.snapshot().data)
+
+    assert compiled == ["a"]
+    assert second[("b", "BTN:1")] is first[("b", "BTN:1")]
+    assert second[("a", "BTN:1")].keys == ("ctrl", "v")
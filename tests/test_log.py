@@ -0,0 +1,64 @@
+import time
+
+from desktop.core import log
+
+
+def _reset(monkeypatch, level):
+    monkeypatch.setattr(log, "_ring", log.deque(maxlen=log.RING_SIZE))
+    monkeypatch.setattr(log, "_emitted", 0)
+    monkeypatch.setattr(log, "_written", 0)
+    monkeypatch.setattr(log, "_level", log.parse_level(level))
+
+
+def test_disabled_levels_are_not_buffered(monkeypatch):
+    _reset(monkeypatch, "info")
+    logger = log.get_logger("test")
+    logger.debug("Received %s", "BTN:1", profile="default")
+    logger.info("Connected")
+
+    assert [r[3] for r in log._ring] == ["Connected"]
+    assert logger.enabled(log.INFO) and not logger.enabled(log.DEBUG)
+
+
+def test_records_are_formatted_lazily_with_fields():
+    record = (time.time(), log.DEBUG, "ble", "Received %s", ("BTN:1",), {"profile": "default", "seq": 7})
+    line = log.format_record(record)
+    assert line.endswith("DEBUG ble: Received BTN:1 profile=default seq=7")
+    bad = log.format_record((time.time(), log.INFO, "ble", "%d items", ("x",), {}))
+    assert "%d items" in bad
+
+
+def test_writer_drains_ring_to_rotating_file(monkeypatch, tmp_path):
+    _reset(monkeypatch, "debug")
+    path = tmp_path / "app.log"
+    log.start(path, max_bytes=300, backups=2, console=False)
+    try:
+        logger = log.get_logger("test")
+        for i in range(20):
+            logger.info("line %d", i)
+            log.flush()
+    finally:
+        log.stop()
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["app.log", "app.log.1", "app.log.2"]
+    assert "line 19" in path.read_text(encoding="utf-8")
+    assert log.stats()["written"] == 20 and log.stats()["buffered"] == 0
+
+
+def test_ring_overflow_counts_dropped(monkeypatch):
+    _reset(monkeypatch, "debug")
+    monkeypatch.setattr(log, "_ring", log.deque(maxlen=4))
+    logger = log.get_logger("test")
+    for i in range(10):
+        logger.debug("event %d", i)
+
+    assert [r[4][0] for r in log._ring] == [6, 7, 8, 9]
+    assert log.stats()["dropped"] == 6
+
+
+def test_parse_level():
+    assert log.parse_level("warning") == log.WARNING
+    assert log.parse_level("WARN") == log.WARNING
+    assert log.parse_level("15") == 15
+    assert log.parse_level(None) == log.INFO
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+from desktop.core import metrics
+from desktop.core.loop_monitor import LoopMonitor
+
+
+def blocking_file_read():
+    time.sleep(0.15)
+
+
+def test_monitor_blames_blocking_callback():
+    metrics.reset()
+
+    async def main():
+        monitor = LoopMonitor(asyncio.get_running_loop(), interval=0.01, threshold=0.05).start()
+        await asyncio.sleep(0.05)
+        blocking_file_read()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        await asyncio.sleep(0)
+        return monitor
+
+    monitor = asyncio.run(main())
+
+    worst = monitor.worst_offenders()
+    assert monitor.stalls == 1
+    assert worst[0]["where"].startswith("tests/test_loop_monitor.py:")
+    assert worst[0]["where"].endswith("blocking_file_read")
+    assert worst[0]["max_ms"] >= 100
+    assert any("time.sleep" in line for line in worst[0]["stack"])
+    assert "blocking_file_read" in monitor.report()
+
+    hist = metrics.snapshot()["histograms"]
+    assert hist["loop.lag"]["count"] > 3
+    assert hist["loop.stall"]["count"] == 1
+
+
+def test_idle_loop_has_no_stalls_and_stops_cleanly():
+    async def main():
+        monitor = LoopMonitor(asyncio.get_running_loop(), interval=0.01, threshold=0.05).start()
+        await asyncio.sleep(0.1)
+        monitor.stop()
+        await asyncio.sleep(0)
+        return monitor, [t for t in asyncio.all_tasks() if t is not asyncio.current_task() and not t.done()]
+
+    monitor, leftover = asyncio.run(main())
+    assert monitor.stalls == 0
+    assert monitor.report() == "No event-loop stalls recorded."
+    assert leftover == []
+    assert "loop-watchdog" not in {t.name for t in threading.enumerate()}
+    assert "event_loop" not in metrics.snapshot()["gauges"]
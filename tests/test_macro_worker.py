@@ -0,0 +1,146 @@
+import threading
+import time
+import pytest
+
+from desktop.ble.macro_worker import (
+    MacroWorker, MacroEvent, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE,
+)
+from desktop.ble.press_policy import PressPolicy
+
+
+def gated_worker(**kwargs):
+    """Worker whose execute() waits on a gate, so tests can fill the queue deterministically."""
+    gate = threading.Event()
+    started = threading.Event()
+    done = []
+
+    def execute(event):
+        started.set()
+        gate.wait(2)
+        done.append(event.button_id)
+
+    return MacroWorker(execute, **kwargs).start(), gate, started, done
+
+
+def test_executes_in_order_on_worker_thread():
+    threads = []
+    done = []
+    w = MacroWorker(lambda e: (threads.append(threading.current_thread().name), done.append(e.button_id))).start()
+    for i in range(5):
+        w.submit(MacroEvent(f"BTN:{i}", "default"))
+    assert w.wait_idle(2)
+    w.stop()
+
+    assert done == [f"BTN:{i}" for i in range(5)]
+    assert set(threads) == {"macro-worker"}
+
+
+def test_drop_oldest_keeps_newest():
+    w, gate, started, done = gated_worker(maxsize=2, overflow=OVERFLOW_DROP_OLDEST)
+    w.submit(MacroEvent("BTN:0", "p"))
+    started.wait(2)  # BTN:0 is executing, queue is empty
+    for i in (1, 2, 3):
+        w.submit(MacroEvent(f"BTN:{i}", "p"))
+    gate.set()
+    w.wait_idle(2)
+    w.stop()
+
+    assert done == ["BTN:0", "BTN:2", "BTN:3"]
+    assert w.stats()["dropped"] == 1
+    assert w.stats()["max_depth"] == 2
+
+
+def test_coalesce_merges_duplicate_presses():
+    w, gate, started, done = gated_worker(maxsize=2, overflow=OVERFLOW_COALESCE)
+    w.submit(MacroEvent("BTN:0", "p"))
+    started.wait(2)
+    w.submit(MacroEvent("BTN:1", "p"))
+    w.submit(MacroEvent("BTN:2", "p"))
+    assert w.submit(MacroEvent("BTN:1", "p")) is False
+    gate.set()
+    w.wait_idle(2)
+    w.stop()
+
+    assert done == ["BTN:0", "BTN:1", "BTN:2"]
+    assert w.stats()["coalesced"] == 1
+
+
+def test_drop_newest_rejects_without_waiting():
+    w, gate, started, done = gated_worker(maxsize=1, overflow=OVERFLOW_DROP_NEWEST)
+    w.submit(MacroEvent("BTN:0", "p"))
+    started.wait(2)
+    assert w.submit(MacroEvent("BTN:1", "p")) is True
+    t0 = time.perf_counter()
+    assert w.submit(MacroEvent("BTN:2", "p")) is False
+    assert time.perf_counter() - t0 < 0.05
+    gate.set()
+    w.wait_idle(2)
+    w.stop()
+
+    assert done == ["BTN:0", "BTN:1"]
+    assert w.stats()["dropped"] == 1
+
+
+def test_failing_macro_does_not_kill_worker():
+    calls = []
+
+    def execute(event):
+        calls.append(event.button_id)
+        if event.button_id == "BTN:1":
+            raise RuntimeError("boom")
+
+    w = MacroWorker(execute).start()
+    w.submit(MacroEvent("BTN:1", "p"))
+    w.submit(MacroEvent("BTN:2", "p"))
+    w.wait_idle(2)
+    w.stop()
+
+    assert calls == ["BTN:1", "BTN:2"]
+    assert w.stats()["failed"] == 1
+
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        MacroWorker(lambda e: None, overflow="explode")
+
+
+def test_policy_rate_limits_held_button():
+    w, gate, started, done = gated_worker(policy=PressPolicy(min_interval=0.05, coalesce=False))
+    gate.set()
+    # A held button repeating every 20 ms for 200 ms
+    for i in range(10):
+        w.submit(MacroEvent("BTN:1", "p", received_ns=i * 20_000_000))
+    w.wait_idle(2)
+    w.stop()
+
+    assert len(done) == 4  # t = 0, 60, 120, 180 ms
+    assert w.stats()["rate_limited"] == 6
+
+
+def test_policy_coalesces_repeats_already_queued():
+    w, gate, started, done = gated_worker(policy=PressPolicy(coalesce=True))
+    w.submit(MacroEvent("BTN:0", "p"))
+    started.wait(2)
+    assert w.submit(MacroEvent("BTN:1", "p")) is True
+    assert w.submit(MacroEvent("BTN:1", "p")) is False
+    assert w.submit(MacroEvent("BTN:2", "p")) is True
+    gate.set()
+    w.wait_idle(2)
+    w.stop()
+
+    assert done == ["BTN:0", "BTN:1", "BTN:2"]
+    assert w.stats()["coalesced"] == 1
+
+
+def test_policy_drops_stale_presses_on_dequeue():
+    w, gate, started, done = gated_worker(policy=PressPolicy(max_age=0.05))
+    w.submit(MacroEvent("BTN:0", "p"))
+    started.wait(2)
+    w.submit(MacroEvent("BTN:1", "p"))
+    threading.Event().wait(0.1)  # BTN:1 ages past max_age while BTN:0 runs
+    gate.set()
+    w.wait_idle(2)
+    w.stop()
+
+    assert done == ["BTN:0"]
+    assert w.stats()["stale"] == 1
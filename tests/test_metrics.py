@@ -0,0 +1,60 @@
+import json
+import pytest
+
+from desktop.core import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_percentiles_are_bucket_accurate():
+    h = metrics.Histogram("x")
+    for v in range(1, 1001):
+        h.record(v)
+
+    s = h.summary()
+    assert s["count"] == 1000
+    assert s["max_us"] == 1000
+    assert 500 <= s["p50_us"] <= 500 * metrics._BUCKET_GROWTH
+    assert 990 <= s["p99_us"] <= 1000
+
+
+def test_histogram_is_fixed_size():
+    h = metrics.Histogram("x")
+    size = len(h._counts)
+    for v in range(10000):
+        h.record(v * 7.3)
+    assert len(h._counts) == size
+
+
+def test_empty_histogram_summary():
+    assert metrics.Histogram("x").summary()["p95_us"] == 0.0
+    assert "No keypresses" in metrics.format_keypress_summary()
+
+
+def test_keypress_trace_records_each_stage():
+    t = metrics.KeypressTrace()
+    t.decoded = t.received + 1_000
+    t.looked_up = t.decoded + 2_000
+    t.inject_start = t.looked_up + 3_000
+    t.inject_end = t.inject_start + 4_000
+    t.finish()
+
+    snap = metrics.snapshot()["histograms"]
+    assert snap["keypress.decode"]["max_us"] == 1
+    assert snap["keypress.lookup"]["max_us"] == 2
+    assert snap["keypress.dispatch"]["max_us"] == 3
+    assert snap["keypress.inject"]["max_us"] == 4
+    assert snap["keypress.total"]["max_us"] == 10
+
+
+def test_dump_writes_json(tmp_path):
+    metrics.record_ns("keypress.total", 5_000_000)
+    path = metrics.dump(tmp_path / "stats.json")
+    data = json.loads(path.read_text())
+    assert data["histograms"]["keypress.total"]["count"] == 1
+    assert "5.0 ms" in metrics.format_keypress_summary()
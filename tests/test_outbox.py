@@ -0,0 +1,69 @@
+from desktop.cloud.outbox import CloudOutbox
+from desktop.cloud.cloud_sync import CloudWriter
+from desktop.core.config_store import ConfigSnapshot
+
+
+def test_updates_compact_to_latest_value_per_path(tmp_path):
+    box = CloudOutbox(tmp_path / "cloud_outbox.json")
+    box.add({"activeProfile": "a", "profiles/work/BTN:1": {"keys": ["x"]}}, now=100)
+    box.add({"activeProfile": "b"}, now=110)
+    box.add({"profiles/work/BTN:2": {"keys": ["y"]}}, now=120)
+    assert len(box) == 3
+
+    # A parent path replaces what was queued below it (and keeps the oldest timestamp)
+    box.add({"profiles/work": None}, now=130)
+    assert box.take() == {"activeProfile": "b", "profiles/work": None}
+    assert box.oldest_age(now=200) == 100
+
+    # A child of a queued path is folded into it, so no request has overlapping paths
+    box.add({"profiles/work/BTN:3": {"keys": ["z"]}}, now=140)
+    assert box.take() == {"activeProfile": "b", "profiles/work": {"BTN:3": {"keys": ["z"]}}}
+
+
+def test_whole_config_absorbs_later_updates():
+    box = CloudOutbox()
+    box.add({"": {"activeProfile": "a", "profiles": {"a": {}}}})
+    box.add({"activeProfile": "b", "profiles/b": {"BTN:1": {"keys": ["q"]}}})
+    assert box.take() == {"": {"activeProfile": "b", "profiles": {"a": {}, "b": {"BTN:1": {"keys": ["q"]}}}}}
+
+
+def test_outbox_survives_restart_and_is_dropped_for_another_account(tmp_path):
+    path = tmp_path / "cloud_outbox.json"
+    box = CloudOutbox(path)
+    box.bind("uid1")
+    box.add({"activeProfile": "games"})
+
+    reopened = CloudOutbox(path)
+    assert reopened.take() == {"activeProfile": "games"}
+    reopened.bind("uid1")
+    assert len(reopened) == 1
+    reopened.bind("uid2")
+    assert len(CloudOutbox(path)) == 0
+
+
+def test_done_keeps_entries_changed_while_in_flight():
+    box = CloudOutbox()
+    box.add({"activeProfile": "a", "profiles/a/BTN:1": {"keys": ["x"]}})
+    batch = box.take()
+    box.add({"activeProfile": "b"})
+    box.done(batch)
+    assert box.take() == {"activeProfile": "b"}
+
+
+def test_unsent_updates_are_sent_by_the_next_run(tmp_path):
+    def offline(prof):
+        raise ConnectionError("offline")
+
+    path = tmp_path / "cloud_outbox.json"
+    failing = CloudWriter(lambda data: None, offline, delay=60.0, outbox=CloudOutbox(path))
+    failing.submit(ConfigSnapshot(1, {"activeProfile": "games", "profiles": {}}), "profile")
+    assert failing.flush() is False
+    failing.close(timeout=0.5)
+
+    calls = []
+    writer = CloudWriter(lambda data: None, lambda prof: calls.append(prof), delay=60.0, outbox=CloudOutbox(path))
+    assert writer.stats()["depth"] == 1
+    writer.kick()
+    writer.close(timeout=1.0)
+    assert calls == ["games"]
+    assert len(CloudOutbox(path)) == 0
@@ -0,0 +1,31 @@
+from desktop.ble.press_policy import PressPolicy
+
+
+def test_min_interval_is_per_button_and_overridable():
+    p = PressPolicy(min_interval=0.1, per_button={"BTN:2": 0.0})
+    ms = 1_000_000
+
+    assert p.admit(("p", "BTN:1"), "BTN:1", 0)
+    assert not p.admit(("p", "BTN:1"), "BTN:1", 50 * ms)
+    assert p.admit(("p", "BTN:3"), "BTN:3", 50 * ms)
+    assert p.admit(("p", "BTN:1"), "BTN:1", 100 * ms)
+    assert p.admit(("p", "BTN:2"), "BTN:2", 0) and p.admit(("p", "BTN:2"), "BTN:2", 1)
+
+
+def test_staleness_bound():
+    p = PressPolicy(max_age=0.5)
+    assert not p.is_stale(0, now_ns=400_000_000)
+    assert p.is_stale(0, now_ns=600_000_000)
+    assert not PressPolicy().is_stale(0, now_ns=10**12)
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("PRESS_MIN_INTERVAL_MS", "80")
+    monkeypatch.setenv("PRESS_MAX_AGE_MS", "0")
+    monkeypatch.setenv("PRESS_COALESCE", "0")
+    monkeypatch.setenv("PRESS_BUTTON_INTERVAL_MS", "BTN:1=200, BTN:4=0,junk")
+    p = PressPolicy.from_env()
+
+    assert p.min_interval == 0.08 and p.max_age is None and p.coalesce is False
+    assert p.interval_for("BTN:1") == 0.2 and p.interval_for("BTN:4") == 0.0
+    assert p.interval_for("BTN:2") == 0.08
@@ -0,0 +1,146 @@
+import json
+import threading
+
+import pytest
+
+from desktop.core import config_store
+from desktop.core.profile_db import ProfileDB, open_profile_db
+
+CONFIG = {
+    "activeProfile": "work",
+    "profiles": {
+        "default": {"BTN:1": {"keys": ["ctrl", "c"]}, "BTN:2": {"keys": []}},
+        "work": {"BTN:1": {"keys": ["win", "d"]}},
+        "games": {},
+    },
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    d = ProfileDB(tmp_path / "profiles.db")
+    yield d
+    d.close()
+
+
+def test_import_export_round_trips_json_format(db):
+    assert not db.exists() and db.read() is None
+    db.import_config(CONFIG)
+
+    exported = db.export_config()
+    assert exported == CONFIG
+    assert list(exported["profiles"]) == ["default", "work", "games"]  # object order kept
+
+
+def test_uses_wal_mode(db):
+    assert db._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_per_profile_reads(db):
+    db.import_config(CONFIG)
+    assert db.profile_names() == ["default", "work", "games"]
+    assert db.get_profile("work") == {"BTN:1": {"keys": ["win", "d"]}}
+    assert db.get_profile("games") == {}
+    assert db.get_profile("missing") is None
+
+
+def test_write_only_touches_changed_rows(db):
+    db.import_config(CONFIG)
+    new = json.loads(json.dumps(CONFIG))
+    new["profiles"]["default"]["BTN:1"] = {"keys": ["ctrl", "v"]}
+
+    before = db.rows_written
+    db.write(new, CONFIG)
+    assert db.rows_written - before == 1
+    assert db.export_config() == new
+
+
+def test_write_adds_deletes_and_reorders(db):
+    db.import_config(CONFIG)
+    new = {
+        "activeProfile": "games",
+        "profiles": {"games": {"BTN:4": {"keys": ["f5"]}}, "default": CONFIG["profiles"]["default"], "extra": {}},
+    }
+    db.write(new, CONFIG)
+
+    assert db.export_config() == new
+    assert list(db.export_config()["profiles"]) == ["games", "default", "extra"]
+    # Deleting a profile removed its mappings too
+    assert db._conn.execute("SELECT COUNT(*) FROM mappings WHERE profile = 'work'").fetchone()[0] == 0
+
+
+def test_direct_row_updates(db):
+    db.import_config(CONFIG)
+    db.set_mapping("work", "BTN:2", {"keys": ["alt", "tab"]})
+    db.put_profile("new", {"BTN:1": {"keys": ["a"]}})
+    assert db.delete_profile("games") is True
+    assert db.delete_profile("games") is False
+    with pytest.raises(KeyError):
+        db.set_mapping("nope", "BTN:1", {"keys": ["a"]})
+
+    profiles = db.export_config()["profiles"]
+    assert profiles["work"]["BTN:2"] == {"keys": ["alt", "tab"]}
+    assert list(profiles) == ["default", "work", "new"]
+
+
+def test_open_imports_legacy_json_once(tmp_path):
+    legacy = tmp_path / "buttonControls.json"
+    legacy.write_text(json.dumps(CONFIG))
+    db = open_profile_db(tmp_path / "profiles.db", legacy_json=legacy)
+    assert db.export_config() == CONFIG
+
+    # Later runs keep the database even if the JSON changes
+    legacy.write_text(json.dumps({"profiles": {"other": {}}}))
+    db.close()
+    db = open_profile_db(tmp_path / "profiles.db", legacy_json=legacy)
+    assert db.profile_names() == ["default", "work", "games"]
+    db.close()
+
+
+def test_config_store_on_sqlite_storage(tmp_path, db):
+    db.import_config(CONFIG)
+    store = config_store.ConfigStore(tmp_path / "buttonControls.json", threading.RLock(), storage=db)
+    assert store.snapshot().active_profile == "work"
+
+    def remap(data):
+        data["profiles"]["games"]["BTN:3"] = {"keys": ["space"]}
+    before = db.rows_written
+    store.update(remap, source="save")
+
+    assert db.rows_written - before == 1
+    assert db.get_profile("games") == {"BTN:3": {"keys": ["space"]}}
+    assert not (tmp_path / "buttonControls.json").exists()
+
+    reopened = config_store.ConfigStore(tmp_path / "buttonControls.json", storage=db)
+    assert reopened.snapshot().thaw() == store.snapshot().thaw()
+
+
+def test_store_patch_writes_only_the_changed_rows(tmp_path, db):
+    db.import_config(CONFIG)
+    store = config_store.ConfigStore(tmp_path / "buttonControls.json", storage=db)
+    store.load()
+
+    before = db.rows_written
+    store.patch("save", profiles={"default": {"BTN:1": {"keys": ["ctrl", "v"]}, "BTN:2": {"keys": []}}}, top={"activeProfile": "default"})
+    assert db.rows_written - before == 2  # one mapping + the top-level keys
+    store.patch("save", profiles={"games": None, "new": {"BTN:4": {"keys": ["f5"]}}})
+    assert db.export_config() == store.snapshot().thaw()
+
+    # The store's idea of what is persisted followed along, so a full update still diffs correctly
+    before = db.rows_written
+    store.update(lambda data: data["profiles"]["new"].update({"BTN:1": {"keys": ["a"]}}), source="save")
+    assert db.rows_written - before == 1
+
+
+def test_sqlite_storage_skips_the_write_behind_journal(tmp_path, db):
+    db.import_config(CONFIG)
+    store = config_store.ConfigStore(tmp_path / "buttonControls.json", storage=db, write_delay=60.0)
+
+    def remap(data):
+        data["profiles"]["work"]["BTN:1"] = {"keys": ["win", "e"]}
+    store.update(remap, source="save")
+
+    assert not store.pending
+    assert not store.journal_path.exists()
+    assert db.get_profile("work") == {"BTN:1": {"keys": ["win", "e"]}}
+    store.close()
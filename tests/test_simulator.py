@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import pytest
+
+from desktop.ble import ble_client, simulator
+from desktop.ble.macro_worker import MacroWorker
+from desktop.core import injection, keymap, metrics
+
+
+@pytest.fixture
+def sim_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("ADDRESS", "SIM:00:00")
+    monkeypatch.setenv("CHAR_UUID", simulator.FIRMWARE_CHAR_UUID)
+    monkeypatch.delenv("BLE_RECORD_DIR", raising=False)
+    monkeypatch.setattr(ble_client.device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    monkeypatch.setattr(ble_client, "SESSIONS", ble_client.SessionRegistry())
+
+    keymap.publish({"profiles": {"default": {f"BTN:{i}": {"keys": ["ctrl", str(i)]} for i in range(1, 5)}}})
+    rec = injection.RecordingBackend()
+    monkeypatch.setattr(injection, "get_backend", lambda: rec)
+
+    worker = MacroWorker(ble_client._execute_macro_event).start()
+    monkeypatch.setattr(ble_client, "MACRO_WORKER", worker)
+    yield rec, worker
+    worker.stop()
+
+
+async def _until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.005)
+
+
+def test_full_pipeline_against_simulated_pad(sim_env):
+    rec, worker = sim_env
+    backend = simulator.SimulatedBackend()
+    pad = backend.add_pad("Macropad")
+    state = {"activeProfile": "default", "connected": False, "gui_window": None}
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        with backend.installed():
+            task = ble_client.start_ble_session("Macropad", threading.RLock(), state, loop)
+            await _until(lambda: pad.notify_callback is not None)
+            assert state["connected"] is True
+
+            delivered = await pad.play(simulator.steady(pad, rate_hz=500, count=20))
+            await asyncio.to_thread(worker.wait_idle, 2)
+
+            ble_client.stop_ble_session()
+            await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 2)
+        return delivered
+
+    assert asyncio.run(scenario()) == 20
+    assert len(rec.keys()) == 20
+    assert rec.keys()[:4] == [("ctrl", "1"), ("ctrl", "2"), ("ctrl", "3"), ("ctrl", "4")]
+    assert state["connected"] is False
+
+
+def test_supervisor_reconnects_simulated_pad_after_drop(sim_env):
+    rec, worker = sim_env
+    backend = simulator.SimulatedBackend()
+    pad = backend.add_pad("Macropad")
+    state = {"activeProfile": "default", "connected": False, "gui_window": None}
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        with backend.installed():
+            task = ble_client.start_ble_session("Macropad", threading.RLock(), state, loop)
+            await _until(lambda: pad.notify_callback is not None)
+            pad.drop_link()
+            assert state["connected"] is False
+            await _until(lambda: pad.notify_callback is not None)
+            pad.press(2)
+            await asyncio.to_thread(worker.wait_idle, 2)
+            ble_client.stop_ble_session()
+            await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 2)
+
+    asyncio.run(scenario())
+    assert backend.connects == 2
+    assert rec.keys() == [("ctrl", "2")]
+
+
+def test_burst_patterns_and_batching():
+    pad = simulator.SimulatedBackend().add_pad()
+    plain = simulator.bursts(pad, size=3, gap=0.1, count=2)
+    batched = simulator.bursts(pad, size=3, gap=0.1, count=2, batched=True)
+
+    assert len(plain) == 6 and len(batched) == 2
+    assert len(ble_client.decode_payload(batched[0][1])) == 3
+    seqs = [e.seq for _, p in plain for e in ble_client.decode_payload(p)]
+    assert seqs == list(range(6))
+
+
+def test_steady_jitter_is_deterministic():
+    a = simulator.steady(simulator.SimulatedBackend().add_pad(), rate_hz=100, count=50, jitter=0.5, seed=7)
+    b = simulator.steady(simulator.SimulatedBackend().add_pad(), rate_hz=100, count=50, jitter=0.5, seed=7)
+    assert [t for t, _ in a] == [t for t, _ in b]
+
+
+def test_record_and_replay_roundtrip(tmp_path):
+    path = tmp_path / "session.jsonl"
+    rec = simulator.EventRecorder(path)
+    rec.record(b"BTN:1")
+    rec.record(bytes([1, 1, 2, 1, 0, 0]))
+    rec.close()
+
+    schedule = simulator.load_recording(path)
+    assert [p for _, p in schedule] == [b"BTN:1", bytes([1, 1, 2, 1, 0, 0])]
+    assert schedule[0][0] == 0.0
+
+    pad = simulator.SimulatedBackend().add_pad()
+    got = []
+    pad.client = object()
+    pad.notify_callback = lambda char, data: got.append(bytes(data))
+    assert asyncio.run(pad.play(schedule, speed=100)) == 2
+    assert got == [p for _, p in schedule]
@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+
+from desktop.ble import supervisor as sup
+from desktop.core import metrics
+
+
+def fast_policy(**kwargs):
+    kwargs.setdefault("base_delay", 0.001)
+    kwargs.setdefault("max_delay", 0.01)
+    kwargs.setdefault("listen_window", 0.05)
+    return sup.ReconnectPolicy(**kwargs)
+
+
+def test_backoff_grows_and_is_capped():
+    p = sup.ReconnectPolicy(base_delay=1, max_delay=8, jitter=0)
+    assert [p.delay(n) for n in range(1, 6)] == [1, 2, 4, 8, 8]
+
+    p = sup.ReconnectPolicy(base_delay=1, max_delay=8, jitter=0.5)
+    assert all(1 <= p.delay(2) <= 2 for _ in range(50))
+
+
+def test_reconnects_after_drop_when_device_advertises():
+    metrics.reset()
+    outcomes = [sup.DISCONNECTED, sup.STOPPED]
+    devices_seen = []
+
+    async def scenario():
+        stop = asyncio.Event()
+
+        async def connect_once(device, on_link_up):
+            devices_seen.append(device)
+            on_link_up()
+            return outcomes.pop(0)
+
+        async def wait_for_device(timeout):
+            return "ADVERTISED"
+
+        s = sup.ReconnectSupervisor(connect_once, wait_for_device, stop, fast_policy())
+        result = await s.run()
+        return s, result
+
+    s, result = asyncio.run(scenario())
+    assert result == sup.STOPPED
+    assert devices_seen == [None, "ADVERTISED"]
+    assert s.drops == 1 and s.sessions == 2
+    hist = metrics.snapshot()["histograms"]
+    assert hist["ble.outage"]["count"] == 1
+    assert hist["ble.reconnect"]["count"] == 1
+
+
+def test_gives_up_after_retry_budget():
+    gave_up = []
+
+    async def scenario():
+        stop = asyncio.Event()
+        calls = []
+
+        async def connect_once(device, on_link_up):
+            calls.append(device)
+            return sup.FAILED
+
+        async def wait_for_device(timeout):
+            return "ADVERTISED"  # the pad is there, connecting to it keeps failing
+
+        s = sup.ReconnectSupervisor(connect_once, wait_for_device, stop,
+                                    fast_policy(retry_budget=3), on_give_up=gave_up.append)
+        return await s.run(), calls, s
+
+    result, calls, s = asyncio.run(scenario())
+    assert result == sup.FAILED
+    assert len(calls) == 4  # first try + 3 retries
+    assert s.state == "gave-up"
+    assert gave_up and "3 retries" in gave_up[0]
+
+
+def test_waiting_for_a_sleeping_pad_does_not_use_the_budget():
+    async def scenario():
+        stop = asyncio.Event()
+        calls = []
+        listens = []
+
+        async def connect_once(device, on_link_up):
+            calls.append(device)
+            return sup.FAILED
+
+        async def wait_for_device(timeout):
+            listens.append(timeout)
+            if len(listens) == 10:
+                stop.set()
+            return None
+
+        s = sup.ReconnectSupervisor(connect_once, wait_for_device, stop, fast_policy(retry_budget=1))
+        return await s.run(), calls, listens, s
+
+    result, calls, listens, s = asyncio.run(scenario())
+    assert result == sup.STOPPED
+    assert calls == [None]  # only the initial warm attempt
+    assert len(listens) == 10
+    assert s.attempt == 1
+
+
+def test_successful_session_resets_retry_budget():
+    async def scenario():
+        stop = asyncio.Event()
+        script = [sup.FAILED, sup.FAILED, "up", sup.FAILED, sup.FAILED, sup.STOPPED]
+
+        async def connect_once(device, on_link_up):
+            step = script.pop(0)
+            if step == "up":
+                on_link_up()
+                return sup.DISCONNECTED
+            return step
+
+        async def wait_for_device(timeout):
+            return "ADVERTISED"
+
+        s = sup.ReconnectSupervisor(connect_once, wait_for_device, stop, fast_policy(retry_budget=2))
+        return await s.run()
+
+    assert asyncio.run(scenario()) == sup.STOPPED
+
+
+def test_stop_event_interrupts_backoff():
+    async def scenario():
+        stop = asyncio.Event()
+
+        async def connect_once(device, on_link_up):
+            asyncio.get_running_loop().call_later(0.01, stop.set)
+            return sup.FAILED
+
+        async def wait_for_device(timeout):
+            raise AssertionError("should not listen after stop")
+
+        s = sup.ReconnectSupervisor(connect_once, wait_for_device, stop,
+                                    sup.ReconnectPolicy(base_delay=60, max_delay=60))
+        return await asyncio.wait_for(s.run(), timeout=2)
+
+    assert asyncio.run(scenario()) == sup.STOPPED
@@ -43,13 +43,17 @@ def test_build_tray_calls_image_open(monkeypatch):
         def tray_sign_in(self, *_): pass
         def open_gui(self, *_): pass
         def refresh_json(self, *_): pass
+        def undo_config_change(self, *_): pass
         def change_profile(self, *_ , **__): pass
         def tray_connect(self, *_): pass
         def tray_disconnect(self, *_): pass
+        def show_latency_stats(self, *_): pass
+        def cloud_status_label(self): return "Cloud: up to date"
+        def show_cloud_status(self, *_): pass
         def exit_app(self, *_): pass
         FILE_LOCK = None
 
     icon = tray.build_tray(FakeApp())
     assert opened["path"] == "X/controller.png"
     assert icon.title == "Macro Controller"
-    assert len(icon.menu.items) == 8
\ No newline at end of file
+    assert len(icon.menu.items) == 11
\ No newline at end of file
@@ -0,0 +1,78 @@
+import json
+import pytest
+
+from desktop.ble import device_cache
+from desktop.core import config_io, config_store, keymap, warm_start
+
+CONFIG = {
+    "activeProfile": "computer",
+    "profiles": {"default": {"BTN:1": {"keys": ["ctrl", "c"]}}, "computer": {"BTN:1": {"keys": ["win", "d"]}}},
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(device_cache, "get_device_cache_path", lambda: tmp_path / "device_cache.json")
+    keymap.reset()
+    config_store.reset_stores()
+    yield
+    keymap.reset()
+    config_store.reset_stores()
+
+
+def shut_down_cleanly(tmp_path):
+    config_path = tmp_path / "buttonControls.json"
+    config_io.write_json(config_path, CONFIG)
+    device_cache.remember_gatt("AA:BB", "char", 42, "ab12")
+    store = config_store.get_store(config_path)
+    store.load()
+    assert warm_start.save(tmp_path / "warm_start.bin", store)
+    keymap.reset()
+    config_store.reset_stores()
+    device_cache._PARSED.clear()  # a new process has parsed nothing yet
+    return config_path
+
+
+def test_warm_start_skips_parsing_the_config(tmp_path, monkeypatch):
+    config_path = shut_down_cleanly(tmp_path)
+
+    def no_parse(*_a, **_k):
+        raise AssertionError("config was parsed")
+    monkeypatch.setattr(config_io, "read_json", no_parse)
+    monkeypatch.setattr(device_cache.json, "loads", no_parse)
+
+    state = warm_start.load(tmp_path / "warm_start.bin", config_path)
+    store = config_store.get_store(config_path)
+    assert warm_start.apply(state, store)
+
+    action = keymap.lookup_action("computer", "BTN:1")
+    assert action.keys == ("win", "d") and action.codes == (0x5B, 0x44)
+    assert store.snapshot().active_profile == "computer"
+    assert device_cache.get_gatt_entry("AA:BB")["handle"] == 42
+
+
+def test_changed_config_means_cold_start(tmp_path):
+    config_path = shut_down_cleanly(tmp_path)
+    edited = json.loads(config_path.read_text())
+    edited["activeProfile"] = "default"
+    config_path.write_text(json.dumps(edited))
+
+    assert warm_start.load(tmp_path / "warm_start.bin", config_path) is None
+
+
+def test_unflushed_journal_means_cold_start(tmp_path):
+    config_path = shut_down_cleanly(tmp_path)
+    state = warm_start.load(tmp_path / "warm_start.bin", config_path)
+    store = config_store.get_store(config_path)
+    store.journal_path.write_text("{}\n")
+
+    assert not warm_start.apply(state, store)
+    assert keymap.lookup("computer", "BTN:1") is None
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    config_path = tmp_path / "buttonControls.json"
+    config_io.write_json(config_path, CONFIG)
+    (tmp_path / "warm_start.bin").write_bytes(b"\xc1garbage")
+
+    assert warm_start.load(tmp_path / "warm_start.bin", config_path) is None